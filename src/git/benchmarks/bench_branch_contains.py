@@ -0,0 +1,81 @@
+"""git_branch --contains latency on a synthetic repository with many branches.
+
+Compares plain ``git branch --contains`` against the reachability index (cold,
+then warm). Usage: uv run python benchmarks/bench_branch_contains.py
+"""
+import argparse
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import git
+
+from mcp_server_git.pool import close_repo_state
+from mcp_server_git.server import git_branch
+
+
+def make_repo(path: Path, commits: int, branches: int, seed: int = 0) -> None:
+    """Generate a mainline of ``commits`` commits and ``branches`` topic branches."""
+    rng = random.Random(seed)
+    stream = []
+    for i in range(1, commits + 1):
+        stream.append(
+            f"commit refs/heads/master\nmark :{i}\n"
+            f"committer Bench <bench@example.com> {1_600_000_000 + i * 60} +0000\n"
+            f"data <<EOM\nmain {i}\nEOM\n"
+            f"M 644 inline main.txt\ndata <<EOM\n{i}\nEOM\n\n"
+        )
+    for b in range(branches):
+        base = rng.randint(1, commits)
+        stream.append(
+            f"commit refs/heads/topic/{b}\n"
+            f"committer Bench <bench@example.com> {1_600_000_000 + base * 60 + 30} +0000\n"
+            f"data <<EOM\ntopic {b}\nEOM\nfrom :{base}\n"
+            f"M 644 inline topic.txt\ndata <<EOM\n{b}\nEOM\n\n"
+        )
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    subprocess.run(
+        ["git", "fast-import", "--quiet"], cwd=path, input="".join(stream).encode(), check=True
+    )
+    subprocess.run(["git", "checkout", "-q", "master"], cwd=path, check=True)
+
+
+def timed(fn) -> tuple[float, str]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--commits", type=int, default=5000)
+    parser.add_argument("--branches", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "repo"
+        make_repo(path, args.commits, args.branches)
+        repo = git.Repo(path)
+        targets = {
+            "old commit": repo.git.rev_parse(f"master~{args.commits * 9 // 10}"),
+            "recent commit": repo.git.rev_parse(f"master~{args.commits // 10}"),
+        }
+
+        for label, commit in targets.items():
+            plain, expected = timed(lambda: repo.git.branch("--contains", commit))
+            cold, result = timed(lambda: git_branch(repo, "local", contains=commit))
+            warm, _ = timed(lambda: git_branch(repo, "local", contains=commit))
+            assert sorted(result.split()) == sorted(expected.split())
+            print(
+                f"{label:>13}: git branch {plain * 1000:8.1f} ms"
+                f"  index cold {cold * 1000:8.1f} ms  warm {warm * 1000:8.1f} ms"
+                f"  ({len(result.splitlines())} branches)"
+            )
+        close_repo_state(repo)
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Throughput and latency of concurrent tool calls through the MCP server.
+
+Usage: uv run python benchmarks/bench_concurrency.py [--commits N] [--concurrency N]
+"""
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import anyio
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from mcp_server_git.server import create_server
+
+
+def make_history(path: Path, commits: int) -> None:
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    stream = []
+    for i in range(commits):
+        content = f"{i}\n".encode()
+        stream.append(
+            f"commit refs/heads/master\n"
+            f"committer Benchmark <bench@example.com> {1_600_000_000 + i} +0000\n"
+            f"data 0\n"
+            f"M 644 inline dir{i % 100}/file{i % 7}.txt\n"
+            f"data {len(content)}\n".encode() + content + b"\n"
+        )
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input=b"".join(stream), check=True)
+    subprocess.run(["git", "checkout", "-q", "master"], cwd=path, check=True)
+
+
+async def run(repos: list[Path], concurrency: int) -> None:
+    # A path-limited log has to diff every commit, which makes it a slow read
+    slow = ("git_log", {"max_count": 100, "paths": ["dir0/file0.txt"]})
+    fast = ("git_status", {})
+
+    async with create_connected_server_and_client_session(create_server()) as client:
+        async def call(repo: Path, tool: tuple[str, dict]) -> float:
+            start = time.perf_counter()
+            result = await client.call_tool(tool[0], {"repo_path": str(repo), **tool[1]})
+            assert not result.isError, result.content
+            return time.perf_counter() - start
+
+        await call(repos[0], slow)
+
+        start = time.perf_counter()
+        for i in range(concurrency):
+            await call(repos[i % len(repos)], slow)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        async with anyio.create_task_group() as tg:
+            for i in range(concurrency):
+                tg.start_soon(call, repos[i % len(repos)], slow)
+        concurrent = time.perf_counter() - start
+        print(f"{concurrency} slow reads: sequential {sequential * 1000:8.1f} ms  concurrent {concurrent * 1000:8.1f} ms"
+              f"  ({sequential / concurrent:.1f}x)")
+
+        idle = min([await call(repos[-1], fast) for _ in range(5)])
+        latencies = []
+        async with anyio.create_task_group() as tg:
+            for i in range(concurrency):
+                tg.start_soon(call, repos[0], slow)
+            await anyio.sleep(0.01)
+            for _ in range(5):
+                latencies.append(await call(repos[-1], fast))
+        print(f"git_status on another repo: idle {idle * 1000:6.1f} ms  "
+              f"while {concurrency} slow reads run {max(latencies) * 1000:6.1f} ms (worst)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--commits", type=int, default=20_000)
+    parser.add_argument("--repos", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repos = []
+        for i in range(args.repos):
+            path = Path(tmp) / f"repo{i}"
+            make_history(path, args.commits)
+            repos.append(path)
+        print(f"{args.repos} repositories with {args.commits} commits each")
+        anyio.run(run, repos, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
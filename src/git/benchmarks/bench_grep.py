@@ -0,0 +1,53 @@
+"""git_grep latency by thread count, and pickaxe history search, on a real repository.
+
+Usage: uv run python benchmarks/bench_grep.py [--repo PATH] [--pattern REGEX] [--threads N,N,...]
+
+Defaults to the repository this benchmark lives in.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import git
+
+from mcp_server_git.server import git_grep
+
+
+def timed(fn, runs: int) -> tuple[float, int]:
+    best, count = float("inf"), 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        matches, _ = fn()
+        best = min(best, time.perf_counter() - start)
+        count = len(matches)
+    return best, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--repo", type=Path, default=Path(__file__).resolve().parent)
+    parser.add_argument("--pattern", default=r"def [a-z_]+\(")
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--max-matches", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    repo = git.Repo(args.repo, search_parent_directories=True)
+    print(f"repository: {repo.working_dir}")
+    for source, options in [("worktree", {}), ("HEAD", {"revision": "HEAD"})]:
+        for threads in map(int, args.threads.split(",")):
+            elapsed, count = timed(lambda: git_grep(
+                repo, args.pattern, threads=threads, max_matches=args.max_matches, **options
+            ), args.runs)
+            print(f"{source:>8} threads={threads}: {elapsed * 1000:8.1f} ms  {count} matches")
+
+    for mode in ("S", "G"):
+        elapsed, count = timed(lambda: git_grep(
+            repo, args.pattern, pickaxe=mode, max_matches=args.max_matches
+        ), 1)
+        print(f"pickaxe -{mode}: {elapsed * 1000:8.1f} ms  {count} commits")
+    repo.close()
+
+
+if __name__ == "__main__":
+    main()
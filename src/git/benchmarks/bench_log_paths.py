@@ -0,0 +1,99 @@
+"""Path-limited git_log latency on a synthetic repository with a deep history.
+
+Times ``git log -- <path>`` for a rarely and a frequently changed path with no
+commit-graph, with a commit-graph lacking changed-path Bloom filters, and with
+the graph git_log maintains. Usage: uv run python benchmarks/bench_log_paths.py
+"""
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import git
+
+from mcp_server_git.pool import close_repo_state
+from mcp_server_git.server import git_log
+
+
+def make_repo(path: Path, commits: int, files: int) -> None:
+    """Generate ``commits`` commits, each changing one of ``files`` files round-robin.
+
+    ``rare.txt`` is changed only every thousandth commit and ``hot.txt`` every tenth.
+    """
+    stream = []
+    for i in range(1, commits + 1):
+        if i % 1000 == 0:
+            name = "rare.txt"
+        elif i % 10 == 0:
+            name = "hot.txt"
+        else:
+            name = f"dir{i % 10}/file{i % files}.txt"
+        stream.append(
+            f"commit refs/heads/master\nmark :{i}\n"
+            f"committer Bench <bench@example.com> {1_600_000_000 + i * 60} +0000\n"
+            f"data <<EOM\ncommit {i}\nEOM\n"
+            f"M 644 inline {name}\ndata <<EOM\n{i}\nEOM\n\n"
+        )
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    subprocess.run(
+        ["git", "fast-import", "--quiet"], cwd=path, input="".join(stream).encode(), check=True
+    )
+    subprocess.run(["git", "checkout", "-q", "master"], cwd=path, check=True)
+
+
+def remove_graphs(path: Path) -> None:
+    info = path / ".git" / "objects" / "info"
+    (info / "commit-graph").unlink(missing_ok=True)
+    shutil.rmtree(info / "commit-graphs", ignore_errors=True)
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--commits", type=int, default=50000)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "repo"
+        make_repo(path, args.commits, args.files)
+        repo = git.Repo(path)
+
+        for label, target in (("rare path", "rare.txt"), ("frequent path", "hot.txt")):
+            def query():
+                return repo.git.log("--format=%H", "--max-count=100", "--", target)
+
+            # Forget the graph git_log maintains so that it notices the plain one below
+            close_repo_state(repo)
+            remove_graphs(path)
+            no_graph = timed(query, args.repeat)
+            repo.git.commit_graph("write", "--reachable", "--no-progress")
+            plain_graph = timed(query, args.repeat)
+            # The first path-limited git_log upgrades the graph with Bloom filters
+            start = time.perf_counter()
+            git_log(repo, 100, paths=[target])
+            upgrade = time.perf_counter() - start
+            bloom = timed(query, args.repeat)
+            tool = timed(lambda: git_log(repo, 100, paths=[target]), args.repeat)
+            print(
+                f"{label:>13}: no graph {no_graph * 1000:8.1f} ms"
+                f"  graph {plain_graph * 1000:8.1f} ms  bloom {bloom * 1000:8.1f} ms"
+                f"  git_log {tool * 1000:8.1f} ms  (first call with upgrade {upgrade * 1000:.0f} ms)"
+            )
+        close_repo_state(repo)
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Per-call latency of git_status/git_log with and without the repository pool.
+
+Usage: uv run python benchmarks/bench_repo_pool.py [--commits N] [--calls N]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import git
+
+from mcp_server_git.pool import RepoPool
+from mcp_server_git.server import git_log, git_status
+
+
+def make_repo(path: Path, commits: int) -> None:
+    repo = git.Repo.init(path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Benchmark")
+        config.set_value("user", "email", "bench@example.com")
+    for i in range(commits):
+        (path / f"file{i % 50}.txt").write_text(f"revision {i}\n")
+        repo.git.add(".")
+        repo.git.commit("-q", "-m", f"commit {i}")
+    repo.close()
+
+
+def measure(open_repo, repo_path: Path, calls: int) -> list[float]:
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        repo = open_repo(repo_path)
+        git_status(repo)
+        git_log(repo, 10)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{label:>10}: mean {statistics.mean(timings) * 1000:7.2f} ms"
+        f"  p50 {statistics.median(timings) * 1000:7.2f} ms"
+        f"  p95 {p95 * 1000:7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_path = Path(tmp) / "repo"
+        make_repo(repo_path, args.commits)
+
+        report("git.Repo", measure(git.Repo, repo_path, args.calls))
+
+        pool = RepoPool()
+        report("RepoPool", measure(pool.get, repo_path, args.calls))
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
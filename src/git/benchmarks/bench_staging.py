@@ -0,0 +1,76 @@
+"""git_add + git_commit latency: GitPython's index versus native git, by index size.
+
+Usage: uv run python benchmarks/bench_staging.py [--sizes N,N,...] [--changed N]
+"""
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import git
+
+from mcp_server_git.server import git_add, git_commit
+
+
+def make_repo(path: Path, files: int) -> None:
+    # Blobs and the initial commit come from fast-import; the worktree and
+    # index are then populated by a checkout.
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    stream = [b"commit refs/heads/master\ncommitter Benchmark <bench@example.com> 1600000000 +0000\ndata 0\n"]
+    for i in range(files):
+        content = f"{i}\n".encode()
+        stream.append(f"M 644 inline d{i % 1000:03d}/f{i}.txt\ndata {len(content)}\n".encode() + content + b"\n")
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input=b"".join(stream), check=True)
+    subprocess.run(["git", "checkout", "-q", "master"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.name", "Benchmark"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.email", "bench@example.com"], cwd=path, check=True)
+
+
+def touch(path: Path, changed: int, round_: int) -> list[str]:
+    names = [f"d{i % 1000:03d}/f{i}.txt" for i in range(changed)]
+    for name in names:
+        (path / name).write_text(f"round {round_}\n")
+    return names
+
+
+def gitpython_path(repo: git.Repo, names: list[str]) -> None:
+    repo.index.add(names)
+    repo.index.commit("benchmark")
+
+
+def native_path(repo: git.Repo, names: list[str]) -> None:
+    git_add(repo, names)
+    git_commit(repo, "benchmark")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--changed", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in map(int, args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "repo"
+            make_repo(path, size)
+            repo = git.Repo(path)
+            results = {}
+            round_ = 0
+            for label, fn in [("gitpython", gitpython_path), ("native", native_path)]:
+                timings = []
+                for _ in range(args.runs):
+                    round_ += 1
+                    names = touch(path, min(args.changed, size), round_)
+                    start = time.perf_counter()
+                    fn(repo, names)
+                    timings.append(time.perf_counter() - start)
+                results[label] = min(timings)
+            repo.close()
+        print(f"{size:>8} entries: gitpython {results['gitpython'] * 1000:9.1f} ms  "
+              f"native {results['native'] * 1000:9.1f} ms  ({results['gitpython'] / results['native']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
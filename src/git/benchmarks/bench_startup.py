@@ -0,0 +1,82 @@
+"""Cold-start latency of the server as an MCP client spawning it sees it.
+
+Starts ``python -m mcp_server_git`` over stdio, then times the responses to
+``initialize`` and to the first ``tools/list`` from the moment the process was
+spawned. Usage: uv run python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def request(proc: subprocess.Popen, message: dict) -> dict | None:
+    assert proc.stdin is not None and proc.stdout is not None
+    proc.stdin.write(json.dumps(message).encode() + b"\n")
+    proc.stdin.flush()
+    if "id" not in message:
+        return None
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise SystemExit(f"server exited: {proc.stderr.read().decode() if proc.stderr else ''}")
+        response = json.loads(line)
+        if response.get("id") == message["id"]:
+            return response
+
+
+def measure(repository: Path) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "mcp_server_git", "--repository", str(repository)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    try:
+        request(proc, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2025-06-18",
+            "capabilities": {},
+            "clientInfo": {"name": "bench", "version": "0"},
+        }})
+        initialized = time.perf_counter() - start
+        request(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        tools = request(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        listed = time.perf_counter() - start
+        assert tools is not None
+        return initialized, listed, len(tools["result"]["tools"])
+    finally:
+        proc.stdin.close()  # type: ignore[union-attr]
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--repository", type=Path, help="Repository to serve (default: a fresh empty one)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = args.repository
+        if repository is None:
+            repository = Path(tmp) / "repo"
+            subprocess.run(["git", "init", "-q", str(repository)], check=True)
+
+        # The first spawn warms the OS file cache and Python's bytecode cache
+        measure(repository)
+        samples = [measure(repository) for _ in range(args.runs)]
+
+    initialize = [sample[0] for sample in samples]
+    tools_list = [sample[1] for sample in samples]
+    print(f"{samples[0][2]} tools, {args.runs} runs")
+    for label, values in (("initialize", initialize), ("first tools/list", tools_list)):
+        print(
+            f"{label:>16}: median {statistics.median(values) * 1000:7.1f} ms"
+            f"  min {min(values) * 1000:7.1f} ms  max {max(values) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Cold and warm git_status latency on a generated large worktree.
+
+Usage: uv run python benchmarks/bench_status.py [--dirs N] [--files-per-dir N]
+"""
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import git
+
+from mcp_server_git.server import git_status
+
+
+def make_worktree(path: Path, dirs: int, files_per_dir: int) -> None:
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    for d in range(dirs):
+        directory = path / f"dir{d:04d}"
+        directory.mkdir()
+        for f in range(files_per_dir):
+            (directory / f"file{f:04d}.txt").write_text(f"{d} {f}\n")
+    env = ["-c", "user.name=Benchmark", "-c", "user.email=bench@example.com"]
+    subprocess.run(["git", "add", "-A"], cwd=path, check=True)
+    subprocess.run(["git", *env, "commit", "-q", "-m", "initial"], cwd=path, check=True)
+    # A handful of changes so status has something to report
+    for d in range(0, dirs, max(dirs // 10, 1)):
+        (path / f"dir{d:04d}" / "file0000.txt").write_text("modified\n")
+        (path / f"dir{d:04d}" / "untracked.txt").write_text("new\n")
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--dirs", type=int, default=200)
+    parser.add_argument("--files-per-dir", type=int, default=250)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "repo"
+        make_worktree(path, args.dirs, args.files_per_dir)
+        repo = git.Repo(path)
+        print(f"worktree: {args.dirs * args.files_per_dir} files")
+
+        variants = {
+            "text": {},
+            "structured": {"structured": True},
+            "structured+untracked cache": {"structured": True, "untracked_cache": True},
+            "structured+untracked cache+fsmonitor": {
+                "structured": True, "untracked_cache": True, "fsmonitor": True
+            },
+        }
+        for label, options in variants.items():
+            repo.git.update_index("--no-untracked-cache")
+            cold = timed(lambda: git_status(repo, **options))
+            warm = min(timed(lambda: git_status(repo, **options)) for _ in range(args.runs))
+            print(f"{label:>38}: cold {cold * 1000:8.1f} ms  warm {warm * 1000:8.1f} ms")
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Latency and memory of every git tool on a generated large repository.
+
+Drives each tool in GitTools through the MCP server's call_tool and reports
+p50/p90/p99 latency and peak Python memory per case. Results can be saved as
+a JSON baseline and compared against a previous one; the comparison exits
+non-zero when a case got slower than the threshold allows. Everything runs
+locally, without network access.
+
+Usage: uv run python benchmarks/bench_suite.py [--commits N] [--files N] [--save FILE] [--compare FILE]
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+import anyio
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import TextContent
+
+from mcp_server_git.server import GitTools, create_server
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "needle", "value"]
+
+
+def _text(rng: random.Random, lines: int) -> bytes:
+    return "".join(
+        " ".join(rng.choice(WORDS) for _ in range(8)) + "\n" for _ in range(lines)
+    ).encode()
+
+
+def _blob(data: bytes) -> bytes:
+    return f"data {len(data)}\n".encode() + data + b"\n"
+
+
+def make_repo(
+    path: Path,
+    commits: int,
+    files: int,
+    branches: int,
+    large_diff_files: int,
+    binary_files: int,
+    seed: int = 0,
+) -> dict:
+    """Generate a repository deterministically from ``seed``.
+
+    The history starts with ``files`` text files and ``binary_files`` random
+    binary files, then each commit rewrites a few files. One commit in the
+    middle rewrites ``large_diff_files`` files at once. ``branches`` branches
+    point at random commits.
+    """
+    rng = random.Random(seed)
+    names = [f"src/mod{i % 97:02d}/file{i:05d}.txt" for i in range(files)]
+    stream = [b"commit refs/heads/master\nmark :1\n",
+              b"committer Bench <bench@example.com> 1600000000 +0000\n", _blob(b"initial")]
+    for name in names:
+        stream.append(f"M 644 inline {name}\n".encode() + _blob(_text(rng, rng.randint(20, 200))))
+    for i in range(binary_files):
+        stream.append(f"M 644 inline assets/blob{i:03d}.bin\n".encode() + _blob(rng.randbytes(256 * 1024)))
+
+    large_diff_commit = commits // 2
+    for c in range(2, commits + 1):
+        stream.append(f"commit refs/heads/master\nmark :{c}\n".encode())
+        stream.append(f"committer Bench <bench@example.com> {1_600_000_000 + c * 60} +0000\n".encode())
+        stream.append(_blob(f"change {c}".encode()))
+        changed = rng.sample(names, large_diff_files if c == large_diff_commit else rng.randint(1, 3))
+        for name in changed:
+            stream.append(f"M 644 inline {name}\n".encode() + _blob(_text(rng, rng.randint(20, 200))))
+        stream.append(b"\n")
+    for b in range(branches):
+        stream.append(f"reset refs/heads/topic/{b}\nfrom :{rng.randint(1, commits)}\n\n".encode())
+
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input=b"".join(stream), check=True)
+    subprocess.run(["git", "checkout", "-q", "master"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.name", "Bench"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.email", "bench@example.com"], cwd=path, check=True)
+    subprocess.run(["git", "branch", "-q", "bench-base"], cwd=path, check=True)
+    # Unstaged and staged changes for the diff tools to report
+    for name in names[:20]:
+        (path / name).write_text("modified in worktree\n")
+    subprocess.run(["git", "add", *names[:10]], cwd=path, check=True)
+
+    large = subprocess.run(
+        ["git", "rev-parse", f"master~{commits - large_diff_commit}"],
+        cwd=path, check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    return {"names": names, "large_diff_commit": large}
+
+
+def make_cases(path: Path, info: dict) -> list[tuple[str, str, Callable[[int], dict]]]:
+    """(label, tool, arguments for iteration i) for every tool.
+
+    Read-only cases come first; the mutating cases that follow leave the
+    repository usable for their own next iteration.
+    """
+    names = info["names"]
+    large = info["large_diff_commit"]
+    scratch = path / names[-1]
+
+    def touch_and_add(i: int) -> dict:
+        scratch.write_text(f"iteration {i}\n")
+        return {"files": [names[-1]]}
+
+    # Each release returns one of the worktrees the acquire case leased
+    worktrees = path / ".git" / "mcp-server-git" / "worktrees"
+    released: list[Path] = []
+
+    def release_next(i: int) -> dict:
+        leased = sorted(set(worktrees.iterdir()) - set(released))
+        released.append(leased[0])
+        return {"repo_path": str(leased[0])}
+
+    cases = [
+        ("status", GitTools.STATUS, lambda i: {}),
+        ("status structured", GitTools.STATUS, lambda i: {"structured": True}),
+        ("diff unstaged", GitTools.DIFF_UNSTAGED, lambda i: {}),
+        ("diff staged", GitTools.DIFF_STAGED, lambda i: {}),
+        ("diff range", GitTools.DIFF, lambda i: {"target": "master~50..master"}),
+        ("diff large commit", GitTools.DIFF, lambda i: {"target": f"{large}^!", "mode": "stat"}),
+        ("log", GitTools.LOG, lambda i: {"max_count": 50}),
+        ("log path", GitTools.LOG, lambda i: {"max_count": 20, "paths": [names[0]]}),
+        ("log index query", GitTools.LOG, lambda i: {
+            "max_count": 20, "use_index": True, "paths": ["src/mod01/"], "message": "change 1",
+        }),
+        ("show", GitTools.SHOW, lambda i: {"revision": "master"}),
+        ("show large commit", GitTools.SHOW, lambda i: {"revision": large}),
+        ("branch", GitTools.BRANCH, lambda i: {"branch_type": "local"}),
+        ("branch contains", GitTools.BRANCH, lambda i: {"branch_type": "local", "contains": "master~100"}),
+        ("branch structured", GitTools.BRANCH, lambda i: {
+            "branch_type": "local", "structured": True, "base": "master", "sort": "-ahead", "limit": 50,
+        }),
+        ("blame", GitTools.BLAME, lambda i: {"path": names[0]}),
+        ("grep worktree", GitTools.GREP, lambda i: {"pattern": "needle value", "fixed_strings": True}),
+        ("grep revision", GitTools.GREP, lambda i: {"pattern": "needle (alpha|beta)", "revision": "master~10"}),
+        ("read file", GitTools.READ_FILE, lambda i: {"paths": names[:5], "revision": "master~5"}),
+        ("batch", GitTools.BATCH, lambda i: {"operations": [
+            {"tool": GitTools.STATUS}, {"tool": GitTools.LOG, "arguments": {"max_count": 10}},
+            {"tool": GitTools.BRANCH, "arguments": {"branch_type": "local"}},
+        ]}),
+        ("add", GitTools.ADD, touch_and_add),
+        ("commit", GitTools.COMMIT, lambda i: {"message": f"bench commit {i}"}),
+        ("reset", GitTools.RESET, lambda i: {}),
+        ("create branch", GitTools.CREATE_BRANCH, lambda i: {"branch_name": f"bench-{i}"}),
+        ("checkout", GitTools.CHECKOUT, lambda i: {"branch_name": "bench-base" if i % 2 else "master"}),
+        ("worktree acquire", GitTools.WORKTREE_ACQUIRE, lambda i: {"revision": f"master~{i % 50}"}),
+        ("worktree release", GitTools.WORKTREE_RELEASE, release_next),
+    ]
+    missing = set(GitTools) - {tool for _, tool, _ in cases}
+    if missing:
+        raise SystemExit(f"No benchmark case for: {', '.join(sorted(missing))}")
+    return cases
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+async def run_cases(path: Path, cases, runs: int, memory_runs: int) -> dict:
+    results = {}
+    # Every acquire call leases a worktree of its own until the release case runs
+    server = create_server(max_worktrees=runs + memory_runs + 1)
+    async with create_connected_server_and_client_session(server) as client:
+        async def call(tool: str, arguments: dict) -> float:
+            start = time.perf_counter()
+            result = await client.call_tool(tool, {"repo_path": str(path), **arguments})
+            elapsed = time.perf_counter() - start
+            if result.isError:
+                text = "".join(c.text for c in result.content if isinstance(c, TextContent))
+                raise SystemExit(f"{tool} failed: {text}")
+            return elapsed
+
+        iteration = 0
+        for label, tool, make_arguments in cases:
+            iteration += 1
+            await call(tool, make_arguments(iteration))
+            samples = []
+            for _ in range(runs):
+                iteration += 1
+                samples.append(await call(tool, make_arguments(iteration)))
+
+            # Separate pass: tracing allocations slows every call down
+            tracemalloc.start()
+            peak = 0
+            for _ in range(memory_runs):
+                iteration += 1
+                arguments = make_arguments(iteration)
+                tracemalloc.reset_peak()
+                await call(tool, arguments)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+            results[label] = {
+                "tool": str(tool.value),
+                "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p90_ms": round(percentile(samples, 90) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+                "peak_kib": round(peak / 1024, 1),
+            }
+            print(f"{label:>20}: p50 {results[label]['p50_ms']:9.2f} ms  p90 {results[label]['p90_ms']:9.2f} ms  "
+                  f"p99 {results[label]['p99_ms']:9.2f} ms  peak {results[label]['peak_kib']:9.1f} KiB")
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    if baseline["params"] != current["params"]:
+        print(f"warning: baseline was recorded with {baseline['params']}")
+    ok = True
+    print(f"\n{'case':>20}  {'baseline p50':>12}  {'current p50':>12}  ratio")
+    for label, result in current["results"].items():
+        base = baseline["results"].get(label)
+        if base is None:
+            print(f"{label:>20}  {'-':>12}  {result['p50_ms']:12.2f}  new")
+            continue
+        ratio = result["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{label:>20}  {base['p50_ms']:12.2f}  {result['p50_ms']:12.2f}  {ratio:5.2f}x{flag}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--branches", type=int, default=200)
+    parser.add_argument("--large-diff-files", type=int, default=1000)
+    parser.add_argument("--binary-files", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--memory-runs", type=int, default=3)
+    parser.add_argument("--save", type=Path, help="Write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="Compare against a saved JSON baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio of p50 counted as a regression")
+    args = parser.parse_args()
+
+    params = {
+        "commits": args.commits, "files": args.files, "branches": args.branches,
+        "large_diff_files": args.large_diff_files, "binary_files": args.binary_files, "seed": args.seed,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "repo"
+        start = time.perf_counter()
+        info = make_repo(path, **params)
+        print(f"generated repository in {time.perf_counter() - start:.1f} s: {params}")
+        results = anyio.run(run_cases, path, make_cases(path, info), args.runs, args.memory_runs)
+
+    git_version = subprocess.run(["git", "version"], capture_output=True, text=True).stdout.strip()
+    current = {
+        "params": params,
+        "environment": {"git": git_version, "python": platform.python_version(), "platform": platform.platform()},
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+    print(f"max RSS {current['max_rss_kib']} KiB")
+    if args.save:
+        args.save.write_text(json.dumps(current, indent=2) + "\n")
+    if args.compare and not compare(json.loads(args.compare.read_text()), current, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,85 @@ import click
 from pathlib import Path
 import logging
 import sys
-from .server import serve
+from .server import DEFAULT_METRICS_INTERVAL, serve
+from .worktrees import DEFAULT_MAX_WORKTREES, DEFAULT_WORKTREE_BUDGET, DEFAULT_WORKTREE_IDLE_TIMEOUT
 
 @click.command()
 @click.option("--repository", "-r", type=Path, help="Git repository path")
-@click.option("-v", "--verbose", count=True)
-def main(repository: Path | None, verbose: bool) -> None:
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Track worktree changes with inotify (Linux) so git_status and git_diff_unstaged only rescan touched paths",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    help="Seconds a tool call may run before it is cancelled and its git processes are killed",
+)
+@click.option(
+    "--cache-dir",
+    type=Path,
+    help="Directory for an on-disk cache of git_show and commit-to-commit git_diff output that survives restarts",
+)
+@click.option(
+    "--cache-size",
+    type=int,
+    default=256,
+    show_default=True,
+    help="Size budget of the on-disk cache in MiB",
+)
+@click.option(
+    "--metrics-file",
+    type=Path,
+    help="Periodically write tool metrics to this file in the OpenMetrics text format",
+)
+@click.option(
+    "--metrics-interval",
+    type=float,
+    default=DEFAULT_METRICS_INTERVAL,
+    show_default=True,
+    help="Seconds between writes of --metrics-file",
+)
+@click.option(
+    "--max-worktrees",
+    type=int,
+    default=DEFAULT_MAX_WORKTREES,
+    show_default=True,
+    help="Maximum number of pooled worktrees per repository handed out by git_worktree_acquire",
+)
+@click.option(
+    "--worktree-idle-timeout",
+    type=float,
+    default=DEFAULT_WORKTREE_IDLE_TIMEOUT,
+    show_default=True,
+    help="Seconds without a tool call after which a pooled worktree is removed",
+)
+@click.option(
+    "--worktree-budget",
+    type=int,
+    default=DEFAULT_WORKTREE_BUDGET // (1024 * 1024),
+    show_default=True,
+    help="Disk budget in MiB for idle pooled worktrees of each repository",
+)
+@click.option(
+    "-v",
+    "--verbose",
+    count=True,
+    help="-v logs a summary of every tool call, -vv also every git command it runs",
+)
+def main(
+    repository: Path | None,
+    watch: bool,
+    timeout: float | None,
+    cache_dir: Path | None,
+    cache_size: int,
+    metrics_file: Path | None,
+    metrics_interval: float,
+    max_worktrees: int,
+    worktree_idle_timeout: float,
+    worktree_budget: int,
+    verbose: bool,
+) -> None:
     """MCP Git Server - Git functionality for MCP"""
     import asyncio
 
@@ -18,7 +91,10 @@ def main(repository: Path | None, verbose: bool) -> None:
         logging_level = logging.DEBUG
 
     logging.basicConfig(level=logging_level, stream=sys.stderr)
-    asyncio.run(serve(repository))
+    asyncio.run(serve(
+        repository, watch, timeout, cache_dir, cache_size * 1024 * 1024, metrics_file, metrics_interval,
+        max_worktrees, worktree_idle_timeout, worktree_budget * 1024 * 1024,
+    ))
 
 if __name__ == "__main__":
     main()
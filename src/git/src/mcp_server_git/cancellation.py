@@ -0,0 +1,125 @@
+import contextvars
+import logging
+import os
+import signal
+import subprocess
+import threading
+from typing import Any, Callable, TypeVar
+
+import anyio
+import git.cmd
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+class Operation:
+    """The git subprocesses started on behalf of one tool call."""
+
+    def __init__(self) -> None:
+        self.cancelled = False
+        self.finished = threading.Event()
+        # Number of git processes started, including persistent ones
+        self.spawned = 0
+        self._procs: list[subprocess.Popen] = []
+        self._lock = threading.Lock()
+
+    def add(self, proc: subprocess.Popen) -> None:
+        with self._lock:
+            self._procs = [p for p in self._procs if p.poll() is None]
+            self._procs.append(proc)
+            if not self.cancelled:
+                return
+        kill_process(proc)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            procs, self._procs = self._procs, []
+        for proc in procs:
+            kill_process(proc)
+
+
+_current: contextvars.ContextVar[Operation | None] = contextvars.ContextVar("git_operation", default=None)
+
+
+def kill_process(proc: subprocess.Popen) -> None:
+    """Kill ``proc``, and everything it spawned if it leads its own process group."""
+    if proc.poll() is not None:
+        return
+    try:
+        if hasattr(os, "killpg") and os.getpgid(proc.pid) == proc.pid:
+            # Also stops hooks, external diff drivers and other helpers git spawned
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _is_persistent(command: Any) -> bool:
+    # GitPython keeps "cat-file --batch" processes alive across calls; they
+    # belong to the repository handle, not to any one operation.
+    return (
+        isinstance(command, (list, tuple))
+        and "cat-file" in command
+        and any(str(arg).startswith("--batch") for arg in command)
+    )
+
+
+_popen = git.cmd.safer_popen
+
+
+def _tracked_popen(command: Any, *args: Any, **kwargs: Any) -> subprocess.Popen:
+    operation = _current.get()
+    if operation is not None:
+        with operation._lock:
+            operation.spawned += 1
+        logger.debug(f"Running {command}")
+    if operation is None or _is_persistent(command):
+        return _popen(command, *args, **kwargs)
+    if operation.cancelled:
+        raise OperationCancelled("Operation was cancelled")
+    if hasattr(os, "killpg"):
+        kwargs.setdefault("start_new_session", True)
+    proc = _popen(command, *args, **kwargs)
+    operation.add(proc)
+    return proc
+
+
+# Every git command GitPython runs goes through this function
+git.cmd.safer_popen = _tracked_popen
+
+
+async def run_cancellable(fn: Callable[..., T], *args: Any, operation: Operation | None = None) -> T:
+    """Run ``fn`` in a worker thread, killing its git processes on cancellation.
+
+    When the calling task is cancelled, every git subprocess ``fn`` started is
+    killed together with its children, git calls it makes afterwards fail
+    with ``OperationCancelled``, and the thread is waited for before the
+    cancellation propagates, so nothing keeps running unobserved. Pass
+    ``operation`` to inspect it afterwards.
+    """
+    if operation is None:
+        operation = Operation()
+
+    def run() -> T:
+        token = _current.set(operation)
+        try:
+            return fn(*args)
+        finally:
+            _current.reset(token)
+            operation.finished.set()
+
+    try:
+        return await anyio.to_thread.run_sync(run, abandon_on_cancel=True)
+    except anyio.get_cancelled_exc_class():
+        operation.cancel()
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(operation.finished.wait)
+        raise
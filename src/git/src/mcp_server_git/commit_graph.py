@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import NamedTuple
+
+import git
+
+logger = logging.getLogger(__name__)
+
+
+class Ref(NamedTuple):
+    name: str
+    sha: str
+    symref: str
+
+
+def list_refs(repo: git.Repo, *patterns: str) -> list[Ref]:
+    """List refs matching ``patterns`` with one ``git for-each-ref`` call."""
+    output = repo.git.for_each_ref(
+        "--format=%(refname)%00%(objectname)%00%(symref)", *patterns
+    )
+    return [Ref(*line.split("\0")) for line in output.splitlines()]
+
+
+def refs_fingerprint(refs: list[Ref]) -> str:
+    digest = hashlib.sha1()
+    for ref in refs:
+        digest.update(f"{ref.name}\0{ref.sha}\0{ref.symref}\n".encode())
+    return digest.hexdigest()
+
+
+def _graph_files(objects_dir: str) -> list[str]:
+    info = os.path.join(objects_dir, "info")
+    chain = os.path.join(info, "commit-graphs", "commit-graph-chain")
+    try:
+        with open(chain) as f:
+            return [os.path.join(info, "commit-graphs", f"graph-{line.strip()}.graph") for line in f if line.strip()]
+    except FileNotFoundError:
+        pass
+    single = os.path.join(info, "commit-graph")
+    return [single] if os.path.exists(single) else []
+
+
+def has_changed_paths(objects_dir: str) -> bool:
+    """Whether every commit-graph layer carries changed-path Bloom filters."""
+    files = _graph_files(objects_dir)
+    if not files:
+        return False
+    for path in files:
+        try:
+            with open(path, "rb") as f:
+                # Signature, version, hash version, chunk count, base count,
+                # then a table of (chunk id, offset) entries
+                header = f.read(8)
+                if len(header) < 8 or header[:4] != b"CGPH":
+                    return False
+                table = f.read(12 * (header[6] + 1))
+        except OSError:
+            return False
+        ids = {table[i:i + 4] for i in range(0, len(table), 12)}
+        if b"BIDX" not in ids or b"BDAT" not in ids:
+            return False
+    return True
+
+
+class CommitGraph:
+    """Keeps a repository's commit-graph file up to date as its refs move.
+
+    The commit-graph stores parents, commit dates and generation numbers, which
+    lets git answer reachability questions without parsing every commit, and
+    changed-path Bloom filters, which let path-limited history skip commits
+    that cannot touch the path without diffing their trees. New commits are
+    appended as a split layer, so each refresh only costs the commits added
+    since the previous one. A graph written without Bloom filters is replaced
+    by one with them once.
+    """
+
+    def __init__(self, repo: git.Repo) -> None:
+        self.repo = repo
+        self._fingerprint: str | None = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Write a new commit-graph layer if the refs changed since the last call.
+
+        Every ref counts, whoever asks, so callers interested in different
+        refs do not take turns rewriting the graph.
+        """
+        with self._lock:
+            fingerprint = refs_fingerprint(list_refs(self.repo))
+            if fingerprint == self._fingerprint:
+                return False
+            args = ["write", "--reachable", "--changed-paths", "--no-progress"]
+            objects_dir = os.path.join(self.repo.common_dir, "objects")
+            args.append("--split" if has_changed_paths(objects_dir) else "--split=replace")
+            try:
+                self.repo.git.commit_graph(*args)
+            except git.GitCommandError as e:
+                # Read-only repositories still work, just without the speedup
+                logger.warning(f"Could not write commit-graph for {self.repo.git_dir}: {e}")
+            self._fingerprint = fingerprint
+            return True
@@ -0,0 +1,233 @@
+import logging
+import os
+import sqlite3
+import subprocess
+import threading
+from typing import IO, Any, Callable, Iterator, NamedTuple
+
+import git
+
+from .commit_graph import list_refs
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the schema changes; an index with another version is rebuilt
+SCHEMA_VERSION = 1
+
+# One commit per record: a marker, the fields below, then the touched paths
+INDEX_FORMAT = "%x01%H%x00%P%x00%an%x00%ae%x00%ad%x00%at%x00%ct%x00%s"
+
+SCHEMA = """
+CREATE TABLE commits (
+    sha TEXT PRIMARY KEY,
+    parents TEXT NOT NULL,
+    author_name TEXT NOT NULL,
+    author_email TEXT NOT NULL,
+    author_date TEXT NOT NULL,
+    author_time INTEGER NOT NULL,
+    commit_time INTEGER NOT NULL,
+    subject TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX commits_by_time ON commits (commit_time);
+CREATE TABLE paths (
+    path TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    PRIMARY KEY (path, sha)
+) WITHOUT ROWID;
+CREATE INDEX paths_by_commit ON paths (sha);
+CREATE TABLE tips (sha TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+
+
+class IndexedCommit(NamedTuple):
+    sha: str
+    author_name: str
+    author_email: str
+    author_date: str
+    subject: str
+
+
+def _records(stream: IO[bytes]) -> Iterator[tuple[list[str], list[str]]]:
+    """Parse ``git log -z --name-only --format=INDEX_FORMAT`` into (fields, paths)."""
+    buffer = b""
+    while True:
+        chunk = stream.read(64 * 1024)
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\x01")
+        for record in complete:
+            if record:
+                yield _parse(record)
+        if not chunk:
+            break
+    if buffer:
+        yield _parse(buffer)
+
+
+def _parse(record: bytes) -> tuple[list[str], list[str]]:
+    parts = record.decode("utf-8", errors="replace").split("\0")
+    fields, paths = parts[:8], parts[8:]
+    # Non-merge commits list their paths after a newline
+    return fields, [path.lstrip("\n") for path in paths if path.strip("\n")]
+
+
+def _prefix_end(prefix: str) -> str:
+    # The smallest string greater than every string that starts with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class CommitIndex:
+    """SQLite index of every commit reachable from the branches and HEAD.
+
+    Stores each commit's parents, author, dates, subject and the paths it
+    touched (merges touch none, as in ``git log``). ``refresh`` brings it up to
+    date with the refs: commits no longer reachable, for instance after a
+    force-push, are removed and new ones added, both with a walk that only
+    covers what changed since the tips indexed last time. When those tips
+    are gone from the repository, the index is rebuilt from scratch.
+    """
+
+    def __init__(self, repo: git.Repo, path: str | None = None) -> None:
+        self.repo = repo
+        if path is None:
+            path = os.path.join(repo.common_dir, "mcp-server-git", "commit-index.sqlite3")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            # Read-only repositories get an index that lasts as long as the handle
+            logger.warning(f"Could not open commit index at {path}: {e}")
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.db:
+            if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self._create()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _create(self) -> None:
+        for (table,) in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            self.db.execute(f"DROP TABLE {table}")
+        self.db.executescript(SCHEMA)
+        self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _current_tips(self) -> set[str]:
+        tips = {ref.sha for ref in list_refs(self.repo, "refs/heads", "refs/remotes")}
+        try:
+            tips.add(self.repo.git.rev_parse("--verify", "--quiet", "HEAD^{commit}"))
+        except git.GitCommandError:
+            # Unborn HEAD
+            pass
+        return tips
+
+    def _walk(self, command: Callable[..., Any], *args: str, include: set[str], exclude: set[str]) -> Any:
+        # Tips go through stdin, since there may be too many for a command line
+        proc = command(*args, "--stdin", as_process=True, istream=subprocess.PIPE)
+        assert proc.proc is not None and proc.proc.stdin is not None
+        proc.proc.stdin.write("".join(f"{sha}\n" for sha in include).encode())
+        proc.proc.stdin.write("".join(f"^{sha}\n" for sha in exclude).encode())
+        proc.proc.stdin.close()
+        return proc
+
+    def refresh(self) -> bool:
+        """Update the index to the current refs; return whether anything changed."""
+        with self._lock:
+            tips = self._current_tips()
+            indexed = {sha for (sha,) in self.db.execute("SELECT sha FROM tips")}
+            if tips == indexed:
+                return False
+            try:
+                with self.db:
+                    self._update(tips, indexed)
+            except git.GitCommandError as e:
+                # Anything else (a timeout, a cancellation) leaves the index
+                # as it was for the next call to retry
+                missing = self._missing(indexed)
+                if not missing:
+                    raise
+                logger.info(f"Rebuilding commit index for {self.repo.git_dir}, {len(missing)} tips are gone: {e}")
+                with self.db:
+                    self._create()
+                    self._update(tips, set())
+            return True
+
+    def _missing(self, shas: set[str]) -> set[str]:
+        proc = self.repo.git.cat_file("--batch-check", as_process=True, istream=subprocess.PIPE)
+        stdout, _ = proc.communicate("".join(f"{sha}\n" for sha in shas).encode())
+        return {line.split()[0] for line in stdout.decode().splitlines() if line.endswith(" missing")}
+
+    def _update(self, tips: set[str], indexed: set[str]) -> None:
+        if indexed - tips:
+            # Commits that were reachable from the old tips but no longer are
+            proc = self._walk(self.repo.git.rev_list, include=indexed - tips, exclude=tips)
+            assert proc.stdout is not None
+            gone = [(line.strip().decode(),) for line in proc.stdout]
+            proc.wait()
+            self.db.executemany("DELETE FROM paths WHERE sha = ?", gone)
+            self.db.executemany("DELETE FROM commits WHERE sha = ?", gone)
+
+        if tips - indexed:
+            proc = self._walk(
+                self.repo.git.log, "-z", "--name-only", "--no-renames", f"--format={INDEX_FORMAT}",
+                include=tips - indexed, exclude=indexed,
+            )
+            assert proc.stdout is not None
+            for fields, paths in _records(proc.stdout):
+                sha, parents, name, email, date, author_time, commit_time, subject = fields
+                self.db.execute(
+                    "INSERT OR IGNORE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sha, parents, name, email, date, int(author_time), int(commit_time), subject),
+                )
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO paths VALUES (?, ?)", [(path, sha) for path in paths]
+                )
+            proc.wait()
+
+        self.db.execute("DELETE FROM tips")
+        self.db.executemany("INSERT INTO tips VALUES (?)", [(sha,) for sha in tips])
+
+    def query(
+        self,
+        max_count: int,
+        author: str | None = None,
+        message: str | None = None,
+        paths: list[str] | None = None,
+        since: int | None = None,
+        until: int | None = None,
+    ) -> list[IndexedCommit]:
+        """Newest commits matching every filter given.
+
+        ``author`` and ``message`` are case-insensitive substrings of the
+        author's name or email and of the subject; ``paths`` are touched files
+        or directories, and an empty path matches every commit; ``since`` and ``until`` bound the commit time.
+        """
+        where, params = [], []
+        if author:
+            where.append("(instr(lower(author_name), ?) OR instr(lower(author_email), ?))")
+            params += [author.lower(), author.lower()]
+        if message:
+            where.append("instr(lower(subject), ?)")
+            params.append(message.lower())
+        if since is not None:
+            where.append("commit_time >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("commit_time <= ?")
+            params.append(until)
+        paths = [path.rstrip("/") for path in paths or []]
+        if paths and all(paths):
+            ranges = []
+            for path in paths:
+                # The file itself, or anything under the directory
+                ranges.append("(path = ? OR (path >= ? AND path < ?))")
+                params += [path, path + "/", _prefix_end(path + "/")]
+            where.append(
+                f"sha IN (SELECT sha FROM paths WHERE {' OR '.join(ranges)})"
+            )
+        sql = "SELECT sha, author_name, author_email, author_date, subject FROM commits"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY commit_time DESC, sha LIMIT ?"
+        params.append(max_count)
+        with self._lock:
+            return [IndexedCommit(*row) for row in self.db.execute(sql, params)]
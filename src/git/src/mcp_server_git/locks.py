@@ -0,0 +1,54 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import anyio
+
+
+class RWLock:
+    """Async readers-writer lock.
+
+    Any number of readers may hold the lock at once; a writer holds it alone.
+    Waiting writers block new readers, so a steady stream of reads cannot
+    starve a write.
+    """
+
+    def __init__(self) -> None:
+        self._condition = anyio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[None]:
+        async with self._condition:
+            while self._writer or self._waiting_writers:
+                await self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with anyio.CancelScope(shield=True):
+                async with self._condition:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[None]:
+        async with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    await self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+                # A cancelled writer may have been holding back readers
+                self._condition.notify_all()
+            self._writer = True
+        try:
+            yield
+        finally:
+            with anyio.CancelScope(shield=True):
+                async with self._condition:
+                    self._writer = False
+                    self._condition.notify_all()
@@ -0,0 +1,139 @@
+import logging
+import math
+import os
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Mapping
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the tool latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+METRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the OpenMetrics sense."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _bound(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(value)
+
+
+class Metrics:
+    """Per-tool call metrics, rendered in the OpenMetrics text format.
+
+    For every tool: a latency histogram, calls by outcome, git subprocesses
+    started and bytes of output returned. ``repo_stats`` and ``repo_open``
+    report how repository handles were obtained from the pool.
+    """
+
+    def __init__(
+        self,
+        repo_stats: Callable[[], Mapping[str, int]] = dict,
+        repo_open: Callable[[], int] = lambda: 0,
+    ) -> None:
+        self.latency: dict[str, Histogram] = {}
+        self.calls: Counter[tuple[str, str]] = Counter()
+        self.processes: Counter[str] = Counter()
+        self.output_bytes: Counter[str] = Counter()
+        self._repo_stats = repo_stats
+        self._repo_open = repo_open
+        self._lock = threading.Lock()
+
+    def record(self, tool: str, outcome: str, seconds: float, processes: int, output_bytes: int) -> None:
+        with self._lock:
+            self.latency.setdefault(tool, Histogram()).observe(seconds)
+            self.calls[tool, outcome] += 1
+            self.processes[tool] += processes
+            self.output_bytes[tool] += output_bytes
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# TYPE mcp_git_tool_duration_seconds histogram",
+                "# UNIT mcp_git_tool_duration_seconds seconds",
+                "# HELP mcp_git_tool_duration_seconds Time to complete a tool call.",
+            ]
+            for tool, histogram in sorted(self.latency.items()):
+                for bound, count in histogram.cumulative():
+                    lines.append(
+                        f'mcp_git_tool_duration_seconds_bucket{{tool="{_label(tool)}",le="{_bound(bound)}"}} {count}'
+                    )
+                lines.append(f'mcp_git_tool_duration_seconds_count{{tool="{_label(tool)}"}} {histogram.count}')
+                lines.append(f'mcp_git_tool_duration_seconds_sum{{tool="{_label(tool)}"}} {histogram.sum!r}')
+
+            lines += [
+                "# TYPE mcp_git_tool_calls counter",
+                "# HELP mcp_git_tool_calls Tool calls by outcome.",
+            ]
+            for (tool, outcome), count in sorted(self.calls.items()):
+                lines.append(f'mcp_git_tool_calls_total{{tool="{_label(tool)}",outcome="{outcome}"}} {count}')
+
+            lines += [
+                "# TYPE mcp_git_tool_processes counter",
+                "# HELP mcp_git_tool_processes Git subprocesses started by tool calls.",
+            ]
+            for tool, count in sorted(self.processes.items()):
+                lines.append(f'mcp_git_tool_processes_total{{tool="{_label(tool)}"}} {count}')
+
+            lines += [
+                "# TYPE mcp_git_tool_output_bytes counter",
+                "# UNIT mcp_git_tool_output_bytes bytes",
+                "# HELP mcp_git_tool_output_bytes UTF-8 bytes of tool output returned.",
+            ]
+            for tool, count in sorted(self.output_bytes.items()):
+                lines.append(f'mcp_git_tool_output_bytes_total{{tool="{_label(tool)}"}} {count}')
+
+        lines += [
+            "# TYPE mcp_git_repo_handles counter",
+            "# HELP mcp_git_repo_handles Repository handles by how they were obtained or released.",
+        ]
+        for event, count in sorted(self._repo_stats().items()):
+            lines.append(f'mcp_git_repo_handles_total{{event="{_label(event)}"}} {count}')
+        lines += [
+            "# TYPE mcp_git_repo_handles_open gauge",
+            "# HELP mcp_git_repo_handles_open Repository handles currently open.",
+            f"mcp_git_repo_handles_open {self._repo_open()}",
+            "# EOF",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Path) -> None:
+        """Atomically replace ``path`` with the current metrics."""
+        try:
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+import git
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of repository handles kept open at the same time
+DEFAULT_MAX_REPOS = 16
+
+# Seconds after which an unused repository handle is closed
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+T = TypeVar("T")
+
+# Per-repository helpers (indexes, caches, child processes) keyed by handle.
+# Values may reference their repository, so they are dropped explicitly by
+# close_repo_state() when the pool releases the handle.
+_repo_state: "weakref.WeakKeyDictionary[git.Repo, dict[str, Any]]" = weakref.WeakKeyDictionary()
+_repo_state_lock = threading.RLock()
+# Serialize building one helper without holding up lookups of any other
+_repo_state_builders: "weakref.WeakKeyDictionary[git.Repo, dict[str, threading.RLock]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def repo_state(repo: git.Repo, key: str, factory: Callable[[git.Repo], T]) -> T:
+    """Return the helper stored under ``key`` for ``repo``, creating it on first use.
+
+    Factories may be slow (a watcher walks the whole worktree), so they run
+    outside the lock that guards every repository's helpers.
+    """
+    with _repo_state_lock:
+        state = _repo_state.setdefault(repo, {})
+        if key in state:
+            return state[key]
+        builder = _repo_state_builders.setdefault(repo, {}).setdefault(key, threading.RLock())
+    with builder:
+        with _repo_state_lock:
+            state = _repo_state.setdefault(repo, {})
+            if key in state:
+                return state[key]
+        value = factory(repo)
+        with _repo_state_lock:
+            if _repo_state.get(repo) is state:
+                state[key] = value
+                return value
+        # The handle was released while the helper was being built
+        close = getattr(value, "close", None)
+        if close is not None:
+            close()
+        return value
+
+
+def close_repo_state(repo: git.Repo) -> None:
+    """Drop the helpers attached to ``repo``, closing those that hold resources."""
+    with _repo_state_lock:
+        state = _repo_state.pop(repo, {})
+        _repo_state_builders.pop(repo, None)
+    for value in state.values():
+        close = getattr(value, "close", None)
+        if close is not None:
+            close()
+
+
+@dataclass
+class PooledRepo:
+    repo: git.Repo
+    identity: tuple[int, ...]
+    last_used: float
+    # Tool calls using the handle, and whether it left the pool meanwhile
+    leases: int = 0
+    retired: bool = False
+
+
+def _identity(repo: git.Repo) -> tuple[int, ...]:
+    # Inodes get reused when a repository is deleted and recreated, so the
+    # config file's modification time is part of the identity too. A config
+    # change only costs a reopen. Linked worktrees share the main config.
+    st = os.stat(repo.git_dir)
+    config = os.stat(os.path.join(repo.common_dir, "config"))
+    return (st.st_dev, st.st_ino, config.st_ino, config.st_mtime_ns)
+
+
+class RepoPool:
+    """Bounded LRU pool of ``git.Repo`` handles keyed by resolved path.
+
+    Reusing a handle avoids re-discovering the git directory on every tool
+    call and keeps GitPython's persistent ``cat-file`` processes alive between
+    calls. Handles are closed when they are evicted, when they have been idle
+    for longer than ``idle_timeout`` seconds, or when the repository they point
+    to has been moved, deleted or replaced. A handle taken with ``acquire`` is
+    never reaped, and if it leaves the pool it is only closed by the last
+    ``release``.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_REPOS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._entries: OrderedDict[Path, PooledRepo] = OrderedDict()
+        self._leased: dict[int, PooledRepo] = {}
+        self._lock = threading.Lock()
+        # How handles were obtained and why they were closed
+        self.stats: Counter[str] = Counter()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, repo_path: object) -> bool:
+        if not isinstance(repo_path, (str, os.PathLike)):
+            return False
+        return Path(repo_path).resolve() in self._entries
+
+    def get(self, repo_path: str | os.PathLike[str]) -> git.Repo:
+        """Return a pooled handle for ``repo_path``, opening one if needed."""
+        return self._get(repo_path, lease=False)
+
+    def acquire(self, repo_path: str | os.PathLike[str]) -> git.Repo:
+        """Like ``get``, but the handle stays open until ``release``."""
+        return self._get(repo_path, lease=True)
+
+    def release(self, repo: git.Repo) -> None:
+        with self._lock:
+            entry = self._leased[id(repo)]
+            entry.leases -= 1
+            entry.last_used = self._clock()
+            if entry.leases:
+                return
+            del self._leased[id(repo)]
+            if entry.retired:
+                self._release(entry)
+
+    def _get(self, repo_path: str | os.PathLike[str], lease: bool) -> git.Repo:
+        key = Path(repo_path).resolve()
+        now = self._clock()
+        with self._lock:
+            self._reap_locked(now)
+
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_valid(entry):
+                logger.debug(f"Repository at {key} changed on disk, reopening")
+                self._retire(self._entries.pop(key))
+                self.stats["invalidated"] += 1
+                entry = None
+
+            if entry is None:
+                repo = git.Repo(key)
+                entry = PooledRepo(repo, _identity(repo), now)
+                self._entries[key] = entry
+                self.stats["opened"] += 1
+                while len(self._entries) > self.max_size:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._retire(evicted)
+                    self.stats["evicted"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats["reused"] += 1
+
+            entry.last_used = now
+            if lease:
+                entry.leases += 1
+                self._leased[id(entry.repo)] = entry
+            return entry.repo
+
+    def evict(self, repo_path: str | os.PathLike[str]) -> None:
+        key = Path(repo_path).resolve()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._retire(entry)
+
+    def reap(self) -> int:
+        """Close handles that have been idle for longer than the timeout."""
+        with self._lock:
+            return self._reap_locked(self._clock())
+
+    def close(self) -> None:
+        with self._lock:
+            while self._entries:
+                _, entry = self._entries.popitem()
+                self._retire(entry)
+
+    def _reap_locked(self, now: float) -> int:
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if not entry.leases and now - entry.last_used > self.idle_timeout
+        ]
+        for key in expired:
+            self._release(self._entries.pop(key))
+        self.stats["expired"] += len(expired)
+        return len(expired)
+
+    @staticmethod
+    def _is_valid(entry: PooledRepo) -> bool:
+        try:
+            return _identity(entry.repo) == entry.identity
+        except OSError:
+            return False
+
+    @classmethod
+    def _retire(cls, entry: PooledRepo) -> None:
+        if entry.leases:
+            # Closing would kill the cat-file processes of a running call
+            entry.retired = True
+        else:
+            cls._release(entry)
+
+    @staticmethod
+    def _release(entry: PooledRepo) -> None:
+        logger.debug(f"Closing repository handle for {entry.repo.git_dir}")
+        try:
+            close_repo_state(entry.repo)
+            entry.repo.close()
+        except Exception:
+            logger.exception(f"Failed to close repository {entry.repo.git_dir}")
@@ -0,0 +1,172 @@
+import subprocess
+import threading
+from collections import Counter, OrderedDict
+from typing import Iterable
+
+import git
+
+from .commit_graph import CommitGraph
+from .pool import repo_state
+
+# Maximum number of (ref tip, commit) answers remembered per repository
+DEFAULT_MAX_ANSWERS = 200_000
+
+
+class ReachabilityIndex:
+    """Cached answers to "can ref tip T reach commit C?" for one repository.
+
+    Answers are keyed by (tip, commit) object IDs, so they never go stale: a
+    ref that moves simply has a new tip. Missing answers for a commit are
+    computed for all uncached tips at once with a single ancestry-path walk
+    instead of one history walk per ref, on top of a commit-graph that is
+    refreshed whenever the refs change.
+    """
+
+    def __init__(self, repo: git.Repo, max_answers: int = DEFAULT_MAX_ANSWERS) -> None:
+        self.repo = repo
+        self.max_answers = max_answers
+        self.commit_graph = repo_state(repo, "commit_graph", CommitGraph)
+        self._answers: OrderedDict[tuple[str, str], bool] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        self.commit_graph.refresh()
+
+    def tips_containing(self, tips: Iterable[str], commit: str) -> set[str]:
+        """Return the subset of ``tips`` from which ``commit`` is reachable."""
+        tips = set(tips)
+        answers = {}
+        with self._lock:
+            for tip in tips:
+                key = (tip, commit)
+                if key in self._answers:
+                    self._answers.move_to_end(key)
+                    answers[tip] = self._answers[key]
+
+        missing = tips - answers.keys()
+        if missing:
+            reaching = self._walk(missing, commit)
+            fresh = {tip: tip in reaching for tip in missing}
+            with self._lock:
+                for tip, reachable in fresh.items():
+                    self._answers[(tip, commit)] = reachable
+                while len(self._answers) > self.max_answers:
+                    self._answers.popitem(last=False)
+            answers.update(fresh)
+
+        return {tip for tip, reachable in answers.items() if reachable}
+
+    def _walk(self, tips: set[str], commit: str) -> set[str]:
+        # Tips that descend from commit are exactly the tips that show up on
+        # the ancestry path between commit and any of the tips.
+        found = {commit} & tips
+        wanted = tips - found
+        if not wanted:
+            return found
+
+        proc = self.repo.git.rev_list(
+            "--ancestry-path", "--stdin", as_process=True, istream=subprocess.PIPE
+        )
+        assert proc.proc is not None
+        stdin, stdout = proc.proc.stdin, proc.proc.stdout
+        assert stdin is not None and stdout is not None
+        stdin.write(f"^{commit}\n".encode())
+        stdin.write("".join(f"{tip}\n" for tip in wanted).encode())
+        stdin.close()
+
+        for line in stdout:
+            sha = line.strip().decode()
+            if sha in wanted:
+                found.add(sha)
+                wanted.discard(sha)
+                if not wanted:
+                    break
+        if wanted:
+            proc.wait()
+        else:
+            proc.proc.kill()
+            proc.proc.wait()
+        return found
+
+
+def ahead_behind(repo: git.Repo, base: str, tips: Iterable[str]) -> dict[str, tuple[int, int]]:
+    """Count commits each tip has that ``base`` lacks, and the reverse.
+
+    All tips are counted in one ``rev-list --topo-order`` walk: every tip gets
+    a bit, and each commit's mask of the tips that reach it is pushed down to
+    its parents (children always come first in topological order). The walk
+    stops as soon as every commit still pending is reachable from all tips
+    and the base, since those count toward nobody.
+    """
+    bits = {sha: 1 << i for i, sha in enumerate(dict.fromkeys([base, *tips]))}
+    base_bit, full = bits[base], (1 << len(bits)) - 1
+    pending = dict(bits)
+    incomplete = sum(mask != full for mask in pending.values())
+    masks: Counter[int] = Counter()
+
+    proc = repo.git.rev_list(
+        "--topo-order", "--parents", "--stdin", as_process=True, istream=subprocess.PIPE
+    )
+    assert proc.proc is not None
+    stdin, stdout = proc.proc.stdin, proc.proc.stdout
+    assert stdin is not None and stdout is not None
+    stdin.write("".join(f"{sha}\n" for sha in bits).encode())
+    stdin.close()
+
+    finished = incomplete == 0
+    for line in stdout:
+        if finished:
+            break
+        sha, *parents = line.decode().split()
+        mask = pending.pop(sha)
+        if mask != full:
+            incomplete -= 1
+            masks[mask] += 1
+        for parent in parents:
+            old = pending.get(parent, full)
+            new = pending[parent] = pending.get(parent, 0) | mask
+            incomplete += (new != full) - (old != full)
+        finished = incomplete == 0
+    if finished:
+        proc.proc.kill()
+        proc.proc.wait()
+    else:
+        proc.wait()
+
+    # ahead = reached by the tip but not the base, behind = the reverse
+    ahead, shared = _BitCounters(), _BitCounters()
+    for mask, count in masks.items():
+        (shared if mask & base_bit else ahead).add(mask, count)
+    base_only = shared.get(base_bit)
+    return {
+        sha: (0, 0) if bit == base_bit else (ahead.get(bit), base_only - shared.get(bit))
+        for sha, bit in bits.items()
+    }
+
+
+class _BitCounters:
+    """One counter per bit position, added to a whole mask at a time.
+
+    The counters are stored bit-sliced: ``planes[k]`` holds bit k of every
+    counter, so adding a mask is a few big-integer operations however many
+    bits it has set.
+    """
+
+    def __init__(self) -> None:
+        self.planes: list[int] = []
+
+    def add(self, mask: int, count: int) -> None:
+        k = 0
+        while count:
+            if count & 1:
+                carry, plane = mask, k
+                while carry:
+                    if plane >= len(self.planes):
+                        self.planes.extend([0] * (plane + 1 - len(self.planes)))
+                    self.planes[plane], carry = self.planes[plane] ^ carry, self.planes[plane] & carry
+                    plane += 1
+            count >>= 1
+            k += 1
+
+    def get(self, bit: int) -> int:
+        return sum(1 << k for k, plane in enumerate(self.planes) if plane & bit)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Hashable
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_MEMORY_CHARS = 64 * 1024 * 1024
+DEFAULT_DISK_BUDGET = 256 * 1024 * 1024
+
+
+class ResultCache:
+    """Rendered tool output for immutable inputs, in memory and optionally on disk.
+
+    Keys must only contain resolved object IDs and render options, never
+    symbolic names such as branches, so an entry can never go stale. The disk
+    tier lives in ``directory``, survives restarts, and drops its least
+    recently used files once they exceed ``disk_budget`` bytes.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        disk_budget: int = DEFAULT_DISK_BUDGET,
+        max_entries: int = DEFAULT_MEMORY_ENTRIES,
+        max_chars: int = DEFAULT_MEMORY_CHARS,
+    ) -> None:
+        self.memory: LRUCache[str, str] = LRUCache(max_entries, max_chars, len)
+        self.directory = directory
+        self.disk_budget = disk_budget
+        self._disk: dict[str, tuple[int, int]] = {}
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            for entry in os.scandir(directory):
+                if entry.is_file() and not entry.name.startswith("."):
+                    st = entry.stat()
+                    self._disk[entry.name] = (st.st_size, st.st_mtime_ns)
+                    self._disk_size += st.st_size
+            self._trim()
+
+    @property
+    def disk_size(self) -> int:
+        return self._disk_size
+
+    @staticmethod
+    def _digest(key: tuple[Hashable, ...]) -> str:
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+    def get(self, key: tuple[Hashable, ...]) -> str | None:
+        digest = self._digest(key)
+        value = self.memory.get(digest)
+        if value is not None or self.directory is None:
+            return value
+        with self._lock:
+            if digest not in self._disk:
+                return None
+        path = self.directory / digest
+        try:
+            value = path.read_text(encoding="utf-8")
+            os.utime(path)
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            # Trimmed in the meantime, possibly by another server sharing
+            # the directory
+            self._forget(digest)
+            return None
+        with self._lock:
+            if digest in self._disk:
+                self._disk[digest] = (self._disk[digest][0], mtime)
+        self.memory.put(digest, value)
+        return value
+
+    def put(self, key: tuple[Hashable, ...], value: str) -> None:
+        digest = self._digest(key)
+        self.memory.put(digest, value)
+        if self.directory is None:
+            return
+        data = value.encode("utf-8")
+        if len(data) > self.disk_budget:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.directory / digest)
+            mtime = os.stat(self.directory / digest).st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Could not write result cache entry: {e}")
+            return
+        with self._lock:
+            old = self._disk.pop(digest, None)
+            if old is not None:
+                self._disk_size -= old[0]
+            self._disk[digest] = (len(data), mtime)
+            self._disk_size += len(data)
+            self._trim()
+
+    def _forget(self, digest: str) -> None:
+        with self._lock:
+            old = self._disk.pop(digest, None)
+            if old is not None:
+                self._disk_size -= old[0]
+
+    def _trim(self) -> None:
+        if self._disk_size <= self.disk_budget:
+            return
+        assert self.directory is not None
+        for digest, (size, _) in sorted(self._disk.items(), key=lambda item: item[1][1]):
+            try:
+                os.unlink(self.directory / digest)
+            except FileNotFoundError:
+                pass
+            del self._disk[digest]
+            self._disk_size -= size
+            if self._disk_size <= self.disk_budget:
+                break
@@ -1,7 +1,24 @@
+import base64
+import codecs
+import contextvars
+import functools
+import hashlib
+import json
 import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Sequence, Optional
+from typing import IO, TYPE_CHECKING, AsyncIterator, Callable, Iterator, Sequence, Optional
 from mcp.server import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.session import ServerSession
 from mcp.server.stdio import stdio_server
 from mcp.types import (
@@ -9,27 +26,163 @@ from mcp.types import (
     TextContent,
     Tool,
     ListRootsResult,
+    Resource,
     RootsCapability,
 )
 from enum import Enum
+import anyio
 import git
-from pydantic import BaseModel, Field
+from git.db import GitDB
+from pydantic import AnyUrl, BaseModel, Field
+
+from .cache import LRUCache
+from .cancellation import Operation, kill_process, run_cancellable
+from .commit_graph import CommitGraph, Ref, list_refs
+from .locks import RWLock
+from .metrics import METRICS_CONTENT_TYPE, Metrics
+from .pool import DEFAULT_IDLE_TIMEOUT, RepoPool, repo_state
+from .reachability import ReachabilityIndex, ahead_behind
+from .result_cache import DEFAULT_DISK_BUDGET, ResultCache
+from .worktrees import (
+    DEFAULT_MAX_WORKTREES,
+    DEFAULT_WORKTREE_BUDGET,
+    DEFAULT_WORKTREE_IDLE_TIMEOUT,
+    WorktreePool,
+)
+
+if TYPE_CHECKING:
+    from .watcher import WorktreeWatcher
+
+logger = logging.getLogger(__name__)
 
 # Default number of context lines to show in diff output
 DEFAULT_CONTEXT_LINES = 3
 
+# Summary modes accepted by the diff tools besides the default "patch"
+DIFF_SUMMARY_MODES = ("stat", "name-status", "numstat")
+
+# Values accepted for the diff algorithm and rename detection options
+DIFF_ALGORITHMS = ("myers", "minimal", "patience", "histogram")
+RENAME_MODES = ("off", "renames", "copies")
+
+# Computed diffs kept per repository for windowed reads
+DIFF_CACHE_MAX_ENTRIES = 16
+DIFF_CACHE_MAX_CHARS = 64 * 1024 * 1024
+
+# Bytes read from a git subprocess pipe at a time when streaming its output
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Per-file and total byte caps for patches returned by git_show
+DEFAULT_MAX_FILE_BYTES = 256 * 1024
+DEFAULT_MAX_TOTAL_BYTES = 1024 * 1024
+
+# Blame results kept per repository, keyed by blob, commit and line range
+BLAME_CACHE_MAX_ENTRIES = 256
+BLAME_CACHE_MAX_CHARS = 16 * 1024 * 1024
+
+# Default caps on the matches git_grep returns
+DEFAULT_GREP_MAX_MATCHES_PER_FILE = 20
+DEFAULT_GREP_MAX_MATCHES = 200
+# Most entries excluded from the search when resuming a git_grep page
+GREP_RESUME_MAX_EXCLUDES = 256
+
+# Keys structured git_branch output can be sorted by; prefix '-' for descending
+BRANCH_SORT_KEYS = ("name", "date", "ahead", "behind")
+
+# Everything structured git_branch reports about a ref, from one for-each-ref
+BRANCH_FORMAT = (
+    "%(refname)%00%(objectname)%00%(symref)%00%(HEAD)%00%(committerdate:unix)%00"
+    "%(committerdate:iso-strict)%00%(upstream:short)%00%(upstream:track,nobracket)"
+)
+
+# Leading bytes checked for NUL to detect binary blobs, as git itself does
+BINARY_SNIFF_BYTES = 8000
+
+# Commit header printed by git_show
+SHOW_FORMAT = "Commit: %H%nAuthor: %an <%ae>%nDate: %ad%nMessage: %B"
+
+# Commit fields emitted by git log, separated by NUL bytes
+LOG_FORMAT = "%H%x00%an%x00%ad%x00%s%x00%ct%x00%P"
+
+_SHA_RE = re.compile(r"[0-9a-f]{40}|[0-9a-f]{64}")
+
+# How git reports an object it would have fetched from a promisor remote
+_LAZY_FETCH_RE = re.compile(r"could not fetch ([0-9a-f]{40}|[0-9a-f]{64}) from promisor remote")
+
+NOT_PRESENT_NOTE = "[... some file contents are not present in this partial clone and were not fetched; showing changed files instead ...]"
+
 class GitStatus(BaseModel):
     repo_path: str
+    structured: bool = Field(
+        False,
+        description="Return JSON parsed from 'git status --porcelain=v2' with branch ahead/behind counts instead of human-readable text"
+    )
+    untracked_cache: bool = Field(
+        False,
+        description="Enable core.untrackedCache so later calls skip rescanning unchanged directories for untracked files"
+    )
+    fsmonitor: bool = Field(
+        False,
+        description="Use git's built-in filesystem monitor daemon, where the platform supports it"
+    )
+    untracked_files: str = Field(
+        "normal",
+        description="How to report untracked files: 'no', 'normal' or 'all'"
+    )
+    offset: int = Field(
+        0,
+        description="Number of structured entries to skip"
+    )
+    limit: Optional[int] = Field(
+        None,
+        description="Maximum number of structured entries to return"
+    )
+
+class DiffTuning(BaseModel):
+    algorithm: Optional[str] = Field(
+        None,
+        description="Diff algorithm: 'myers', 'minimal', 'patience' or 'histogram'. Defaults to git's configuration"
+    )
+    renames: Optional[str] = Field(
+        None,
+        description="Rename detection: 'off', 'renames' or 'copies' (also detects copies). Defaults to git's configuration"
+    )
+    rename_limit: Optional[int] = Field(
+        None,
+        description="Skip exhaustive rename detection when more than this many files changed"
+    )
+    time_budget: Optional[float] = Field(
+        None,
+        description="Seconds the diff may take. When exceeded, a name-status listing without rename detection is returned instead, with a note saying so"
+    )
 
-class GitDiffUnstaged(BaseModel):
+class DiffWindow(DiffTuning):
+    mode: str = Field(
+        "patch",
+        description="Output mode: 'patch' for the unified diff, or 'stat', 'name-status' or 'numstat' for a cheap summary of its shape"
+    )
+    paths: Optional[list[str]] = Field(
+        None,
+        description="Only diff these files or directories"
+    )
+    offset: int = Field(
+        0,
+        description="Number of output lines to skip, for reading a large diff in windows"
+    )
+    limit: Optional[int] = Field(
+        None,
+        description="Maximum number of output lines to return"
+    )
+
+class GitDiffUnstaged(DiffWindow):
     repo_path: str
     context_lines: int = DEFAULT_CONTEXT_LINES
 
-class GitDiffStaged(BaseModel):
+class GitDiffStaged(DiffWindow):
     repo_path: str
     context_lines: int = DEFAULT_CONTEXT_LINES
 
-class GitDiff(BaseModel):
+class GitDiff(DiffWindow):
     repo_path: str
     target: str
     context_lines: int = DEFAULT_CONTEXT_LINES
@@ -56,6 +209,34 @@ class GitLog(BaseModel):
         None,
         description="End timestamp for filtering commits. Accepts: ISO 8601 format (e.g., '2024-01-15T14:30:25'), relative dates (e.g., '2 weeks ago', 'yesterday'), or absolute dates (e.g., '2024-01-15', 'Jan 15 2024')"
     )
+    paths: Optional[list[str]] = Field(
+        None,
+        description="Only show commits that touch these paths"
+    )
+    first_parent: bool = Field(
+        False,
+        description="Follow only the first parent of merge commits"
+    )
+    follow: bool = Field(
+        False,
+        description="Continue the history of a single file across renames, naming the file as of each commit. Needs exactly one path"
+    )
+    cursor: Optional[str] = Field(
+        None,
+        description="Cursor returned by a previous git_log call. Resumes the walk where that page ended, with the same filters; the other filter arguments are ignored"
+    )
+    use_index: bool = Field(
+        False,
+        description="Answer from a commit index covering all branches and HEAD instead of walking history from HEAD. The index is built on first use and kept up to date incrementally. Paths match files or whole directories; first_parent and cursor are not supported"
+    )
+    author: Optional[str] = Field(
+        None,
+        description="With use_index: only commits whose author name or email contains this text, ignoring case"
+    )
+    message: Optional[str] = Field(
+        None,
+        description="With use_index: only commits whose subject contains this text, ignoring case"
+    )
 
 class GitCreateBranch(BaseModel):
     repo_path: str
@@ -66,11 +247,142 @@ class GitCheckout(BaseModel):
     repo_path: str
     branch_name: str
 
-class GitShow(BaseModel):
+class GitWorktreeAcquire(BaseModel):
+    repo_path: str
+    revision: str = Field(
+        "HEAD",
+        description="Commit to check out, detached unless branch or new_branch is given",
+    )
+    branch: Optional[str] = Field(
+        None,
+        description="Existing branch to check out. Git refuses a branch that another worktree has checked out",
+    )
+    new_branch: Optional[str] = Field(
+        None,
+        description="Branch to create at revision and check out",
+    )
+
+class GitWorktreeRelease(BaseModel):
+    repo_path: str = Field(
+        ...,
+        description="Path of a worktree returned by git_worktree_acquire. Its uncommitted changes are discarded",
+    )
+
+class GitShow(DiffTuning):
     repo_path: str
     revision: str
+    stat_only: bool = Field(
+        False,
+        description="Only show the diffstat instead of the full patch"
+    )
+    max_file_bytes: int = Field(
+        DEFAULT_MAX_FILE_BYTES,
+        description="Maximum bytes of patch to show per file; the rest is replaced by a truncation marker"
+    )
+    max_total_bytes: int = Field(
+        DEFAULT_MAX_TOTAL_BYTES,
+        description="Maximum bytes of output in total; files beyond it are omitted"
+    )
+
 
 
+class GitReadFile(BaseModel):
+    repo_path: str
+    paths: list[str] = Field(
+        ...,
+        description="Files to read, relative to the repository root"
+    )
+    revision: str = Field(
+        "HEAD",
+        description="Commit to read the files from. An empty string reads the staged version from the index"
+    )
+    start_byte: Optional[int] = Field(
+        None,
+        description="Return content starting at this byte offset (0-based)"
+    )
+    end_byte: Optional[int] = Field(
+        None,
+        description="Return content up to this byte offset (exclusive)"
+    )
+    start_line: Optional[int] = Field(
+        None,
+        description="Return content starting at this line (1-based); cannot be combined with byte offsets"
+    )
+    end_line: Optional[int] = Field(
+        None,
+        description="Return content up to and including this line"
+    )
+    max_bytes: int = Field(
+        DEFAULT_MAX_FILE_BYTES,
+        description="Maximum number of content bytes returned per file"
+    )
+    size_only: bool = Field(
+        False,
+        description="Only report each file's blob ID and size"
+    )
+
+class GitGrep(BaseModel):
+    repo_path: str
+    pattern: str
+    revision: Optional[str] = Field(
+        None,
+        description="Search this commit's tree instead of the working tree, without checking it out. With pickaxe, the commit history is walked from here (default: HEAD)"
+    )
+    cached: bool = Field(
+        False,
+        description="Search the staged contents in the index instead of the working tree"
+    )
+    fixed_strings: bool = Field(
+        False,
+        description="Treat the pattern as a literal string instead of a regular expression. Not supported with pickaxe 'G'"
+    )
+    ignore_case: bool = Field(
+        False,
+        description="Match case-insensitively"
+    )
+    paths: Optional[list[str]] = Field(
+        None,
+        description="Only search these files or directories"
+    )
+    pickaxe: Optional[str] = Field(
+        None,
+        description="Search history instead of contents: 'S' finds commits that change how often the pattern occurs, 'G' finds commits whose diff adds or removes lines matching it"
+    )
+    threads: Optional[int] = Field(
+        None,
+        description="Number of threads git grep uses (default: git's own choice)"
+    )
+    max_matches_per_file: int = Field(
+        DEFAULT_GREP_MAX_MATCHES_PER_FILE,
+        description="Maximum number of matching lines reported per file"
+    )
+    max_matches: int = Field(
+        DEFAULT_GREP_MAX_MATCHES,
+        description="Maximum number of matches (or commits, with pickaxe) returned per call"
+    )
+    cursor: Optional[str] = Field(
+        None,
+        description="Cursor returned by a previous git_grep call. Continues that search; the other search arguments are ignored"
+    )
+
+class GitBlame(BaseModel):
+    repo_path: str
+    path: str = Field(
+        ...,
+        description="File to blame, relative to the repository root",
+    )
+    revision: str = Field(
+        "HEAD",
+        description="Commit whose version of the file is blamed",
+    )
+    start_line: Optional[int] = Field(
+        None,
+        description="First line to blame (1-based)",
+    )
+    end_line: Optional[int] = Field(
+        None,
+        description="Last line to blame (inclusive)",
+    )
 
 class GitBranch(BaseModel):
     repo_path: str = Field(
@@ -89,6 +401,51 @@ class GitBranch(BaseModel):
         None,
         description="The commit sha that branch should NOT contain. Do not pass anything to this param if no commit sha is specified",
     )
+    structured: bool = Field(
+        False,
+        description="Return JSON with each branch's tip sha, tip commit date, upstream and ahead/behind counts instead of 'git branch' text"
+    )
+    base: Optional[str] = Field(
+        None,
+        description="With structured, also count how many commits each branch is ahead of and behind this revision, e.g. 'main'"
+    )
+    sort: str = Field(
+        "name",
+        description="With structured, sort by 'name', 'date', 'ahead' or 'behind' (the last two need base); prefix '-' for descending, e.g. '-date' for most recent first"
+    )
+    offset: int = Field(
+        0,
+        description="Number of structured branches to skip"
+    )
+    limit: Optional[int] = Field(
+        None,
+        description="Maximum number of structured branches to return"
+    )
+
+class BatchOperation(BaseModel):
+    tool: str = Field(
+        ...,
+        description="Name of the tool to run, e.g. 'git_status'",
+    )
+    arguments: dict = Field(
+        default_factory=dict,
+        description="Arguments for the tool. repo_path is taken from the batch",
+    )
+
+class GitBatch(BaseModel):
+    repo_path: str
+    operations: list[BatchOperation] = Field(
+        ...,
+        description="Operations to run in order against the same repository",
+    )
+    parallel: bool = Field(
+        True,
+        description="Run consecutive read-only operations concurrently. Operations that modify the repository always run on their own, after everything before them",
+    )
+    stop_on_error: bool = Field(
+        True,
+        description="Skip the remaining operations once one fails",
+    )
 
 
 class GitTools(str, Enum):
@@ -105,69 +462,696 @@ class GitTools(str, Enum):
     SHOW = "git_show"
 
     BRANCH = "git_branch"
+    BLAME = "git_blame"
+    GREP = "git_grep"
+    READ_FILE = "git_read_file"
+    BATCH = "git_batch"
+    WORKTREE_ACQUIRE = "git_worktree_acquire"
+    WORKTREE_RELEASE = "git_worktree_release"
+
+# Tools that change the index, HEAD or refs and so need the repository to themselves
+MUTATING_TOOLS = frozenset({
+    GitTools.ADD,
+    GitTools.COMMIT,
+    GitTools.RESET,
+    GitTools.CREATE_BRANCH,
+    GitTools.CHECKOUT,
+    GitTools.WORKTREE_ACQUIRE,
+    GitTools.WORKTREE_RELEASE,
+})
+
+# Read-only batch operations run at the same time
+BATCH_MAX_PARALLEL = 4
+
+def _is_mutating(name: str, arguments: dict) -> bool:
+    if name == GitTools.BATCH:
+        return any(op.get("tool") in MUTATING_TOOLS for op in arguments.get("operations", []))
+    return name in MUTATING_TOOLS
+
+def _read_nul_tokens(stream: IO[bytes]) -> Iterator[str]:
+    """Incrementally split a stream into NUL-terminated tokens."""
+    pending = b""
+    while chunk := stream.read1(STREAM_CHUNK_SIZE):  # type: ignore[attr-defined]
+        *tokens, pending = (pending + chunk).split(b"\0")
+        for token in tokens:
+            yield token.decode("utf-8", errors="replace")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+def _read_nul_records(stream: IO[bytes], fields: int) -> Iterator[list[str]]:
+    """Incrementally parse NUL-separated records of ``fields`` fields each."""
+    record: list[str] = []
+    for token in _read_nul_tokens(stream):
+        record.append(token)
+        if len(record) == fields:
+            yield record
+            record = []
+
+@functools.cache
+def _builtin_fsmonitor_supported() -> bool:
+    # The fsmonitor daemon is only built on platforms git supports it on
+    return "feature: fsmonitor--daemon" in git.Git().version("--build-options")
+
+def _status_config(untracked_cache: bool, fsmonitor: bool) -> list[str]:
+    config = []
+    if untracked_cache:
+        config.append("core.untrackedCache=true")
+    if fsmonitor and _builtin_fsmonitor_supported():
+        config.append("core.fsmonitor=true")
+    return config
 
-def git_status(repo: git.Repo) -> str:
-    return repo.git.status()
+def _status_git(repo: git.Repo, config: list[str]) -> git.Git:
+    # repo.git(c=...) would store the options on the handle's Git object,
+    # shared with other threads, whose next command could take them instead.
+    if not config:
+        return repo.git
+    g = git.Git(repo.working_dir)
+    g.update_environment(**repo.git.environment())
+    return g(c=config)
 
-def git_diff_unstaged(repo: git.Repo, context_lines: int = DEFAULT_CONTEXT_LINES) -> str:
-    return repo.git.diff(f"--unified={context_lines}")
+def _parse_status_entry(token: str, tokens: Iterator[str]) -> dict:
+    kind, _, rest = token.partition(" ")
+    match kind:
+        case "1":
+            xy, _sub, _mh, _mi, _mw, _hh, _hi, path = rest.split(" ", 7)
+            return {"status": xy, "path": path}
+        case "2":
+            xy, _sub, _mh, _mi, _mw, _hh, _hi, score, path = rest.split(" ", 8)
+            return {"status": xy, "path": path, "orig_path": next(tokens), "score": score}
+        case "u":
+            xy, _sub, _m1, _m2, _m3, _mw, _h1, _h2, _h3, path = rest.split(" ", 9)
+            return {"status": xy, "path": path, "unmerged": True}
+        case "?":
+            return {"status": "??", "path": rest}
+        case "!":
+            return {"status": "!!", "path": rest}
+        case _:
+            raise ValueError(f"Unexpected git status entry: {token}")
+
+def _literal_pathspec(paths: list[str]) -> list[str]:
+    # An empty path list must match nothing rather than everything
+    return [f":(literal){path}" for path in paths] or [":(exclude)*"]
+
+def _structured_status(
+    repo: git.Repo,
+    config: list[str],
+    untracked_files: str,
+    offset: int,
+    limit: int | None,
+    pathspec: list[str] | None = None,
+) -> tuple[str, set[str]]:
+    """Return the JSON status and the set of paths it reported."""
+    proc = _status_git(repo, config).status(
+        "--porcelain=v2", "-z", "--branch", f"--untracked-files={untracked_files}",
+        "--", *(pathspec or []), as_process=True
+    )
+    branch: dict = {}
+    entries = []
+    changed = set()
+    total = 0
+    tokens = _read_nul_tokens(proc.stdout)
+    for token in tokens:
+        if token.startswith("# "):
+            key, _, value = token[2:].partition(" ")
+            match key:
+                case "branch.oid" | "branch.head" | "branch.upstream":
+                    branch[key.removeprefix("branch.")] = value
+                case "branch.ab":
+                    ahead, behind = value.split()
+                    branch["ahead"], branch["behind"] = int(ahead), -int(behind)
+            continue
+        # Entries outside the window are parsed only far enough to stay aligned
+        entry = _parse_status_entry(token, tokens)
+        changed.add(entry["path"])
+        if "orig_path" in entry:
+            changed.add(entry["orig_path"])
+        if total >= offset and (limit is None or len(entries) < limit):
+            entries.append(entry)
+        total += 1
+    proc.wait()
+
+    result = {"branch": branch, "entries": entries, "offset": offset, "total": total}
+    if offset + len(entries) < total:
+        result["next_offset"] = offset + len(entries)
+    return json.dumps(result, indent=2), changed
+
+def _watch_fingerprint(repo: git.Repo) -> tuple[str, str]:
+    # Status compares the worktree against the index and the index against
+    # HEAD; the watcher only sees worktree changes, so either of these moving
+    # invalidates what it knows.
+    try:
+        head = repo.git.rev_parse("--verify", "-q", "HEAD")
+    except git.GitCommandError:
+        head = "unborn"
+    return _index_id(repo), head
+
+def git_status(
+    repo: git.Repo,
+    structured: bool = False,
+    untracked_cache: bool = False,
+    fsmonitor: bool = False,
+    untracked_files: str = "normal",
+    offset: int = 0,
+    limit: int | None = None,
+    watcher: "WorktreeWatcher | None" = None,
+) -> str:
+    if untracked_files not in ("no", "normal", "all"):
+        raise ValueError(f"Invalid untracked_files mode: {untracked_files}")
+    config = _status_config(untracked_cache, fsmonitor)
+    if watcher is None:
+        if structured:
+            return _structured_status(repo, config, untracked_files, offset, limit)[0]
+        return _status_git(repo, config).status(f"--untracked-files={untracked_files}")
+
+    # Only re-examine the paths that were dirty last time or touched since
+    paths = watcher.begin_scan(_watch_fingerprint(repo), untracked_files)
+    pathspec = None if paths is None else _literal_pathspec(paths)
+    try:
+        result, changed = _structured_status(repo, config, untracked_files, offset, limit, pathspec)
+        # Taken afterwards because status refreshes stat data in the index
+        fingerprint = _watch_fingerprint(repo)
+    except BaseException:
+        # Failed, timed out or cancelled: the touched paths still need a look
+        watcher.abort_scan()
+        raise
+    watcher.end_scan(fingerprint, changed, untracked_files)
+    if structured:
+        return result
+    return _status_git(repo, config).status(
+        f"--untracked-files={untracked_files}", "--", *_literal_pathspec(sorted(changed))
+    )
+
+def _diff_mode_args(mode: str, context_lines: int) -> list[str]:
+    if mode == "patch":
+        return [f"--unified={context_lines}"]
+    if mode in DIFF_SUMMARY_MODES:
+        return [f"--{mode}"]
+    raise ValueError(f"Invalid diff mode: {mode}")
+
+def _diff_tuning_args(algorithm: str | None, renames: str | None, rename_limit: int | None) -> list[str]:
+    args = []
+    if algorithm is not None:
+        if algorithm not in DIFF_ALGORITHMS:
+            raise ValueError(f"Invalid diff algorithm: {algorithm}")
+        args.append(f"--diff-algorithm={algorithm}")
+    if renames is not None:
+        if renames not in RENAME_MODES:
+            raise ValueError(f"Invalid rename detection mode: {renames}")
+        args.append({"off": "--no-renames", "renames": "--find-renames", "copies": "--find-copies"}[renames])
+    if rename_limit is not None:
+        args.append(f"-l{rename_limit}")
+    return args
+
+@contextmanager
+def _deadline(proc: subprocess.Popen, seconds: float | None) -> Iterator[threading.Event]:
+    """Kill ``proc`` if it still runs after ``seconds``; the event tells whether it did."""
+    expired = threading.Event()
+    if seconds is None:
+        yield expired
+        return
+
+    def expire() -> None:
+        if proc.poll() is None:
+            expired.set()
+            kill_process(proc)
+
+    timer = threading.Timer(seconds, expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield expired
+    finally:
+        timer.cancel()
+
+def _over_budget_note(seconds: float) -> str:
+    return f"[... diff did not finish within {seconds:g} seconds; showing changed files without rename detection instead ...]"
+
+def _is_partial_clone(repo: git.Repo) -> bool:
+    try:
+        config = repo.git.config("--get-regexp", r"^(extensions\.partialclone|remote\..*\.promisor)$")
+    except git.GitCommandError:
+        # Nothing matched
+        return False
+    for line in config.splitlines():
+        key, _, value = line.partition(" ")
+        if key == "extensions.partialclone" or value.lower() in ("", "true", "yes", "on", "1"):
+            return True
+    return False
+
+def _disable_lazy_fetch(repo: git.Repo) -> bool:
+    """Stop git from fetching missing objects of a partial clone on demand.
+
+    Applies to every command the handle runs, including its persistent
+    cat-file processes. Returns whether the repository is a partial clone.
+    """
+    partial = _is_partial_clone(repo)
+    if partial:
+        repo.git.update_environment(GIT_NO_LAZY_FETCH="1")
+    return partial
+
+def _missing_object(error: git.GitCommandError) -> str | None:
+    match = _LAZY_FETCH_RE.search(str(error.stderr))
+    return match.group(1) if match else None
+
+def _missing_objects(repo: git.Repo, shas: set[str]) -> set[str]:
+    """Return the objects among ``shas`` that are not in the local object store.
+
+    Looks at loose objects and pack indexes directly, since asking git
+    about a missing object of a partial clone makes it try to fetch it.
+    """
+    db, lock = repo_state(repo, "local_odb", lambda r: (
+        GitDB(os.path.join(r.common_dir, "objects")), threading.Lock()
+    ))
+    with lock:
+        missing = {sha for sha in shas if not db.has_object(bytes.fromhex(sha))}
+        if missing:
+            # The pack list is read once; look again in case a fetch or
+            # repack outside this handle has added the objects since
+            db.update_cache(force=True)
+            missing = {sha for sha in missing if not db.has_object(bytes.fromhex(sha))}
+        return missing
+
+def _annotate_raw(repo: git.Repo, text: str) -> str:
+    """Turn ``--raw`` diff lines into name-status lines, marking files whose contents are missing."""
+    entries = []
+    for line in text.splitlines():
+        if line.startswith(":"):
+            meta, _, path = line.partition("\t")
+            _, _, old, new, status = meta.split()
+            entries.append(([old, new], status, path))
+        else:
+            entries.append((None, None, line))
+    missing = _missing_objects(repo, {
+        sha for shas, _, _ in entries if shas for sha in shas if sha.strip("0")
+    })
+    lines = []
+    for shas, status, path in entries:
+        if shas is None:
+            lines.append(path)
+        elif missing.intersection(shas):
+            lines.append(f"{status}\t{path}\t(not present locally)")
+        else:
+            lines.append(f"{status}\t{path}")
+    return "\n".join(lines)
 
-def git_diff_staged(repo: git.Repo, context_lines: int = DEFAULT_CONTEXT_LINES) -> str:
-    return repo.git.diff(f"--unified={context_lines}", "--cached")
+def _index_id(repo: git.Repo) -> str:
+    # The index ends with a checksum of its contents; the stat data covers
+    # index.skipHash, where that checksum is all zeros.
+    path = os.path.join(repo.git_dir, "index")
+    try:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            f.seek(max(st.st_size - 20, 0))
+            return f"{f.read().hex()}:{st.st_size}:{st.st_mtime_ns}"
+    except FileNotFoundError:
+        return "no-index"
 
-def git_diff(repo: git.Repo, target: str, context_lines: int = DEFAULT_CONTEXT_LINES) -> str:
-    return repo.git.diff(f"--unified={context_lines}", target)
+def _worktree_id(repo: git.Repo, paths: list[str]) -> str:
+    # Files that differ from the index, plus their current stat data, pin
+    # down every worktree byte a diff against the index can show.
+    changed = repo.git.diff_files("-z", "--name-only", "--", *paths, stdout_as_string=False)
+    digest = hashlib.sha1(changed)
+    for name in changed.split(b"\0"):
+        if name:
+            try:
+                st = os.lstat(os.path.join(repo.working_dir, os.fsdecode(name)))
+                digest.update(f"{st.st_size}:{st.st_mtime_ns}:{st.st_ino}".encode())
+            except FileNotFoundError:
+                digest.update(b"deleted")
+    return digest.hexdigest()
+
+def _windowed_diff(
+    repo: git.Repo,
+    make_key: Callable[[], tuple],
+    options: list[str],
+    operands: list[str],
+    offset: int,
+    limit: int | None,
+    results: ResultCache | None = None,
+    time_budget: float | None = None,
+) -> str:
+    """Return lines [offset, offset + limit) of ``git diff *options *operands``.
+
+    The full diff is computed once and cached under the key returned by
+    ``make_key``, which identifies everything the diff depends on, so reading
+    the following windows is free. Diffs between commits are also kept in
+    ``results``, which outlives the repository handle. A diff that takes
+    longer than ``time_budget`` seconds, or that needs file contents a
+    partial clone does not have, is replaced by an uncached listing of the
+    changed files.
+    """
+    cache = repo_state(repo, "diff_cache", lambda _: LRUCache[tuple, list[str]](
+        DIFF_CACHE_MAX_ENTRIES, DIFF_CACHE_MAX_CHARS, lambda lines: sum(map(len, lines))
+    ))
+    key = make_key()
+    lines = cache.get(key)
+    if lines is None and results is not None:
+        text = results.get((repo.git_dir, *key))
+        if text is not None:
+            lines = text.splitlines()
+            cache.put(key, lines)
+    note = None
+    if lines is None:
+        proc = repo.git.diff(*options, *operands, as_process=True)
+        not_present = False
+        with _deadline(proc.proc, time_budget) as expired:
+            output = proc.stdout.read()
+            try:
+                proc.wait()
+            except git.GitCommandError as e:
+                not_present = _missing_object(e) is not None
+                if not expired.is_set() and not not_present:
+                    raise
+        if expired.is_set():
+            # Only a time budget can expire
+            assert time_budget is not None
+            output = repo.git.diff("--name-status", "--no-renames", *operands, stdout_as_string=False)
+            lines = output.decode("utf-8", errors="replace").splitlines()
+            note = _over_budget_note(time_budget)
+        elif not_present:
+            # Listing the changes only needs trees, which a blobless clone has
+            raw = repo.git.diff("--raw", "--no-abbrev", "--no-renames", *operands)
+            lines = _annotate_raw(repo, raw).splitlines()
+            note = NOT_PRESENT_NOTE
+        else:
+            lines = output.decode("utf-8", errors="replace").splitlines()
+            cache.put(key, lines)
+            if results is not None:
+                results.put((repo.git_dir, *key), "\n".join(lines))
+            # git diff refreshes stale stat data in the index as a side effect,
+            # which changes the key the next window will be looked up with.
+            refreshed_key = make_key()
+            if refreshed_key != key:
+                cache.put(refreshed_key, lines)
+
+    if offset <= 0 and (limit is None or limit >= len(lines)):
+        text = "\n".join(lines)
+    else:
+        window = lines[offset:] if limit is None else lines[offset:offset + limit]
+        end = offset + len(window)
+        text = "\n".join(window)
+        if end < len(lines):
+            text += f"\n[... showing lines {offset + 1}-{end} of {len(lines)}; pass offset={end} for more ...]"
+        else:
+            text += f"\n[... showing lines {offset + 1}-{end} of {len(lines)} ...]"
+    return f"{note}\n{text}" if note else text
+
+def git_diff_unstaged(
+    repo: git.Repo,
+    context_lines: int = DEFAULT_CONTEXT_LINES,
+    mode: str = "patch",
+    paths: list[str] | None = None,
+    offset: int = 0,
+    limit: int | None = None,
+    watcher: "WorktreeWatcher | None" = None,
+    algorithm: str | None = None,
+    renames: str | None = None,
+    rename_limit: int | None = None,
+    time_budget: float | None = None,
+) -> str:
+    args = [*_diff_mode_args(mode, context_lines), *_diff_tuning_args(algorithm, renames, rename_limit)]
+    if not paths and watcher is not None:
+        pending = watcher.pending_paths(_watch_fingerprint(repo))
+        if pending is not None:
+            paths = _literal_pathspec(pending)
+    paths = paths or []
+    make_key = lambda: ("unstaged", _index_id(repo), _worktree_id(repo, paths), *args, "--", *paths)
+    return _windowed_diff(repo, make_key, args, ["--", *paths], offset, limit, time_budget=time_budget)
+
+def git_diff_staged(
+    repo: git.Repo,
+    context_lines: int = DEFAULT_CONTEXT_LINES,
+    mode: str = "patch",
+    paths: list[str] | None = None,
+    offset: int = 0,
+    limit: int | None = None,
+    algorithm: str | None = None,
+    renames: str | None = None,
+    rename_limit: int | None = None,
+    time_budget: float | None = None,
+) -> str:
+    paths = paths or []
+    args = [*_diff_mode_args(mode, context_lines), *_diff_tuning_args(algorithm, renames, rename_limit)]
+    try:
+        head = repo.git.rev_parse("--verify", "-q", "HEAD^{tree}")
+    except git.GitCommandError:
+        head = "unborn"
+    make_key = lambda: ("staged", head, _index_id(repo), *args, "--cached", "--", *paths)
+    return _windowed_diff(repo, make_key, args, ["--cached", "--", *paths], offset, limit, time_budget=time_budget)
+
+def git_diff(
+    repo: git.Repo,
+    target: str,
+    context_lines: int = DEFAULT_CONTEXT_LINES,
+    mode: str = "patch",
+    paths: list[str] | None = None,
+    offset: int = 0,
+    limit: int | None = None,
+    results: ResultCache | None = None,
+    algorithm: str | None = None,
+    renames: str | None = None,
+    rename_limit: int | None = None,
+    time_budget: float | None = None,
+) -> str:
+    paths = paths or []
+    mode_args = [*_diff_mode_args(mode, context_lines), *_diff_tuning_args(algorithm, renames, rename_limit)]
+    operands = ["--end-of-options", target, "--", *paths]
+    # A single revision is compared with the worktree; a range (A..B, A...B)
+    # only depends on the commits it resolves to, so its output never changes.
+    resolved = repo.git.rev_parse("--revs-only", "--end-of-options", target).split()
+    if len(resolved) <= 1:
+        make_key = lambda: ("diff", *resolved, _index_id(repo), _worktree_id(repo, paths), *mode_args, *operands)
+        results = None
+    else:
+        range_kind = "..." if "..." in target else ".."
+        make_key = lambda: ("diff", range_kind, *resolved, *mode_args, "--", *paths)
+    return _windowed_diff(repo, make_key, mode_args, operands, offset, limit, results, time_budget)
+
+def _stdin_file(data: bytes) -> IO[bytes]:
+    f = tempfile.TemporaryFile()
+    f.write(data)
+    f.seek(0)
+    return f
+
+def _default_identity(repo: git.Repo) -> dict[str, str]:
+    # git refuses to commit without a configured identity, where GitPython's
+    # index.commit fell back to its default actor; keep doing the latter.
+    env = {}
+    for role, actor in (("AUTHOR", git.Actor.author), ("COMMITTER", git.Actor.committer)):
+        try:
+            repo.git.var(f"GIT_{role}_IDENT")
+        except git.GitCommandError:
+            default = actor(repo.config_reader())
+            env[f"GIT_{role}_NAME"] = default.name or ""
+            env[f"GIT_{role}_EMAIL"] = default.email or ""
+    return env
 
 def git_commit(repo: git.Repo, message: str) -> str:
-    commit = repo.index.commit(message)
-    return f"Changes committed successfully with hash {commit.hexsha}"
+    # Native git keeps split and sparse indexes intact and runs the usual
+    # hooks. The message is stored exactly as given, and commits without
+    # changes or without a message are still made.
+    env = _default_identity(repo)
+    with _stdin_file(message.encode()) as f:
+        repo.git.commit(
+            "--file=-", "--cleanup=verbatim", "--allow-empty", "--allow-empty-message", istream=f, env=env
+        )
+    return f"Changes committed successfully with hash {repo.git.rev_parse('HEAD')}"
 
 def git_add(repo: git.Repo, files: list[str]) -> str:
-    if files == ["."]:
-        repo.git.add(".")
-    else:
-        repo.index.add(files)
+    # Paths go through stdin, so any number of them fits in one command
+    with _stdin_file(b"".join(os.fsencode(path) + b"\0" for path in files)) as f:
+        repo.git.add("--pathspec-from-file=-", "--pathspec-file-nul", istream=f)
     return "Files staged successfully"
 
 def git_reset(repo: git.Repo) -> str:
-    repo.index.reset()
+    # Native git keeps a sparse index sparse and never needs file contents
+    repo.git.reset("--quiet")
     return "All staged changes reset"
 
-def git_log(repo: git.Repo, max_count: int = 10, start_timestamp: Optional[str] = None, end_timestamp: Optional[str] = None) -> list[str]:
-    if start_timestamp or end_timestamp:
-        # Use git log command with date filtering
-        args = []
-        if start_timestamp:
-            args.extend(['--since', start_timestamp])
-        if end_timestamp:
-            args.extend(['--until', end_timestamp])
-        args.extend(['--format=%H%n%an%n%ad%n%s%n'])
-        
-        log_output = repo.git.log(*args).split('\n')
-        
-        log = []
-        # Process commits in groups of 4 (hash, author, date, message)
-        for i in range(0, len(log_output), 4):
-            if i + 3 < len(log_output) and len(log) < max_count:
-                log.append(
-                    f"Commit: {log_output[i]}\n"
-                    f"Author: {log_output[i+1]}\n"
-                    f"Date: {log_output[i+2]}\n"
-                    f"Message: {log_output[i+3]}\n"
-                )
-        return log
+def _encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode()
+
+def _decode_cursor(cursor: str, tool: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid {tool} cursor: {cursor}")
+    if not isinstance(state, dict):
+        raise ValueError(f"Invalid {tool} cursor: {cursor}")
+    return state
+
+def _decode_log_cursor(cursor: str) -> dict:
+    state = _decode_cursor(cursor, "git_log")
+    try:
+        shas = [*state["f"], *state["x"]]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid git_log cursor: {cursor}")
+    if not all(isinstance(sha, str) and _SHA_RE.fullmatch(sha) for sha in shas):
+        raise ValueError(f"Invalid git_log cursor: {cursor}")
+    return state
+
+def _read_log_records(
+    stream: IO[bytes], follow: bool
+) -> Iterator[tuple[list[str], tuple[str, str] | None]]:
+    """Parse ``git log -z --format=LOG_FORMAT`` output, with ``--name-status`` when following.
+
+    Yields each commit's fields and, when following, the file's name in that
+    commit and in its parent, which is where following continues from.
+    """
+    tokens = _read_nul_tokens(stream)
+    for token in tokens:
+        fields = [token, *(next(tokens) for _ in range(5))]
+        if not follow:
+            yield fields, None
+            continue
+        status = next(tokens).lstrip("\n")
+        path = next(tokens)
+        if status[:1] in ("R", "C"):
+            yield fields, (next(tokens), path)
+        else:
+            yield fields, (path, path)
+
+def _ensure_commit_graph(repo: git.Repo) -> None:
+    # Path-limited walks use the changed-path Bloom filters to skip commits,
+    # topological walks the generation numbers to stream without a full walk
+    graph = repo_state(repo, "commit_graph", CommitGraph)
+    graph.refresh()
+
+def git_log(
+    repo: git.Repo,
+    max_count: int = 10,
+    start_timestamp: Optional[str] = None,
+    end_timestamp: Optional[str] = None,
+    paths: list[str] | None = None,
+    first_parent: bool = False,
+    cursor: str | None = None,
+    follow: bool = False,
+) -> tuple[list[str], str | None]:
+    """Return up to ``max_count`` log entries and a cursor for the next page.
+
+    The cursor records the walk's frontier (commits that are queued but not
+    yet shown) rather than HEAD, so following pages cost O(page) and stay
+    consistent when HEAD moves in between. Commits that git may reach again
+    from the frontier because of equal or skewed commit dates are carried in
+    the cursor and skipped. When following a file, the cursor also carries
+    the name it had at the end of the page.
+    """
+    if cursor is not None:
+        state = _decode_log_cursor(cursor)
+        frontier, skip = state["f"], state["x"]
+        first_parent, paths = state["fp"], state["p"]
+        start_timestamp, end_timestamp = state["s"], state["u"]
+        follow = state.get("fo", False)
+        if not frontier:
+            return [], None
     else:
-        # Use existing logic for simple log without date filtering
-        commits = list(repo.iter_commits(max_count=max_count))
-        log = []
-        for commit in commits:
-            log.append(
-                f"Commit: {commit.hexsha!r}\n"
-                f"Author: {commit.author!r}\n"
-                f"Date: {commit.authored_datetime}\n"
-                f"Message: {commit.message!r}\n"
-            )
-        return log
+        frontier, skip = None, []
+    if follow and len(paths or []) != 1:
+        raise ValueError("follow needs exactly one path")
+
+    # Ask for one extra commit to know whether another page exists. --parents
+    # makes %P report rewritten parents when paths simplify the history.
+    args = ["-z", "--parents", f"--max-count={max_count + 1 + len(skip)}", f"--format={LOG_FORMAT}"]
+    if start_timestamp:
+        args.append(f"--since={start_timestamp}")
+    if end_timestamp:
+        args.append(f"--until={end_timestamp}")
+    if first_parent:
+        args.append("--first-parent")
+    if follow:
+        args.extend(["--follow", "--name-status"])
+    args.extend(frontier if frontier is not None else ["HEAD"])
+    args.append("--")
+    args.extend(paths or [])
+    if paths:
+        _ensure_commit_graph(repo)
+
+    # Stream the output so memory stays flat no matter how long the history is
+    proc = repo.git.log(*args, as_process=True)
+    log = []
+    shown: list[str] = []
+    pending = dict.fromkeys(frontier or [])
+    has_more = False
+    for (sha, author, date, subject, timestamp, parents), names in _read_log_records(proc.stdout, follow):
+        if sha in skip:
+            continue
+        if len(log) == max_count:
+            has_more = True
+            break
+        entry = (
+            f"Commit: {sha}\n"
+            f"Author: {author}\n"
+            f"Date: {date}\n"
+            f"Message: {subject}\n"
+        )
+        if names is not None:
+            entry += f"Path: {names[0]}\n"
+            paths = [names[1]]
+        log.append(entry)
+        shown.append(sha)
+        parent_shas = parents.split()
+        pending.update(dict.fromkeys(parent_shas[:1] if first_parent else parent_shas))
+    if has_more:
+        proc.proc.kill()
+        proc.proc.wait()
+    else:
+        proc.wait()
+
+    if not has_more or not shown:
+        # Nothing shown (max_count=0) leaves nowhere to resume from
+        return log, None
+    for shown_sha in [*shown, *skip]:
+        pending.pop(shown_sha, None)
+    # Only shown commits the frontier still reaches can be walked into again,
+    # whatever their dates. Those it cannot reach are exactly the ones listed
+    # here, and the walk stays within the already shown part of the history.
+    candidates = [*dict.fromkeys([*skip, *shown])]
+    unreachable = set(repo.git.rev_list(*candidates, "--not", *pending).split()) if pending else set(candidates)
+    skip = [shown_sha for shown_sha in candidates if shown_sha not in unreachable]
+    return log, _encode_cursor({
+        "f": list(pending),
+        "x": skip,
+        "fp": first_parent,
+        "p": paths,
+        "s": start_timestamp,
+        "u": end_timestamp,
+        "fo": follow,
+    })
+
+def _approxidate(repo: git.Repo, option: str, value: str) -> int:
+    # git parses the date exactly as git log --since/--until would
+    return int(repo.git.rev_parse(f"--{option}={value}").partition("=")[2])
+
+def git_log_indexed(
+    repo: git.Repo,
+    max_count: int = 10,
+    start_timestamp: Optional[str] = None,
+    end_timestamp: Optional[str] = None,
+    paths: list[str] | None = None,
+    author: str | None = None,
+    message: str | None = None,
+) -> list[str]:
+    """Return up to ``max_count`` log entries matching the filters from the commit index."""
+    # Imported here so that sqlite3 is only loaded once the index is used
+    from .commit_index import CommitIndex
+
+    index = repo_state(repo, "commit_index", CommitIndex)
+    index.refresh()
+    commits = index.query(
+        max_count,
+        author,
+        message,
+        paths,
+        _approxidate(repo, "since", start_timestamp) if start_timestamp else None,
+        _approxidate(repo, "until", end_timestamp) if end_timestamp else None,
+    )
+    return [
+        f"Commit: {commit.sha}\n"
+        f"Author: {commit.author_name}\n"
+        f"Date: {commit.author_date}\n"
+        f"Message: {commit.subject}\n"
+        for commit in commits
+    ]
 
 def git_create_branch(repo: git.Repo, branch_name: str, base_branch: str | None = None) -> str:
     if base_branch:
@@ -179,137 +1163,792 @@ def git_create_branch(repo: git.Repo, branch_name: str, base_branch: str | None
     return f"Created branch '{branch_name}' from '{base.name}'"
 
 def git_checkout(repo: git.Repo, branch_name: str) -> str:
-    repo.git.checkout(branch_name)
+    # Switching branches needs the target's files, so a partial clone may
+    # fetch them here
+    with repo.git.custom_environment(GIT_NO_LAZY_FETCH=None):
+        repo.git.checkout(branch_name)
     return f"Switched to branch '{branch_name}'"
 
 
 
-def git_show(repo: git.Repo, revision: str) -> str:
-    commit = repo.commit(revision)
-    output = [
-        f"Commit: {commit.hexsha!r}\n"
-        f"Author: {commit.author!r}\n"
-        f"Date: {commit.authored_datetime!r}\n"
-        f"Message: {commit.message!r}\n"
+def _read_patch(proc, max_file_bytes: int, max_total_bytes: int) -> str:
+    """Read a patch from a git process with per-file and total byte caps.
+
+    The patch is consumed in bounded chunks and only the part that is returned
+    is ever held in memory. Once the total cap is reached the process is
+    killed so git does not keep generating output nobody reads.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    output: list[str] = []
+    total = 0
+    file_bytes = 0
+    file_skipped = 0
+    at_line_start = True
+
+    def flush_file_marker() -> None:
+        nonlocal total
+        if file_skipped:
+            marker = f"[... {file_skipped} more bytes of this file's diff truncated ...]\n"
+            output.append(marker)
+            total += len(marker)
+
+    while chunk := proc.stdout.readline(STREAM_CHUNK_SIZE):
+        if at_line_start and chunk.startswith(b"diff --git "):
+            flush_file_marker()
+            file_bytes = file_skipped = 0
+        at_line_start = chunk.endswith(b"\n")
+
+        if file_skipped or file_bytes + len(chunk) > max_file_bytes:
+            file_skipped += len(chunk)
+            continue
+        if total + len(chunk) > max_total_bytes:
+            output.append(decoder.decode(b"", final=True))
+            output.append(f"\n[... output truncated at {total} bytes; remaining files omitted ...]\n")
+            proc.proc.kill()
+            proc.proc.wait()
+            return "".join(output)
+        file_bytes += len(chunk)
+        total += len(chunk)
+        output.append(decoder.decode(chunk))
+
+    output.append(decoder.decode(b"", final=True))
+    flush_file_marker()
+    proc.wait()
+    return "".join(output)
+
+def git_show(
+    repo: git.Repo,
+    revision: str,
+    stat_only: bool = False,
+    max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+    max_total_bytes: int = DEFAULT_MAX_TOTAL_BYTES,
+    results: ResultCache | None = None,
+    algorithm: str | None = None,
+    renames: str | None = None,
+    rename_limit: int | None = None,
+    time_budget: float | None = None,
+) -> str:
+    tuning = _diff_tuning_args(algorithm, renames, rename_limit)
+    key = None
+    if results is not None:
+        # A commit's output only depends on its ID and the render options
+        commit = repo.git.rev_parse("--verify", "--end-of-options", f"{revision}^{{commit}}")
+        key = (repo.git_dir, "show", commit, stat_only, max_file_bytes, max_total_bytes, *tuning)
+        cached = results.get(key)
+        if cached is not None:
+            return cached
+        revision = commit
+
+    # Merges are diffed against their first parent. git flags binary files
+    # itself, so their contents are never loaded.
+    common = ["--no-color", "--no-ext-diff", "--diff-merges=first-parent", f"--format={SHOW_FORMAT}"]
+    operands = ["--end-of-options", f"{revision}^{{commit}}"]
+    proc = repo.git.show(*common, "--stat" if stat_only else "--patch", *tuning, *operands, as_process=True)
+    not_present = False
+    with _deadline(proc.proc, time_budget) as expired:
+        try:
+            output = _read_patch(proc, max_file_bytes, max_total_bytes)
+        except git.GitCommandError as e:
+            not_present = _missing_object(e) is not None
+            if not expired.is_set() and not not_present:
+                raise
+            output = ""
+    if expired.is_set():
+        # Only a time budget can expire
+        assert time_budget is not None
+        listing = repo.git.show(*common, "--name-status", "--no-renames", *operands)
+        return f"{_over_budget_note(time_budget)}\n{listing}"
+    if not_present:
+        listing = repo.git.show(*common, "--raw", "--no-abbrev", "--no-renames", *operands)
+        return f"{NOT_PRESENT_NOTE}\n{_annotate_raw(repo, listing)}"
+    if results is not None and key is not None:
+        results.put(key, output)
+    return output
+
+def _blob_chunks(head: bytes, stream) -> Iterator[bytes]:
+    if head:
+        yield head
+    while chunk := stream.read(STREAM_CHUNK_SIZE):
+        yield chunk
+
+def _slice_bytes(chunks: Iterator[bytes], size: int, start: int, end: int | None, max_bytes: int) -> tuple[bytes, bool]:
+    out = bytearray()
+    offset = 0
+    limit = start + max_bytes if end is None else min(end, start + max_bytes)
+    for chunk in chunks:
+        lo, hi = max(start - offset, 0), min(limit - offset, len(chunk))
+        if lo < hi:
+            out += chunk[lo:hi]
+        offset += len(chunk)
+        if offset >= limit:
+            break
+    # The blob's size, not how far the chunks got, tells whether bytes the
+    # caller asked for were cut off: a chunk may end exactly at the limit
+    truncated = (end is None or end > limit) and size > limit
+    return bytes(out), truncated
+
+def _slice_lines(chunks: Iterator[bytes], start: int, end: int | None, max_bytes: int) -> tuple[bytes, bool]:
+    out = bytearray()
+    lineno = 1
+    pending = b""
+    for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if lineno >= start:
+                out += line + b"\n"
+                if len(out) > max_bytes:
+                    return bytes(out[:max_bytes]), True
+            lineno += 1
+            if end is not None and lineno > end:
+                return bytes(out), False
+    if pending and lineno >= start:
+        out += pending
+    return bytes(out[:max_bytes]), len(out) > max_bytes
+
+def _read_blob(
+    repo: git.Repo,
+    spec: str,
+    byte_range: tuple[int, int | None] | None,
+    line_range: tuple[int, int | None] | None,
+    max_bytes: int,
+    size_only: bool,
+) -> str:
+    if repo_state(repo, "partial_clone", _disable_lazy_fetch):
+        # Without lazy fetching, cat-file exits rather than answering for an
+        # object the partial clone lacks, so look before asking
+        try:
+            sha = repo.git.rev_parse("--verify", "--quiet", "--end-of-options", spec)
+        except git.GitCommandError:
+            return f"== {spec} ==\nNot found"
+        if _missing_objects(repo, {sha}):
+            return f"== {spec} ({sha}) ==\nNot present locally; this partial clone does not fetch missing objects"
+
+    # Both lookups go to git cat-file processes that stay alive for the
+    # lifetime of the pooled handle, so a read costs a pipe round trip
+    # rather than a process spawn. They are not safe to share between
+    # threads, hence the lock.
+    with repo_state(repo, "cat_file_lock", lambda _: threading.Lock()):
+        try:
+            sha, kind, size = repo.git.get_object_header(spec)
+        except ValueError:
+            return f"== {spec} ==\nNot found"
+        # GitPython hands back the raw header fields as bytes
+        sha, kind = os.fsdecode(sha), os.fsdecode(kind)
+        header = f"== {spec} ({kind} {sha}, {size} bytes) =="
+        if kind != "blob":
+            return f"{header}\nNot a file"
+        if size_only:
+            return header
+
+        _, _, _, stream = repo.git.stream_object_data(sha)
+        try:
+            head = stream.read(min(size, BINARY_SNIFF_BYTES))
+            if b"\0" in head:
+                return f"{header}\nBinary file, content not shown"
+            chunks = _blob_chunks(head, stream)
+            if line_range is not None:
+                content, truncated = _slice_lines(chunks, *line_range, max_bytes)
+            else:
+                content, truncated = _slice_bytes(chunks, size, *(byte_range or (0, None)), max_bytes)
+        finally:
+            # The rest of the blob has to be consumed to keep the batch
+            # process's output in step
+            while stream.read(STREAM_CHUNK_SIZE):
+                pass
+
+    text = f"{header}\n{content.decode('utf-8', errors='replace')}"
+    if truncated:
+        text += f"\n[... truncated at {max_bytes} bytes; request a later range for more ...]"
+    return text
+
+def git_read_file(
+    repo: git.Repo,
+    paths: list[str],
+    revision: str = "HEAD",
+    start_byte: int | None = None,
+    end_byte: int | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+    max_bytes: int = DEFAULT_MAX_FILE_BYTES,
+    size_only: bool = False,
+) -> str:
+    byte_range = line_range = None
+    if start_byte is not None or end_byte is not None:
+        if start_line is not None or end_line is not None:
+            raise ValueError("Specify either a byte range or a line range, not both")
+        byte_range = (start_byte or 0, end_byte)
+    elif start_line is not None or end_line is not None:
+        line_range = (start_line or 1, end_line)
+    return "\n\n".join(
+        _read_blob(repo, f"{revision}:{path}", byte_range, line_range, max_bytes, size_only)
+        for path in paths
+    )
+
+def _grep_contents(repo: git.Repo, query: dict, threads: int | None, max_matches: int, after: tuple[str, int] | None) -> tuple[list[str], dict | None]:
+    args = ["--no-color", "-I", "-z", "-n", "--full-name"]
+    # git grep only has --max-count from git 2.38 on; older ones get every
+    # match and the extra ones are dropped here
+    native_max_count = repo.git.version_info >= (2, 38)
+    if native_max_count:
+        args.append(f"--max-count={query['m']}")
+    if threads is not None:
+        args.append(f"--threads={threads}")
+    args.append("--fixed-strings" if query["fixed"] else "--extended-regexp")
+    if query["icase"]:
+        args.append("--ignore-case")
+    if query["cached"]:
+        args.append("--cached")
+    args += ["-e", query["pattern"]]
+    if query["rev"] is not None:
+        args.append(query["rev"])
+    excludes = _grep_resume_excludes(repo, query, after[0]) if after is not None else []
+    proc = repo.git.grep(*args, "--", *query["paths"], *excludes, as_process=True)
+
+    # Output is in path order even when searching with several threads, so
+    # a (path, matches already returned) pair marks where a page ended.
+    prefix = f"{query['rev']}:" if query["rev"] is not None else ""
+    matches: list[str] = []
+    position = None
+    for raw in proc.stdout:
+        path, lineno, text = raw.decode("utf-8", errors="replace").rstrip("\n").split("\0", 2)
+        path = path.removeprefix(prefix)
+        seen = position[1] + 1 if position is not None and position[0] == path else 1
+        if not native_max_count and seen > query["m"]:
+            continue
+        position = (path, seen)
+        if after is not None and (path, seen) <= after:
+            continue
+        if len(matches) == max_matches:
+            break
+        matches.append(f"{path}:{lineno}: {text}")
+    else:
+        position = None
+
+    if position is not None:
+        proc.proc.kill()
+        proc.proc.wait()
+        return matches, {"q": query, "p": position[0], "n": position[1] - 1}
+    try:
+        proc.wait()
+    except git.GitCommandError as e:
+        # Exit status 1 just means nothing matched
+        if e.status != 1:
+            raise
+    return matches, None
+
+def _grep_resume_excludes(repo: git.Repo, query: dict, resume: str) -> list[str]:
+    """Exclude pathspecs for the files a later page no longer needs to search.
+
+    Every file sorted before ``resume`` is covered by the entry where its path
+    first differs from ``resume``: a sibling of ``resume`` or of one of its
+    parent directories. Listing the files is far cheaper than searching
+    them, which is what a resumed page would otherwise do before reaching
+    ``resume``. Matches are still filtered by position, so the list may be
+    cut short.
+    """
+    if query["rev"] is not None:
+        listing = repo.git.ls_tree("-r", "-z", "--name-only", "--full-name", query["rev"], "--", *query["paths"])
+    else:
+        listing = repo.git.ls_files("-z", "--full-name", "--", *query["paths"])
+    parts = resume.split("/")
+    covered = set()
+    for path in listing.split("\0"):
+        if not path or path >= resume:
+            continue
+        path_parts = path.split("/")
+        depth = next((i for i, (a, b) in enumerate(zip(path_parts, parts)) if a != b), None)
+        if depth is None:
+            # A file where resume has a directory, or the reverse: the index
+            # changed since the last page
+            continue
+        covered.add("/".join(path_parts[:depth + 1]))
+    # Entries closer to the root cover the most files
+    covered = sorted(covered, key=lambda entry: (entry.count("/"), entry))[:GREP_RESUME_MAX_EXCLUDES]
+    return [f":(exclude,literal){entry}" for entry in covered]
+
+def _grep_history(repo: git.Repo, query: dict, max_matches: int, skip: int) -> tuple[list[str], dict | None]:
+    args = [f"-{query['pickaxe']}{query['pattern']}"]
+    if query["pickaxe"] == "S" and not query["fixed"]:
+        args.append("--pickaxe-regex")
+    if query["icase"]:
+        args.append("--regexp-ignore-case")
+    proc = repo.git.log(
+        "-z", "--format=%H%x00%an%x00%ad%x00%s", f"--skip={skip}", f"--max-count={max_matches + 1}",
+        *args, query["rev"], "--", *query["paths"], as_process=True,
+    )
+    commits = [
+        f"{sha} {author} {date}: {subject}"
+        for sha, author, date, subject in _read_nul_records(proc.stdout, 4)
     ]
-    if commit.parents:
-        parent = commit.parents[0]
-        diff = parent.diff(commit, create_patch=True)
+    proc.wait()
+    if len(commits) > max_matches:
+        return commits[:max_matches], {"q": query, "s": skip + max_matches}
+    return commits, None
+
+def git_grep(
+    repo: git.Repo,
+    pattern: str,
+    revision: str | None = None,
+    cached: bool = False,
+    fixed_strings: bool = False,
+    ignore_case: bool = False,
+    paths: list[str] | None = None,
+    pickaxe: str | None = None,
+    threads: int | None = None,
+    max_matches_per_file: int = DEFAULT_GREP_MAX_MATCHES_PER_FILE,
+    max_matches: int = DEFAULT_GREP_MAX_MATCHES,
+    cursor: str | None = None,
+) -> tuple[list[str], str | None]:
+    """Search contents with ``git grep``, or history with ``git log -S/-G``.
+
+    Returns the matches and a cursor for the next page, if there is one.
+    """
+    if cursor is not None:
+        state = _decode_cursor(cursor, "git_grep")
+        query = state.get("q")
+        if not isinstance(query, dict):
+            raise ValueError(f"Invalid git_grep cursor: {cursor}")
     else:
-        diff = commit.diff(git.NULL_TREE, create_patch=True)
-    for d in diff:
-        output.append(f"\n--- {d.a_path}\n+++ {d.b_path}\n")
-        output.append(d.diff.decode('utf-8'))
-    return "".join(output)
+        if pickaxe not in (None, "S", "G"):
+            raise ValueError(f"Invalid pickaxe mode: {pickaxe}")
+        if pickaxe is not None and cached:
+            raise ValueError("pickaxe searches history and cannot be combined with cached")
+        if pickaxe == "G" and fixed_strings:
+            # -G always takes a regular expression; -S can match literally
+            raise ValueError("fixed_strings cannot be combined with pickaxe 'G'; use pickaxe 'S'")
+        if revision is not None and cached:
+            raise ValueError("Specify either revision or cached, not both")
+        if pickaxe is not None and revision is None:
+            revision = "HEAD"
+        # Pin the revision so later pages search the same tree
+        rev = None
+        if revision is not None:
+            rev = repo.git.rev_parse("--verify", "--end-of-options", f"{revision}^{{commit}}")
+        query = {
+            "pattern": pattern, "rev": rev, "cached": cached, "fixed": fixed_strings,
+            "icase": ignore_case, "paths": paths or [], "pickaxe": pickaxe, "m": max_matches_per_file,
+        }
+        state = {}
 
-def git_branch(repo: git.Repo, branch_type: str, contains: str | None = None, not_contains: str | None = None) -> str:
-    match contains:
-        case None:
-            contains_sha = (None,)
-        case _:
-            contains_sha = ("--contains", contains)
+    if query.get("pickaxe") is not None:
+        matches, next_state = _grep_history(repo, query, max_matches, int(state.get("s", 0)))
+    else:
+        after = (state["p"], int(state["n"])) if "p" in state else None
+        matches, next_state = _grep_contents(repo, query, threads, max_matches, after)
+    return matches, None if next_state is None else _encode_cursor(next_state)
 
-    match not_contains:
-        case None:
-            not_contains_sha = (None,)
-        case _:
-            not_contains_sha = ("--no-contains", not_contains)
+def _blame_ranges(stream: IO[bytes]) -> tuple[list[tuple[int, int, str]], dict[str, dict]]:
+    """Parse ``git blame --incremental`` output into line ranges and commits.
 
+    Only line numbers and per-commit headers are kept, never file contents,
+    so memory grows with the number of blamed ranges rather than file size.
+    """
+    ranges = []
+    commits: dict[str, dict] = {}
+    current: dict | None = None
+    for raw in stream:
+        line = raw.decode("utf-8", errors="replace").rstrip("\n")
+        if current is None:
+            sha, _orig, final, count = line.split(" ")
+            ranges.append((int(final), int(final) + int(count) - 1, sha))
+            current = commits.setdefault(sha, {})
+            continue
+        key, _, value = line.partition(" ")
+        if key == "filename":
+            current = None
+        elif key in ("author", "author-mail", "author-time", "author-tz", "summary", "boundary"):
+            current[key] = value
+
+    # Groups arrive in the order blame resolves them; put them back in file
+    # order and merge neighbours that came from the same commit.
+    collapsed: list[tuple[int, int, str]] = []
+    for start, end, sha in sorted(ranges):
+        if collapsed and collapsed[-1][2] == sha and collapsed[-1][1] + 1 == start:
+            collapsed[-1] = (collapsed[-1][0], end, sha)
+        else:
+            collapsed.append((start, end, sha))
+    return collapsed, commits
+
+def _format_blame_commit(sha: str, info: dict) -> str:
+    tz = info.get("author-tz", "+0000")
+    offset = (1 if tz[0] == "+" else -1) * timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5]))
+    date = datetime.fromtimestamp(int(info.get("author-time", 0)), timezone(offset)).date().isoformat()
+    marker = "^" if "boundary" in info else ""
+    return f"{marker}{sha[:12]} {info.get('author', '')} {date} {info.get('summary', '')}"
+
+def git_blame(
+    repo: git.Repo,
+    path: str,
+    revision: str = "HEAD",
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
+    commit = repo.git.rev_parse("--verify", "--end-of-options", f"{revision}^{{commit}}")
+    blob = repo.git.rev_parse("--verify", "--end-of-options", f"{commit}:{path}")
+    line_range = []
+    if start_line is not None or end_line is not None:
+        line_range = [f"-L{start_line or 1},{end_line or ''}"]
+
+    cache = repo_state(repo, "blame_cache", lambda _: LRUCache[tuple, str](
+        BLAME_CACHE_MAX_ENTRIES, BLAME_CACHE_MAX_CHARS, len
+    ))
+    key = (blob, commit, path, start_line, end_line)
+    result = cache.get(key)
+    if result is None:
+        proc = repo.git.blame("--incremental", *line_range, commit, "--", path, as_process=True)
+        ranges, commits = _blame_ranges(proc.stdout)
+        proc.wait()
+        lines = [f"Blame for {path} at {commit}:"]
+        for start, end, sha in ranges:
+            span = str(start) if start == end else f"{start}-{end}"
+            lines.append(f"{span}: {_format_blame_commit(sha, commits[sha])}")
+        result = "\n".join(lines)
+        cache.put(key, result)
+    return result
+
+def _branch_display_name(refname: str, branch_type: str) -> str:
+    if refname.startswith("refs/heads/"):
+        return refname.removeprefix("refs/heads/")
+    if branch_type == "remote":
+        return refname.removeprefix("refs/remotes/")
+    return refname.removeprefix("refs/")
+
+def _parse_track(track: str) -> dict:
+    # "ahead 2, behind 1", "ahead 2", "behind 1", "gone", or "" when in sync
+    if track == "gone":
+        return {"upstream_gone": True}
+    counts = {"upstream_ahead": 0, "upstream_behind": 0}
+    for part in filter(None, track.split(", ")):
+        direction, _, count = part.partition(" ")
+        counts[f"upstream_{direction}"] = int(count)
+    return counts
+
+def git_branch(
+    repo: git.Repo,
+    branch_type: str,
+    contains: str | None = None,
+    not_contains: str | None = None,
+    structured: bool = False,
+    base: str | None = None,
+    sort: str = "name",
+    offset: int = 0,
+    limit: int | None = None,
+) -> str:
     match branch_type:
         case 'local':
             b_type = None
+            patterns = ["refs/heads"]
         case 'remote':
             b_type = "-r"
+            patterns = ["refs/remotes"]
         case 'all':
             b_type = "-a"
+            patterns = ["refs/heads", "refs/remotes"]
         case _:
             return f"Invalid branch type: {branch_type}"
 
-    # None value will be auto deleted by GitPython
-    branch_info = repo.git.branch(b_type, *contains_sha, *not_contains_sha)
+    if not structured and contains is None and not_contains is None:
+        # None value will be auto deleted by GitPython
+        return repo.git.branch(b_type)
 
-    return branch_info
+    details = {}
+    if structured:
+        if sort.removeprefix("-") not in BRANCH_SORT_KEYS:
+            raise ValueError(f"Invalid sort key: {sort}")
+        if sort.removeprefix("-") in ("ahead", "behind") and base is None:
+            raise ValueError(f"Sorting by {sort.removeprefix('-')} requires base")
+        refs = []
+        for line in repo.git.for_each_ref(f"--format={BRANCH_FORMAT}", *patterns).splitlines():
+            name, sha, symref, *rest = line.split("\0")
+            refs.append(Ref(name, sha, symref))
+            details[name] = rest
+    else:
+        refs = list_refs(repo, *patterns)
 
+    # Answer --contains/--no-contains from the cached reachability index
+    # instead of letting git walk history once per branch.
+    if contains is not None or not_contains is not None:
+        tips = {ref.sha for ref in refs}
+        index = repo_state(repo, "reachability", ReachabilityIndex)
+        index.refresh()
+        if contains is not None:
+            commit = repo.git.rev_parse("--verify", "--end-of-options", f"{contains}^{{commit}}")
+            tips &= index.tips_containing(tips, commit)
+        if not_contains is not None:
+            commit = repo.git.rev_parse("--verify", "--end-of-options", f"{not_contains}^{{commit}}")
+            tips -= index.tips_containing(tips, commit)
+        refs = [ref for ref in refs if ref.sha in tips]
 
-async def serve(repository: Path | None) -> None:
-    logger = logging.getLogger(__name__)
+    if structured:
+        return _structured_branches(repo, refs, details, branch_type, base, sort, offset, limit)
 
-    if repository is not None:
-        try:
-            git.Repo(repository)
-            logger.info(f"Using repository at {repository}")
-        except git.InvalidGitRepositoryError:
-            logger.error(f"{repository} is not a valid Git repository")
+    try:
+        current = repo.git.symbolic_ref("-q", "HEAD")
+    except git.GitCommandError:
+        current = None
+    lines = []
+    for ref in refs:
+        name = _branch_display_name(ref.name, branch_type)
+        if ref.symref:
+            name += f" -> {_branch_display_name(ref.symref, 'remote')}"
+        lines.append(f"{'*' if ref.name == current else ' '} {name}")
+    return "\n".join(lines)
+
+def _structured_branches(
+    repo: git.Repo,
+    refs: list[Ref],
+    details: dict[str, list[str]],
+    branch_type: str,
+    base: str | None,
+    sort: str,
+    offset: int,
+    limit: int | None,
+) -> str:
+    branches = []
+    for ref in refs:
+        head, timestamp, date, upstream, track = details[ref.name]
+        branch = {
+            "name": _branch_display_name(ref.name, branch_type),
+            "sha": ref.sha,
+            "date": date,
+            "current": head == "*",
+        }
+        if ref.symref:
+            branch["symref"] = _branch_display_name(ref.symref, "remote")
+        if upstream:
+            branch["upstream"] = upstream
+            branch.update(_parse_track(track))
+        branches.append((int(timestamp or 0), branch))
+
+    key = sort.removeprefix("-")
+    base_sha = None
+    if base is not None:
+        base_sha = repo.git.rev_parse("--verify", "--end-of-options", f"{base}^{{commit}}")
+        _ensure_commit_graph(repo)
+
+    def add_counts(window: list[tuple[int, dict]]) -> None:
+        # One walk counts every branch in the window against the base
+        if base_sha is None or not window:
             return
+        counts = ahead_behind(repo, base_sha, {branch["sha"] for _, branch in window})
+        for _, branch in window:
+            branch["ahead"], branch["behind"] = counts[branch["sha"]]
 
-    server = Server("mcp-git")
+    branches.sort(key=lambda item: item[1]["name"])
+    if key in ("ahead", "behind"):
+        add_counts(branches)
+    sort_keys = {
+        "name": lambda item: item[1]["name"],
+        "date": lambda item: item[0],
+        "ahead": lambda item: item[1]["ahead"],
+        "behind": lambda item: item[1]["behind"],
+    }
+    if key != "name" or sort.startswith("-"):
+        branches.sort(key=sort_keys[key], reverse=sort.startswith("-"))
+    window = branches[offset:None if limit is None else offset + limit]
+    if key not in ("ahead", "behind"):
+        # Only the branches on this page need counting
+        add_counts(window)
 
-    @server.list_tools()
-    async def list_tools() -> list[Tool]:
-        return [
-            Tool(
-                name=GitTools.STATUS,
-                description="Shows the working tree status",
-                inputSchema=GitStatus.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.DIFF_UNSTAGED,
-                description="Shows changes in the working directory that are not yet staged",
-                inputSchema=GitDiffUnstaged.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.DIFF_STAGED,
-                description="Shows changes that are staged for commit",
-                inputSchema=GitDiffStaged.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.DIFF,
-                description="Shows differences between branches or commits",
-                inputSchema=GitDiff.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.COMMIT,
-                description="Records changes to the repository",
-                inputSchema=GitCommit.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.ADD,
-                description="Adds file contents to the staging area",
-                inputSchema=GitAdd.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.RESET,
-                description="Unstages all staged changes",
-                inputSchema=GitReset.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.LOG,
-                description="Shows the commit logs",
-                inputSchema=GitLog.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.CREATE_BRANCH,
-                description="Creates a new branch from an optional base branch",
-                inputSchema=GitCreateBranch.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.CHECKOUT,
-                description="Switches branches",
-                inputSchema=GitCheckout.model_json_schema(),
-            ),
-            Tool(
-                name=GitTools.SHOW,
-                description="Shows the contents of a commit",
-                inputSchema=GitShow.model_json_schema(),
-            ),
+    result: dict = {"branches": [branch for _, branch in window]}
+    if base_sha is not None:
+        result["base"] = {"name": base, "sha": base_sha}
+    result.update({"offset": offset, "total": len(branches)})
+    if offset + len(window) < len(branches):
+        result["next_offset"] = offset + len(window)
+    return json.dumps(result, indent=2)
 
-            Tool(
-                name=GitTools.BRANCH,
-                description="List Git branches",
-                inputSchema=GitBranch.model_json_schema(),
+def git_batch(
+    repo: git.Repo,
+    operations: list[dict],
+    run: Callable[[str, dict], str],
+    parallel: bool = True,
+    stop_on_error: bool = True,
+) -> str:
+    """Run ``operations`` through ``run`` and collect per-step results as JSON.
 
-            )
-        ]
+    Consecutive read-only operations form a group whose members run
+    concurrently when ``parallel`` is set; a mutating operation is a group of
+    its own, so it sees the effects of everything before it.
+    """
+    groups: list[list[int]] = []
+    for i, op in enumerate(operations):
+        if op.get("tool") == GitTools.BATCH:
+            raise ValueError("git_batch operations cannot contain another git_batch")
+        if parallel and groups and op.get("tool") not in MUTATING_TOOLS and not any(
+            operations[j].get("tool") in MUTATING_TOOLS for j in groups[-1]
+        ):
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+
+    def run_step(i: int) -> dict:
+        op = operations[i]
+        step: dict = {"tool": op.get("tool")}
+        start = time.perf_counter()
+        try:
+            step["output"] = run(op["tool"], {**op.get("arguments", {}), "repo_path": repo.working_dir})
+            step["ok"] = True
+        except Exception as e:
+            step["ok"] = False
+            step["error"] = f"{type(e).__name__}: {e}"
+        step["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return step
+
+    steps: list[dict] = [{"tool": op.get("tool"), "ok": False, "skipped": True} for op in operations]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(BATCH_MAX_PARALLEL) as executor:
+        for group in groups:
+            if len(group) == 1:
+                steps[group[0]] = run_step(group[0])
+            else:
+                # Worker threads inherit the caller's context, which ties
+                # their git processes to the same cancellation
+                futures = [executor.submit(contextvars.copy_context().run, run_step, i) for i in group]
+                for i, future in zip(group, futures):
+                    steps[i] = future.result()
+            if stop_on_error and not all(steps[i]["ok"] for i in group):
+                break
+    return json.dumps({
+        "steps": steps,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+    }, indent=2)
+
+
+METRICS_URI = "mcp-git://metrics"
+
+# Seconds between writes of the --metrics-file
+DEFAULT_METRICS_INTERVAL = 60.0
+
+# Seconds between sweeps for idle repository handles
+REPO_REAP_INTERVAL = 30.0
+
+# Seconds between sweeps for idle pooled worktrees
+WORKTREE_REAP_INTERVAL = 60.0
+
+
+# Every tool: name, description and the model its input schema is generated from
+TOOLS: list[tuple[GitTools, str, type[BaseModel]]] = [
+    (GitTools.STATUS, "Shows the working tree status", GitStatus),
+    (GitTools.DIFF_UNSTAGED, "Shows changes in the working directory that are not yet staged", GitDiffUnstaged),
+    (GitTools.DIFF_STAGED, "Shows changes that are staged for commit", GitDiffStaged),
+    (GitTools.DIFF, "Shows differences between branches or commits", GitDiff),
+    (GitTools.COMMIT, "Records changes to the repository", GitCommit),
+    (GitTools.ADD, "Adds file contents to the staging area", GitAdd),
+    (GitTools.RESET, "Unstages all staged changes", GitReset),
+    (GitTools.LOG, "Shows the commit logs", GitLog),
+    (GitTools.CREATE_BRANCH, "Creates a new branch from an optional base branch", GitCreateBranch),
+    (GitTools.CHECKOUT, "Switches branches", GitCheckout),
+    (GitTools.SHOW, "Shows the contents of a commit", GitShow),
+    (GitTools.BRANCH, "List Git branches", GitBranch),
+    (GitTools.READ_FILE, "Reads files as of any commit, or whole, by byte range or by line range, without checking them out", GitReadFile),
+    (GitTools.GREP, "Searches the working tree, the index or any revision with git grep, or finds commits that add or remove a pattern", GitGrep),
+    (GitTools.BLAME, "Shows which commit last changed each line of a file, as compact line ranges", GitBlame),
+    (GitTools.BATCH, "Runs several git tools against one repository in a single call, returning each step's output, error and timing", GitBatch),
+    (GitTools.WORKTREE_ACQUIRE, "Leases a separate linked worktree of the repository, so that concurrent sessions can check out, stage and commit on different branches; pass its path as repo_path to other tools", GitWorktreeAcquire),
+    (GitTools.WORKTREE_RELEASE, "Returns a worktree from git_worktree_acquire to the pool, discarding its uncommitted changes", GitWorktreeRelease),
+]
+
+# Input schemas generated from the models ahead of time; generating them
+# takes longer than anything else in answering tools/list
+TOOL_SCHEMAS_FILE = Path(__file__).with_name("tool_schemas.json")
+
+def generate_tool_schemas() -> dict[str, dict]:
+    return {name.value: model.model_json_schema() for name, _, model in TOOLS}
+
+def write_tool_schemas() -> None:
+    """Regenerate TOOL_SCHEMAS_FILE after changing a tool's model."""
+    TOOL_SCHEMAS_FILE.write_text(json.dumps(generate_tool_schemas(), indent=2) + "\n")
+
+@functools.cache
+def tool_definitions() -> list[Tool]:
+    try:
+        schemas = json.loads(TOOL_SCHEMAS_FILE.read_text())
+    except FileNotFoundError:
+        schemas = {}
+    return [
+        Tool(
+            name=name,
+            description=description,
+            inputSchema=schemas.get(name.value) or model.model_json_schema(),
+        )
+        for name, description, model in TOOLS
+    ]
+
+def create_server(
+    repository: Path | None = None,
+    watch: bool = False,
+    timeout: float | None = None,
+    cache_dir: Path | None = None,
+    cache_size: int = DEFAULT_DISK_BUDGET,
+    metrics_file: Path | None = None,
+    metrics_interval: float = DEFAULT_METRICS_INTERVAL,
+    max_worktrees: int = DEFAULT_MAX_WORKTREES,
+    worktree_idle_timeout: float = DEFAULT_WORKTREE_IDLE_TIMEOUT,
+    worktree_budget: int = DEFAULT_WORKTREE_BUDGET,
+    repo_idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+) -> Server:
+    repo_pool = RepoPool(idle_timeout=repo_idle_timeout)
+    worktree_pool = WorktreePool(max_worktrees, worktree_idle_timeout, worktree_budget)
+    # Output for immutable inputs, shared by all repositories
+    results = ResultCache(cache_dir, cache_size)
+    metrics = Metrics(lambda: dict(repo_pool.stats), lambda: len(repo_pool))
+
+    @asynccontextmanager
+    async def lifespan(_server: Server) -> AsyncIterator[dict]:
+        async def dump_metrics(path: Path) -> None:
+            while True:
+                await anyio.sleep(metrics_interval)
+                await anyio.to_thread.run_sync(metrics.dump, path)
+
+        async def open_repository(path: Path) -> None:
+            # Checked while the session starts rather than before it; the
+            # handle is then already open for the first tool call.
+            try:
+                await anyio.to_thread.run_sync(repo_pool.get, path)
+                logger.info(f"Using repository at {path}")
+            except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+                logger.error(f"{path} is not a valid Git repository")
+            except Exception:
+                # Only a check: tool calls report their own errors
+                logger.exception(f"Could not open the repository at {path}")
+
+        async def reap_repos() -> None:
+            # Idle handles hold cat-file processes, watchers and index
+            # connections; release them even if no further call comes in.
+            while True:
+                await anyio.sleep(REPO_REAP_INTERVAL)
+                await anyio.to_thread.run_sync(repo_pool.reap)
+
+        async def reap_worktrees() -> None:
+            while True:
+                await anyio.sleep(WORKTREE_REAP_INTERVAL)
+                await anyio.to_thread.run_sync(worktree_pool.reap)
+
+        try:
+            async with anyio.create_task_group() as tg:
+                if metrics_file is not None:
+                    tg.start_soon(dump_metrics, metrics_file)
+                tg.start_soon(reap_repos)
+                tg.start_soon(reap_worktrees)
+                if repository is not None:
+                    tg.start_soon(open_repository, repository)
+                try:
+                    yield {}
+                finally:
+                    tg.cancel_scope.cancel()
+        finally:
+            worktree_pool.close()
+            repo_pool.close()
+            if metrics_file is not None:
+                metrics.dump(metrics_file)
+
+    server = Server("mcp-git", lifespan=lifespan)
+    repo_locks: weakref.WeakValueDictionary[str, RWLock] = weakref.WeakValueDictionary()
+
+    @server.list_tools()
+    async def list_tools() -> list[Tool]:
+        return tool_definitions()
 
     async def list_repos() -> Sequence[str]:
         async def by_roots() -> Sequence[str]:
@@ -340,37 +1979,163 @@ async def serve(repository: Path | None) -> None:
         root_repos = await by_roots()
         return [*root_repos, *cmd_repos]
 
+    @server.list_resources()
+    async def list_resources() -> list[Resource]:
+        return [
+            Resource(
+                uri=AnyUrl(METRICS_URI),
+                name="metrics",
+                description="Tool latency histograms, git subprocess counts, output bytes and repository handle usage",
+                mimeType=METRICS_CONTENT_TYPE,
+            ),
+        ]
+
+    @server.read_resource()
+    async def read_resource(uri) -> list[ReadResourceContents]:
+        if str(uri) != METRICS_URI:
+            raise ValueError(f"Unknown resource: {uri}")
+        return [ReadResourceContents(metrics.render(), METRICS_CONTENT_TYPE)]
+
     @server.call_tool()
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+        operation = Operation()
+        outcome = "error"
+        output: list[TextContent] = []
+        start = time.perf_counter()
+        try:
+            output = await run_tool_async(name, arguments, operation)
+            outcome = "ok"
+            return output
+        except anyio.get_cancelled_exc_class():
+            outcome = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            size = sum(len(content.text.encode("utf-8")) for content in output)
+            metrics.record(name, outcome, elapsed, operation.spawned, size)
+            logger.info(
+                f"{name} {outcome} in {elapsed * 1000:.1f} ms, "
+                f"{operation.spawned} git processes, {size} bytes"
+            )
+
+    async def run_tool_async(name: str, arguments: dict, operation: Operation) -> list[TextContent]:
         repo_path = Path(arguments["repo_path"])
-        
-        # For all commands, we need an existing repo
-        repo = git.Repo(repo_path)
+
+        # For all commands, we need an existing repo. Git runs in worker
+        # threads so a slow command never stalls the event loop; reads of one
+        # repository share its lock, while mutations take it exclusively.
+        # Cancelling the request, or running out of time, kills the git
+        # processes the tool started. The handle is leased for the call, so
+        # the pool never closes it underneath a running tool.
+        try:
+            with anyio.fail_after(timeout):
+                repo = await anyio.to_thread.run_sync(repo_pool.acquire, repo_path)
+                try:
+                    worktree_pool.touch(repo_path)
+                    lock = repo_locks.setdefault(str(repo.git_dir), RWLock())
+                    async with (lock.write() if _is_mutating(name, arguments) else lock.read()):
+                        return await run_cancellable(run_tool, repo, name, arguments, operation=operation)
+                finally:
+                    repo_pool.release(repo)
+        except TimeoutError:
+            raise TimeoutError(f"{name} did not finish within {timeout} seconds") from None
+
+    def run_tool(repo: git.Repo, name: str, arguments: dict) -> list[TextContent]:
+        # Read tools must never turn into network transfers in partial clones
+        repo_state(repo, "partial_clone", _disable_lazy_fetch)
+        try:
+            return dispatch_tool(repo, name, arguments)
+        except git.GitCommandError as e:
+            missing = _missing_object(e)
+            if missing is None:
+                raise
+            raise ValueError(
+                f"{name} needs object {missing}, which is not present locally; "
+                "missing objects of partial clones are not fetched on demand"
+            ) from None
+
+    def dispatch_tool(repo: git.Repo, name: str, arguments: dict) -> list[TextContent]:
+        watcher = None
+        if watch and not repo.bare:
+            from .watcher import WorktreeWatcher
+
+            if WorktreeWatcher.supported():
+                watcher = repo_state(repo, "watcher", WorktreeWatcher)
 
         match name:
             case GitTools.STATUS:
-                status = git_status(repo)
+                status = git_status(
+                    repo,
+                    arguments.get("structured", False),
+                    arguments.get("untracked_cache", False),
+                    arguments.get("fsmonitor", False),
+                    arguments.get("untracked_files", "normal"),
+                    arguments.get("offset", 0),
+                    arguments.get("limit"),
+                    watcher,
+                )
+                if arguments.get("structured", False):
+                    return [TextContent(
+                        type="text",
+                        text=status
+                    )]
                 return [TextContent(
                     type="text",
                     text=f"Repository status:\n{status}"
                 )]
 
             case GitTools.DIFF_UNSTAGED:
-                diff = git_diff_unstaged(repo, arguments.get("context_lines", DEFAULT_CONTEXT_LINES))
+                diff = git_diff_unstaged(
+                    repo,
+                    arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
+                    arguments.get("mode", "patch"),
+                    arguments.get("paths"),
+                    arguments.get("offset", 0),
+                    arguments.get("limit"),
+                    watcher,
+                    arguments.get("algorithm"),
+                    arguments.get("renames"),
+                    arguments.get("rename_limit"),
+                    arguments.get("time_budget"),
+                )
                 return [TextContent(
                     type="text",
                     text=f"Unstaged changes:\n{diff}"
                 )]
 
             case GitTools.DIFF_STAGED:
-                diff = git_diff_staged(repo, arguments.get("context_lines", DEFAULT_CONTEXT_LINES))
+                diff = git_diff_staged(
+                    repo,
+                    arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
+                    arguments.get("mode", "patch"),
+                    arguments.get("paths"),
+                    arguments.get("offset", 0),
+                    arguments.get("limit"),
+                    arguments.get("algorithm"),
+                    arguments.get("renames"),
+                    arguments.get("rename_limit"),
+                    arguments.get("time_budget"),
+                )
                 return [TextContent(
                     type="text",
                     text=f"Staged changes:\n{diff}"
                 )]
 
             case GitTools.DIFF:
-                diff = git_diff(repo, arguments["target"], arguments.get("context_lines", DEFAULT_CONTEXT_LINES))
+                diff = git_diff(
+                    repo,
+                    arguments["target"],
+                    arguments.get("context_lines", DEFAULT_CONTEXT_LINES),
+                    arguments.get("mode", "patch"),
+                    arguments.get("paths"),
+                    arguments.get("offset", 0),
+                    arguments.get("limit"),
+                    results,
+                    arguments.get("algorithm"),
+                    arguments.get("renames"),
+                    arguments.get("rename_limit"),
+                    arguments.get("time_budget"),
+                )
                 return [TextContent(
                     type="text",
                     text=f"Diff with {arguments['target']}:\n{diff}"
@@ -397,19 +2162,44 @@ async def serve(repository: Path | None) -> None:
                     text=result
                 )]
 
-            # Update the LOG case:
-            case GitTools.LOG:
-                log = git_log(
-                    repo, 
+            case GitTools.LOG if arguments.get("use_index", False):
+                if arguments.get("first_parent", False) or arguments.get("follow", False) or arguments.get("cursor"):
+                    raise ValueError("first_parent, follow and cursor cannot be combined with use_index")
+                log = git_log_indexed(
+                    repo,
                     arguments.get("max_count", 10),
                     arguments.get("start_timestamp"),
-                    arguments.get("end_timestamp")
+                    arguments.get("end_timestamp"),
+                    arguments.get("paths"),
+                    arguments.get("author"),
+                    arguments.get("message"),
                 )
                 return [TextContent(
                     type="text",
                     text="Commit history:\n" + "\n".join(log)
                 )]
-            
+
+            case GitTools.LOG:
+                if arguments.get("author") or arguments.get("message"):
+                    raise ValueError("author and message filters need use_index")
+                log, cursor = git_log(
+                    repo,
+                    arguments.get("max_count", 10),
+                    arguments.get("start_timestamp"),
+                    arguments.get("end_timestamp"),
+                    arguments.get("paths"),
+                    arguments.get("first_parent", False),
+                    arguments.get("cursor"),
+                    arguments.get("follow", False),
+                )
+                text = "Commit history:\n" + "\n".join(log)
+                if cursor is not None:
+                    text += f"\nNext cursor: {cursor}"
+                return [TextContent(
+                    type="text",
+                    text=text
+                )]
+
             case GitTools.CREATE_BRANCH:
                 result = git_create_branch(
                     repo,
@@ -428,8 +2218,40 @@ async def serve(repository: Path | None) -> None:
                     text=result
                 )]
 
+            case GitTools.WORKTREE_ACQUIRE:
+                # Like git_checkout, this needs the files it checks out
+                with repo.git.custom_environment(GIT_NO_LAZY_FETCH=None):
+                    path = worktree_pool.acquire(
+                        repo,
+                        arguments.get("revision", "HEAD"),
+                        arguments.get("branch"),
+                        arguments.get("new_branch"),
+                    )
+                return [TextContent(
+                    type="text",
+                    text=f"Worktree: {path}\nPass it as repo_path to other tools and release it with git_worktree_release when done"
+                )]
+
+            case GitTools.WORKTREE_RELEASE:
+                worktree_pool.release(repo.working_dir)
+                return [TextContent(
+                    type="text",
+                    text=f"Released worktree {repo.working_dir}"
+                )]
+
             case GitTools.SHOW:
-                result = git_show(repo, arguments["revision"])
+                result = git_show(
+                    repo,
+                    arguments["revision"],
+                    arguments.get("stat_only", False),
+                    arguments.get("max_file_bytes", DEFAULT_MAX_FILE_BYTES),
+                    arguments.get("max_total_bytes", DEFAULT_MAX_TOTAL_BYTES),
+                    results,
+                    arguments.get("algorithm"),
+                    arguments.get("renames"),
+                    arguments.get("rename_limit"),
+                    arguments.get("time_budget"),
+                )
                 return [TextContent(
                     type="text",
                     text=result
@@ -441,15 +2263,108 @@ async def serve(repository: Path | None) -> None:
                     arguments.get("branch_type", 'local'),
                     arguments.get("contains", None),
                     arguments.get("not_contains", None),
+                    arguments.get("structured", False),
+                    arguments.get("base"),
+                    arguments.get("sort", "name"),
+                    arguments.get("offset", 0),
+                    arguments.get("limit"),
+                )
+                return [TextContent(
+                    type="text",
+                    text=result
+                )]
+
+            case GitTools.READ_FILE:
+                result = git_read_file(
+                    repo,
+                    arguments["paths"],
+                    arguments.get("revision", "HEAD"),
+                    arguments.get("start_byte"),
+                    arguments.get("end_byte"),
+                    arguments.get("start_line"),
+                    arguments.get("end_line"),
+                    arguments.get("max_bytes", DEFAULT_MAX_FILE_BYTES),
+                    arguments.get("size_only", False),
+                )
+                return [TextContent(
+                    type="text",
+                    text=result
+                )]
+
+            case GitTools.GREP:
+                matches, cursor = git_grep(
+                    repo,
+                    arguments["pattern"],
+                    arguments.get("revision"),
+                    arguments.get("cached", False),
+                    arguments.get("fixed_strings", False),
+                    arguments.get("ignore_case", False),
+                    arguments.get("paths"),
+                    arguments.get("pickaxe"),
+                    arguments.get("threads"),
+                    arguments.get("max_matches_per_file", DEFAULT_GREP_MAX_MATCHES_PER_FILE),
+                    arguments.get("max_matches", DEFAULT_GREP_MAX_MATCHES),
+                    arguments.get("cursor"),
+                )
+                text = "\n".join(matches) if matches else "No matches found"
+                if cursor is not None:
+                    text += f"\nNext cursor: {cursor}"
+                return [TextContent(
+                    type="text",
+                    text=text
+                )]
+
+            case GitTools.BLAME:
+                result = git_blame(
+                    repo,
+                    arguments["path"],
+                    arguments.get("revision", "HEAD"),
+                    arguments.get("start_line"),
+                    arguments.get("end_line"),
+                )
+                return [TextContent(
+                    type="text",
+                    text=result
+                )]
+
+            case GitTools.BATCH:
+                def run_step(step_name: str, step_arguments: dict) -> str:
+                    return "\n".join(content.text for content in run_tool(repo, step_name, step_arguments))
+
+                result = git_batch(
+                    repo,
+                    arguments["operations"],
+                    run_step,
+                    arguments.get("parallel", True),
+                    arguments.get("stop_on_error", True),
                 )
                 return [TextContent(
                     type="text",
                     text=result
                 )]
-            
+
             case _:
                 raise ValueError(f"Unknown tool: {name}")
 
+    return server
+
+
+async def serve(
+    repository: Path | None,
+    watch: bool = False,
+    timeout: float | None = None,
+    cache_dir: Path | None = None,
+    cache_size: int = DEFAULT_DISK_BUDGET,
+    metrics_file: Path | None = None,
+    metrics_interval: float = DEFAULT_METRICS_INTERVAL,
+    max_worktrees: int = DEFAULT_MAX_WORKTREES,
+    worktree_idle_timeout: float = DEFAULT_WORKTREE_IDLE_TIMEOUT,
+    worktree_budget: int = DEFAULT_WORKTREE_BUDGET,
+) -> None:
+    server = create_server(
+        repository, watch, timeout, cache_dir, cache_size, metrics_file, metrics_interval,
+        max_worktrees, worktree_idle_timeout, worktree_budget,
+    )
     options = server.create_initialization_options()
     async with stdio_server() as (read_stream, write_stream):
         await server.run(read_stream, write_stream, options, raise_exceptions=True)
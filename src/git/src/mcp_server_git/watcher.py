@@ -0,0 +1,224 @@
+import ctypes
+import errno
+import logging
+import os
+import struct
+import sys
+import threading
+from typing import Hashable, Iterable
+
+import git
+
+logger = logging.getLogger(__name__)
+
+# Beyond this many paths to re-examine a full rescan is cheaper than a pathspec
+DEFAULT_MAX_TRACKED_PATHS = 1000
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+_EVENT = struct.Struct("iIII")
+
+_libc = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        _libc = None
+
+
+class WorktreeWatcher:
+    """Tracks which worktree paths were touched since the last status scan.
+
+    Uses inotify, so it is only available on Linux. Callers scan the worktree
+    fully once, report the paths that differed via ``end_scan``, and from then
+    on only need to re-examine those paths plus the ones touched since. A full
+    rescan is requested whenever events may have been lost (queue overflow,
+    directories moved), the index or HEAD changed underneath the watcher, or
+    too many paths were touched.
+    """
+
+    def __init__(self, repo: git.Repo, max_paths: int = DEFAULT_MAX_TRACKED_PATHS) -> None:
+        if repo.working_tree_dir is None:
+            raise ValueError("Cannot watch a bare repository")
+        self.root = str(repo.working_tree_dir)
+        self.max_paths = max_paths
+        self._fd = -1
+        self._dirs: dict[int, str] = {}
+        self._dirty: set[str] = set()
+        # Paths handed to scans that have not finished yet
+        self._scanning: set[str] = set()
+        self._scans = 0
+        self._baseline: set[str] | None = None
+        self._fingerprint: Hashable = None
+        self._scope: Hashable = None
+        self._needs_reset = False
+        self._lock = threading.Lock()
+        self._start()
+
+    @staticmethod
+    def supported() -> bool:
+        return _libc is not None
+
+    @property
+    def active(self) -> bool:
+        return self._fd >= 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+    def begin_scan(self, fingerprint: Hashable, scope: Hashable = None) -> list[str] | None:
+        """Return the paths a scan has to look at, or None for a full scan.
+
+        The touched paths are handed over to the caller until the scan ends
+        with ``end_scan`` or ``abort_scan``; paths touched while the scan runs
+        are kept for the next one.
+        """
+        with self._lock:
+            self._drain()
+            if self._needs_reset:
+                self._stop()
+                self._start()
+            paths = self._paths(fingerprint)
+            if scope != self._scope:
+                paths = None
+            self._scanning |= self._dirty
+            self._scans += 1
+            self._dirty.clear()
+            return paths
+
+    def end_scan(self, fingerprint: Hashable, changed: Iterable[str], scope: Hashable = None) -> None:
+        """Record the paths a completed scan reported as differing."""
+        with self._lock:
+            self._baseline = set(changed)
+            self._fingerprint = fingerprint
+            self._scope = scope
+            self._finish_scan()
+
+    def abort_scan(self) -> None:
+        """Give the paths of a failed scan back, so the next scan looks at them."""
+        with self._lock:
+            # Overlapping scans may hand back more than this one took, which
+            # only costs the next scan a few extra paths
+            self._dirty |= self._scanning
+            self._finish_scan()
+
+    def _finish_scan(self) -> None:
+        self._scans -= 1
+        if not self._scans:
+            self._scanning.clear()
+
+    def pending_paths(self, fingerprint: Hashable) -> list[str] | None:
+        """Like ``begin_scan`` but without consuming the touched paths."""
+        with self._lock:
+            self._drain()
+            return self._paths(fingerprint)
+
+    def _paths(self, fingerprint: Hashable) -> list[str] | None:
+        if (
+            not self.active
+            or self._needs_reset
+            or self._baseline is None
+            or fingerprint != self._fingerprint
+        ):
+            return None
+        paths = self._baseline | self._scanning | self._dirty
+        if len(paths) > self.max_paths:
+            return None
+        return sorted(paths)
+
+    def _start(self) -> None:
+        self._needs_reset = False
+        self._baseline = None
+        assert _libc is not None
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.warning(f"inotify unavailable: {os.strerror(ctypes.get_errno())}")
+            return
+        self._fd = fd
+        if not self._watch_tree(""):
+            self._stop()
+
+    def _stop(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+        self._fd = -1
+        self._dirs.clear()
+        self._baseline = None
+
+    def _watch_tree(self, relative: str) -> bool:
+        top = os.path.join(self.root, relative)
+        for dirpath, dirnames, _ in os.walk(top):
+            if ".git" in dirnames:
+                dirnames.remove(".git")
+            assert _libc is not None
+            wd = _libc.inotify_add_watch(self._fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOENT:
+                    continue
+                # Usually ENOSPC: fs.inotify.max_user_watches is exhausted
+                logger.warning(f"Not watching {self.root}: {os.strerror(err)}")
+                return False
+            rel = os.path.relpath(dirpath, self.root)
+            self._dirs[wd] = "" if rel == "." else rel.replace(os.sep, "/")
+        return True
+
+    def _drain(self) -> None:
+        while self.active:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _cookie, length = _EVENT.unpack_from(buf, offset)
+                name = os.fsdecode(buf[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0"))
+                offset += _EVENT.size + length
+                self._handle(wd, mask, name)
+
+    def _handle(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            self._needs_reset = True
+            return
+        if mask & IN_IGNORED:
+            self._dirs.pop(wd, None)
+            return
+        directory = self._dirs.get(wd)
+        if directory is None or (directory == "" and name == ".git"):
+            return
+        if not name:
+            # Events about the watched directory itself
+            if mask & IN_MOVE_SELF:
+                self._needs_reset = True
+            return
+
+        path = f"{directory}/{name}" if directory else name
+        self._dirty.add(path)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if not self._watch_tree(path):
+                    self._needs_reset = True
+            elif mask & IN_MOVED_FROM:
+                # Watches below the old name now report the wrong paths
+                self._needs_reset = True
@@ -0,0 +1,266 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import git
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of pooled worktrees per repository, leased or idle
+DEFAULT_MAX_WORKTREES = 8
+
+# Seconds without a tool call after which a worktree is removed, leased or not
+DEFAULT_WORKTREE_IDLE_TIMEOUT = 1800.0
+
+# Bytes of checked-out files the idle worktrees of one repository may occupy
+DEFAULT_WORKTREE_BUDGET = 1024 * 1024 * 1024
+
+# Where pooled worktrees live, relative to the repository's common git dir
+WORKTREE_DIR = os.path.join("mcp-server-git", "worktrees")
+
+
+@dataclass
+class Worktree:
+    path: Path
+    common_dir: str
+    last_used: float
+    leased: bool = True
+    size: int = 0
+
+
+def _disk_usage(path: Path) -> int:
+    # Checked-out files only; a linked worktree's .git is a one-line file
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            if name == ".git" and root == str(path):
+                continue
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class WorktreePool:
+    """Ephemeral linked worktrees, so that concurrent sessions can check out,
+    stage and commit on different branches of one repository at once.
+
+    A leased worktree is a regular linked worktree (``git worktree add``) under
+    the repository's git directory; tools use it by passing its path as
+    ``repo_path``. Released worktrees are cleaned, detached and kept for the
+    next lease, which then only has to check out the files that differ. Idle
+    worktrees beyond the disk budget, and any worktree without a tool call for
+    ``idle_timeout`` seconds, are removed.
+    """
+
+    def __init__(
+        self,
+        max_worktrees: int = DEFAULT_MAX_WORKTREES,
+        idle_timeout: float = DEFAULT_WORKTREE_IDLE_TIMEOUT,
+        budget: int = DEFAULT_WORKTREE_BUDGET,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_worktrees < 1:
+            raise ValueError("max_worktrees must be at least 1")
+        self.max_worktrees = max_worktrees
+        self.idle_timeout = idle_timeout
+        self.budget = budget
+        self._clock = clock
+        self._worktrees: dict[Path, Worktree] = {}
+        # Common git dirs whose leftover worktrees have been adopted
+        self._adopted: set[str] = set()
+        self._lock = threading.Lock()
+        # How leases were served and why worktrees were removed
+        self.stats: Counter[str] = Counter()
+
+    def __len__(self) -> int:
+        return len(self._worktrees)
+
+    def acquire(
+        self,
+        repo: git.Repo,
+        revision: str = "HEAD",
+        branch: str | None = None,
+        new_branch: str | None = None,
+    ) -> Path:
+        """Lease a worktree of ``repo`` and check out the requested commit there.
+
+        By default HEAD of ``repo`` is checked out detached; ``branch`` checks
+        out an existing branch, which git refuses if another worktree has it,
+        and ``new_branch`` creates one at ``revision``.
+        """
+        if branch is not None and new_branch is not None:
+            raise ValueError("Specify either branch or new_branch, not both")
+        common_dir = os.path.realpath(repo.common_dir)
+        # Pin the revision before switching to another worktree, where HEAD differs
+        commit = repo.git.rev_parse("--verify", "--end-of-options", f"{revision}^{{commit}}")
+        self._adopt(repo, common_dir)
+        self.reap()
+
+        with self._lock:
+            now = self._clock()
+            idle = [
+                worktree for worktree in self._worktrees.values()
+                if worktree.common_dir == common_dir and not worktree.leased
+            ]
+            recycled = bool(idle)
+            if recycled:
+                # The most recently used one is most likely to be close to the target
+                worktree = max(idle, key=lambda worktree: worktree.last_used)
+                worktree.leased, worktree.last_used = True, now
+            elif sum(w.common_dir == common_dir for w in self._worktrees.values()) >= self.max_worktrees:
+                raise ValueError(
+                    f"All {self.max_worktrees} worktrees of {repo.working_dir or common_dir} are in use; "
+                    "release one with git_worktree_release"
+                )
+            else:
+                parent = Path(common_dir, WORKTREE_DIR)
+                parent.mkdir(parents=True, exist_ok=True)
+                worktree = Worktree(Path(tempfile.mkdtemp(prefix="wt-", dir=parent)), common_dir, now)
+                self._worktrees[worktree.path] = worktree
+
+        try:
+            if recycled:
+                self._checkout(git.Git(worktree.path), commit, branch, new_branch)
+                self.stats["recycled"] += 1
+            else:
+                self._add(repo, worktree.path, commit, branch, new_branch)
+                self.stats["created"] += 1
+        except Exception:
+            if recycled:
+                self.release(worktree.path)
+            else:
+                self._remove(worktree, "failed")
+            raise
+        return worktree.path
+
+    def touch(self, path: str | os.PathLike[str]) -> None:
+        """Note that a tool call used ``path``, if it is a pooled worktree."""
+        worktree = self._worktrees.get(Path(path).resolve())
+        if worktree is not None:
+            worktree.last_used = self._clock()
+
+    def release(self, path: str | os.PathLike[str]) -> None:
+        """Discard local changes in a leased worktree and keep it for the next lease."""
+        with self._lock:
+            worktree = self._worktrees.get(Path(path).resolve())
+            if worktree is None or not worktree.leased:
+                raise ValueError(f"{path} is not a leased worktree")
+        try:
+            g = git.Git(worktree.path)
+            g.reset("--hard", "--quiet")
+            g.clean("-ffdxq")
+            # Detach so that the branch can be checked out elsewhere
+            g.checkout("--detach", "--quiet")
+            worktree.size = _disk_usage(worktree.path)
+        except git.GitCommandError as e:
+            logger.warning(f"Could not recycle worktree {worktree.path}: {e}")
+            self._remove(worktree, "failed")
+            return
+
+        with self._lock:
+            worktree.leased, worktree.last_used = False, self._clock()
+            # Keep the most recently used idle worktrees within the budget
+            idle = sorted(
+                (w for w in self._worktrees.values() if w.common_dir == worktree.common_dir and not w.leased),
+                key=lambda w: w.last_used,
+                reverse=True,
+            )
+            used, over = 0, []
+            for candidate in idle:
+                used += candidate.size
+                if used > self.budget:
+                    over.append(self._worktrees.pop(candidate.path))
+        for candidate in over:
+            self._remove(candidate, "over_budget")
+
+    def reap(self) -> int:
+        """Remove worktrees that have gone without a tool call for longer than the timeout."""
+        with self._lock:
+            now = self._clock()
+            expired = [
+                self._worktrees.pop(path) for path, worktree in list(self._worktrees.items())
+                if now - worktree.last_used > self.idle_timeout
+            ]
+        for worktree in expired:
+            self._remove(worktree, "expired")
+        return len(expired)
+
+    def close(self) -> None:
+        """Remove every pooled worktree; they do not outlive the server."""
+        with self._lock:
+            worktrees = list(self._worktrees.values())
+            self._worktrees.clear()
+        for worktree in worktrees:
+            self._remove(worktree, "closed")
+
+    def _add(
+        self, repo: git.Repo, path: Path, commit: str, branch: str | None, new_branch: str | None
+    ) -> None:
+        if branch is not None:
+            args = [str(path), branch]
+        elif new_branch is not None:
+            args = ["-b", new_branch, str(path), commit]
+        else:
+            args = ["--detach", str(path), commit]
+        repo.git.worktree("add", "--quiet", *args)
+
+    @staticmethod
+    def _checkout(g: git.Git, commit: str, branch: str | None, new_branch: str | None) -> None:
+        if branch is not None:
+            g.checkout("--quiet", branch, "--")
+        elif new_branch is not None:
+            g.checkout("--quiet", "-b", new_branch, commit, "--")
+        else:
+            g.checkout("--quiet", "--detach", commit, "--")
+
+    def _adopt(self, repo: git.Repo, common_dir: str) -> None:
+        # Worktrees left behind by a server that did not shut down cleanly
+        # become idle members of the pool, to be recycled or removed.
+        with self._lock:
+            if common_dir in self._adopted:
+                return
+            self._adopted.add(common_dir)
+        parent = Path(common_dir, WORKTREE_DIR)
+        if not parent.is_dir():
+            return
+        repo.git.worktree("prune")
+        registered = {
+            Path(line.removeprefix("worktree ")).resolve()
+            for line in repo.git.worktree("list", "--porcelain").splitlines()
+            if line.startswith("worktree ")
+        }
+        now = self._clock()
+        for path in parent.iterdir():
+            path = path.resolve()
+            if path not in registered:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            with self._lock:
+                if path not in self._worktrees:
+                    self._worktrees[path] = Worktree(path, common_dir, now, leased=False, size=_disk_usage(path))
+                    self.stats["adopted"] += 1
+
+    def _remove(self, worktree: Worktree, reason: str) -> None:
+        # Callers take the worktree out of the pool first, so nothing leases it
+        with self._lock:
+            self._worktrees.pop(worktree.path, None)
+        logger.debug(f"Removing worktree {worktree.path} ({reason})")
+        try:
+            git.Git(worktree.common_dir).worktree("remove", "--force", "--force", str(worktree.path))
+        except git.GitCommandError as e:
+            logger.warning(f"Could not remove worktree {worktree.path}: {e}")
+            shutil.rmtree(worktree.path, ignore_errors=True)
+            try:
+                git.Git(worktree.common_dir).worktree("prune")
+            except git.GitCommandError:
+                pass
+        self.stats[reason] += 1
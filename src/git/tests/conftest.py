@@ -0,0 +1,42 @@
+import pytest
+from pathlib import Path
+import git
+from mcp_server_git.pool import close_repo_state
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def make_repository(tmp_path: Path):
+    """Create repositories with a committer identity, closing them afterwards.
+
+    ``files`` maps paths to contents, committed together as "initial".
+    """
+    repos = []
+
+    def make(files: dict[str, str] | None = None, name: str = "temp_test_repo") -> git.Repo:
+        repo = git.Repo.init(tmp_path / name)
+        repo.config_writer().set_value("user", "name", "Test User").release()
+        repo.config_writer().set_value("user", "email", "test@example.com").release()
+        if files:
+            for path, content in files.items():
+                file = Path(repo.working_dir, path)
+                file.parent.mkdir(parents=True, exist_ok=True)
+                file.write_text(content)
+            repo.git.add(".")
+            repo.git.commit("-m", "initial")
+        repos.append(repo)
+        return repo
+
+    yield make
+    for repo in repos:
+        close_repo_state(repo)
+        repo.close()
+
+
+@pytest.fixture
+def test_repository(make_repository):
+    return make_repository({"file.txt": "content"})
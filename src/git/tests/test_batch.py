@@ -0,0 +1,82 @@
+import json
+import threading
+import anyio
+import pytest
+from pathlib import Path
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import TextContent
+from mcp_server_git.server import create_server, git_batch
+
+
+def test_git_batch_runs_reads_in_parallel_between_writes(test_repository):
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def run(tool, arguments):
+        calls.append(tool)
+        assert arguments["repo_path"] == test_repository.working_dir
+        if tool in ("git_status", "git_log"):
+            # Only returns if both reads are in flight at once
+            barrier.wait()
+        return tool
+
+    operations = [
+        {"tool": "git_status"},
+        {"tool": "git_log", "arguments": {"max_count": 1}},
+        {"tool": "git_add", "arguments": {"files": ["file.txt"]}},
+        {"tool": "git_diff_staged"},
+    ]
+    result = json.loads(git_batch(test_repository, operations, run))
+
+    assert [step["output"] for step in result["steps"]] == ["git_status", "git_log", "git_add", "git_diff_staged"]
+    assert all(step["ok"] and step["elapsed_ms"] >= 0 for step in result["steps"])
+    assert calls[2:] == ["git_add", "git_diff_staged"]
+
+
+def test_git_batch_sequential_and_stop_on_error(test_repository):
+    def run(tool, arguments):
+        if tool == "git_show":
+            raise ValueError("nope")
+        return tool
+
+    operations = [{"tool": "git_status"}, {"tool": "git_show"}, {"tool": "git_log"}]
+
+    result = json.loads(git_batch(test_repository, operations, run, parallel=False))
+    assert [step["ok"] for step in result["steps"]] == [True, False, False]
+    assert result["steps"][1]["error"] == "ValueError: nope"
+    assert result["steps"][2]["skipped"]
+
+    result = json.loads(git_batch(test_repository, operations, run, parallel=False, stop_on_error=False))
+    assert [step["ok"] for step in result["steps"]] == [True, False, True]
+
+
+def test_git_batch_rejects_nesting(test_repository):
+    with pytest.raises(ValueError):
+        git_batch(test_repository, [{"tool": "git_batch"}], lambda tool, arguments: "")
+
+
+def test_git_batch_through_server(test_repository):
+    Path(test_repository.working_dir, "file.txt").write_text("changed")
+
+    async def main():
+        async with create_connected_server_and_client_session(create_server()) as client:
+            return await client.call_tool("git_batch", {
+                "repo_path": test_repository.working_dir,
+                "operations": [
+                    {"tool": "git_diff_unstaged", "arguments": {"mode": "name-status"}},
+                    {"tool": "git_add", "arguments": {"files": ["file.txt"]}},
+                    {"tool": "git_commit", "arguments": {"message": "batched"}},
+                    {"tool": "git_log", "arguments": {"max_count": 1}},
+                    {"tool": "git_frobnicate"},
+                ],
+            })
+
+    content = anyio.run(main).content[0]
+    assert isinstance(content, TextContent)
+    steps = json.loads(content.text)["steps"]
+
+    assert steps[0]["output"] == "Unstaged changes:\nM\tfile.txt"
+    assert steps[2]["output"].startswith("Changes committed successfully")
+    assert "Message: batched" in steps[3]["output"]
+    assert steps[4] == {**steps[4], "ok": False, "error": "ValueError: Unknown tool: git_frobnicate"}
+    assert test_repository.head.commit.message == "batched"
@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import anyio
+import pytest
+from pathlib import Path
+import git
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import CallToolResult, TextContent
+from mcp_server_git import server as server_module
+from mcp_server_git.cancellation import OperationCancelled, run_cancellable
+from mcp_server_git.server import create_server
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inspects processes through /proc"),
+]
+
+
+@pytest.fixture
+def test_repository(make_repository, tmp_path: Path):
+    repo = make_repository()
+    # The alias's shell writes its pid, then becomes a long sleep
+    pid_file = tmp_path / "sleep.pid"
+    repo.config_writer().set_value("alias", "sleepy", f"!echo $$ > {pid_file}; exec sleep 30").release()
+    return repo
+
+
+def _text(result: CallToolResult) -> str:
+    content = result.content[0]
+    assert isinstance(content, TextContent)
+    return content.text
+
+
+def sleepy(repo: git.Repo) -> str:
+    return repo.git.sleepy()
+
+
+def pid_of_sleep(repo: git.Repo) -> int:
+    pid_file = Path(repo.working_dir).parent / "sleep.pid"
+    deadline = time.monotonic() + 10
+    while not pid_file.exists() or not pid_file.read_text().strip():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return int(pid_file.read_text())
+
+
+def assert_gone(pid: int) -> None:
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return
+        # An exited child stays visible until its reaper collects it
+        with open(f"/proc/{pid}/stat") as f:
+            if f.read().split(") ")[1].startswith("Z"):
+                return
+        assert time.monotonic() < deadline, f"process {pid} is still running"
+        time.sleep(0.01)
+
+
+async def test_cancel_kills_git_and_its_children(test_repository):
+    pid = None
+    with anyio.fail_after(10):
+        async with anyio.create_task_group() as tg:
+            async def run():
+                await run_cancellable(sleepy, test_repository)
+            tg.start_soon(run)
+            pid = await anyio.to_thread.run_sync(pid_of_sleep, test_repository)
+            tg.cancel_scope.cancel()
+
+    assert pid is not None
+    assert_gone(pid)
+
+
+async def test_cancelled_operation_starts_no_more_git(test_repository):
+    calls = []
+
+    def two_commands(repo):
+        try:
+            repo.git.sleepy()
+        except git.GitCommandError:
+            pass
+        try:
+            repo.git.version()
+        except OperationCancelled:
+            calls.append("refused")
+
+    with anyio.fail_after(10):
+        with anyio.CancelScope() as scope:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(run_cancellable, two_commands, test_repository)
+                await anyio.to_thread.run_sync(pid_of_sleep, test_repository)
+                scope.cancel()
+
+    # The worker finished before the cancellation propagated
+    assert calls == ["refused"]
+
+
+async def test_persistent_processes_survive_cancellation(test_repository):
+    Path(test_repository.working_dir, "file.txt").write_text("content")
+    test_repository.index.add(["file.txt"])
+    blob = test_repository.index.entries[("file.txt", 0)].binsha
+
+    def read_then_sleep(repo):
+        repo.odb.stream(blob).read()
+        repo.git.sleepy()
+
+    with anyio.fail_after(10):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(run_cancellable, read_then_sleep, test_repository)
+            await anyio.to_thread.run_sync(pid_of_sleep, test_repository)
+            tg.cancel_scope.cancel()
+
+    assert test_repository.odb.stream(blob).read() == b"content"
+
+
+async def test_tool_timeout(test_repository, monkeypatch):
+    monkeypatch.setattr(server_module, "git_status", lambda repo, *args: sleepy(repo))
+
+    async with create_connected_server_and_client_session(create_server(timeout=0.5)) as client:
+        with anyio.fail_after(10):
+            result = await client.call_tool("git_status", {"repo_path": test_repository.working_dir})
+
+    assert result.isError
+    assert "git_status did not finish within 0.5 seconds" in _text(result)
+    assert_gone(pid_of_sleep(test_repository))
+
+
+async def test_diff_over_time_budget_falls_back_to_name_status(test_repository):
+    # A textconv driver makes rendering the patch slow; listing names is not
+    test_repository.config_writer().set_value('diff "slow"', "textconv", "sleep 30; cat").release()
+    Path(test_repository.working_dir, ".gitattributes").write_text("*.txt diff=slow\n")
+    for content in ("before\n", "after\n"):
+        Path(test_repository.working_dir, "file.txt").write_text(content)
+        test_repository.git.add(".")
+        test_repository.git.commit("-m", content.strip())
+    Path(test_repository.working_dir, "file.txt").write_text("worktree\n")
+    repo_path = test_repository.working_dir
+
+    async with create_connected_server_and_client_session(create_server()) as client:
+        with anyio.fail_after(10):
+            unstaged = await client.call_tool("git_diff_unstaged", {"repo_path": repo_path, "time_budget": 0.2})
+            diff = await client.call_tool("git_diff", {"repo_path": repo_path, "target": "HEAD~1..HEAD", "time_budget": 0.2})
+            show = await client.call_tool("git_show", {"repo_path": repo_path, "revision": "HEAD", "time_budget": 0.2})
+
+    note = "[... diff did not finish within 0.2 seconds; showing changed files without rename detection instead ...]"
+    assert _text(unstaged) == f"Unstaged changes:\n{note}\nM\tfile.txt"
+    assert _text(diff) == f"Diff with HEAD~1..HEAD:\n{note}\nM\tfile.txt"
+    show = _text(show)
+    assert show.startswith(note)
+    assert "Message: after" in show
+    assert "M\tfile.txt" in show
+    assert "@@" not in show
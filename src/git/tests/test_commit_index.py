@@ -0,0 +1,136 @@
+import pytest
+from pathlib import Path
+import git
+from git.cmd import Git
+from mcp_server_git.commit_index import CommitIndex
+from mcp_server_git.server import git_log_indexed
+
+
+@pytest.fixture
+def test_repository(make_repository):
+    return make_repository()
+
+
+def _commit(repo: git.Repo, path: str, message: str, author: str = "Ann <ann@example.com>", day: int = 1) -> str:
+    file = Path(repo.working_dir, path)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(message)
+    repo.git.add(path)
+    date = f"2024-01-{day:02d}T12:00:00+0000"
+    repo.git.commit("-m", message, f"--author={author}", env={"GIT_COMMITTER_DATE": date, "GIT_AUTHOR_DATE": date})
+    return repo.head.commit.hexsha
+
+
+def _shas(index: CommitIndex, **filters) -> list[str]:
+    return [commit.sha for commit in index.query(100, **filters)]
+
+
+def test_query_filters(test_repository):
+    a = _commit(test_repository, "src/app/main.py", "Add app", day=1)
+    b = _commit(test_repository, "docs/guide.md", "Write guide", "Bob <bob@example.com>", day=2)
+    c = _commit(test_repository, "src/application.py", "Fix APP crash", "Bob <bob@example.com>", day=3)
+    test_repository.git.checkout("-q", "-b", "side", a)
+    d = _commit(test_repository, "src/app/side.py", "Side work", day=4)
+
+    index = CommitIndex(test_repository)
+    assert index.refresh()
+
+    # Newest first, across every branch
+    assert _shas(index) == [d, c, b, a]
+    assert _shas(index, author="bob") == [c, b]
+    assert _shas(index, author="ANN@EXAMPLE") == [d, a]
+    assert _shas(index, message="app") == [c, a]
+    assert _shas(index, paths=["src/app/"]) == [d, a]
+    assert _shas(index, paths=["src/app"]) == [d, a]
+    assert _shas(index, paths=["src/application.py"]) == [c]
+    assert _shas(index, paths=["src/app/main"]) == []
+    assert _shas(index, paths=[""]) == [d, c, b, a]
+    assert _shas(index, paths=["docs", "/"]) == [d, c, b, a]
+    assert _shas(index, paths=["docs", "src/app/"]) == [d, b, a]
+    day = 24 * 60 * 60
+    start = 1704110400  # 2024-01-01T12:00:00Z
+    assert _shas(index, since=start + day, until=start + 2 * day) == [c, b]
+    assert _shas(index, author="bob", paths=["src"]) == [c]
+    assert [commit.subject for commit in index.query(2)] == ["Side work", "Fix APP crash"]
+
+
+def test_incremental_refresh_and_persistence(test_repository):
+    first = _commit(test_repository, "a.txt", "first")
+    index = CommitIndex(test_repository)
+    assert index.refresh()
+    assert not index.refresh()
+
+    second = _commit(test_repository, "a.txt", "second", day=2)
+    assert index.refresh()
+    assert _shas(index) == [second, first]
+    index.close()
+
+    # The index lives in the repository and survives the handle
+    reopened = CommitIndex(test_repository)
+    assert not reopened.refresh()
+    assert _shas(reopened) == [second, first]
+    reopened.close()
+
+
+def test_rewritten_history_is_dropped(test_repository):
+    first = _commit(test_repository, "a.txt", "first")
+    _commit(test_repository, "a.txt", "second", day=2)
+    dropped = _commit(test_repository, "b.txt", "dropped", day=3)
+    index = CommitIndex(test_repository)
+    index.refresh()
+
+    # Like a force-push: the branch is rewound and rewritten
+    test_repository.git.reset("--hard", first)
+    replacement = _commit(test_repository, "c.txt", "replacement", day=4)
+    index.refresh()
+
+    assert dropped not in _shas(index)
+    assert _shas(index) == [replacement, first]
+    assert _shas(index, paths=["b.txt"]) == []
+
+
+def test_missing_tips_rebuild_the_index(test_repository):
+    first = _commit(test_repository, "a.txt", "first")
+    index = CommitIndex(test_repository)
+    index.refresh()
+    # A tip that no longer exists, as after a rewrite followed by gc
+    with index.db:
+        index.db.execute("INSERT INTO tips VALUES (?)", ("1" * 40,))
+
+    second = _commit(test_repository, "a.txt", "second", day=2)
+    assert index.refresh()
+    assert _shas(index) == [second, first]
+
+
+def test_failed_update_keeps_the_index(test_repository, monkeypatch):
+    first = _commit(test_repository, "a.txt", "first")
+    index = CommitIndex(test_repository)
+    index.refresh()
+    second = _commit(test_repository, "a.txt", "second", day=2)
+
+    # Like a walk killed by a time budget
+    original = Git._call_process
+    def killed(self, method, *args, **kwargs):
+        if method == "log":
+            raise git.GitCommandError(["git", "log"], -9)
+        return original(self, method, *args, **kwargs)
+    monkeypatch.setattr(Git, "_call_process", killed)
+    with pytest.raises(git.GitCommandError):
+        index.refresh()
+    monkeypatch.undo()
+    assert _shas(index) == [first]
+
+    monkeypatch.setattr(index, "_create", lambda: pytest.fail("index rebuilt"))
+    assert index.refresh()
+    assert _shas(index) == [second, first]
+
+
+def test_git_log_indexed(test_repository):
+    _commit(test_repository, "src/a.py", "feature", "Bob <bob@example.com>", day=1)
+    _commit(test_repository, "src/b.py", "fix", day=20)
+
+    log = git_log_indexed(test_repository, author="bob", paths=["src/"], start_timestamp="2023-12-01")
+    assert len(log) == 1
+    assert "Author: Bob\n" in log[0]
+    assert "Message: feature\n" in log[0]
+    assert git_log_indexed(test_repository, end_timestamp="2024-01-10", message="fix") == []
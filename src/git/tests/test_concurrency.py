@@ -0,0 +1,126 @@
+import threading
+import anyio
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp_server_git import server as server_module
+from mcp_server_git.locks import RWLock
+from mcp_server_git.server import create_server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_readers_share_lock():
+    lock = RWLock()
+    inside = 0
+    both_inside = anyio.Event()
+
+    async def reader():
+        nonlocal inside
+        async with lock.read():
+            inside += 1
+            if inside == 2:
+                both_inside.set()
+            await both_inside.wait()
+
+    with anyio.fail_after(5):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(reader)
+            tg.start_soon(reader)
+
+
+async def test_writer_excludes_readers_and_is_not_starved():
+    lock = RWLock()
+    events = []
+    release_first = anyio.Event()
+
+    async def first_reader():
+        async with lock.read():
+            events.append("read 1")
+            await release_first.wait()
+
+    async def writer():
+        async with lock.write():
+            events.append("write")
+
+    async def late_reader():
+        async with lock.read():
+            events.append("read 2")
+
+    with anyio.fail_after(5):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(first_reader)
+            await anyio.wait_all_tasks_blocked()
+            tg.start_soon(writer)
+            await anyio.wait_all_tasks_blocked()
+            tg.start_soon(late_reader)
+            await anyio.wait_all_tasks_blocked()
+            assert events == ["read 1"]
+            release_first.set()
+
+    assert events == ["read 1", "write", "read 2"]
+
+
+async def test_cancelled_writer_releases_waiting_readers():
+    lock = RWLock()
+    release = anyio.Event()
+    entered = []
+
+    async def holder():
+        async with lock.read():
+            await release.wait()
+
+    async def reader():
+        async with lock.read():
+            entered.append("read")
+
+    with anyio.fail_after(5):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(holder)
+            await anyio.wait_all_tasks_blocked()
+            with anyio.CancelScope() as scope:
+                scope.cancel()
+                tg.start_soon(reader)
+                async with lock.write():
+                    pass
+            await anyio.wait_all_tasks_blocked()
+            assert entered == ["read"]
+            release.set()
+
+
+async def test_slow_tool_does_not_block_other_requests(make_repository, monkeypatch):
+    slow_repo = make_repository({"file.txt": "content"}, name="slow")
+    other_repo = make_repository({"file.txt": "content"}, name="other")
+    started = threading.Event()
+    release = threading.Event()
+    original_status = server_module.git_status
+
+    def blocking_status(repo, *args, **kwargs):
+        if repo.working_dir == slow_repo.working_dir:
+            started.set()
+            release.wait(10)
+        return original_status(repo, *args, **kwargs)
+
+    monkeypatch.setattr(server_module, "git_status", blocking_status)
+    done = []
+
+    async with create_connected_server_and_client_session(create_server()) as client:
+        async def call(name, repo, tag, arguments={}):
+            await client.call_tool(name, {"repo_path": repo.working_dir, **arguments})
+            done.append(tag)
+
+        with anyio.fail_after(10):
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(call, "git_status", slow_repo, "slow status")
+                await anyio.to_thread.run_sync(started.wait)
+
+                # Reads of the same repository and any use of another repository proceed
+                await call("git_log", slow_repo, "log")
+                await call("git_add", other_repo, "other add", {"files": ["file.txt"]})
+
+                # A mutation of the busy repository waits for the read to finish
+                tg.start_soon(call, "git_add", slow_repo, "slow add", {"files": ["file.txt"]})
+                await anyio.sleep(0.2)
+                assert done == ["log", "other add"]
+                release.set()
+
+    assert done == ["log", "other add", "slow status", "slow add"]
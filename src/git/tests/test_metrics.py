@@ -0,0 +1,89 @@
+import math
+import re
+import anyio
+import pytest
+from pathlib import Path
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import TextContent, TextResourceContents
+from pydantic import AnyUrl
+from mcp_server_git.metrics import Histogram, Metrics
+from mcp_server_git.server import METRICS_URI, create_server
+
+
+def _sample(text: str, name: str) -> float:
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{name} not in metrics"
+    return float(match.group(1))
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0, math.inf))
+    for value in (0.05, 0.5, 0.5, 30.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [(0.1, 1), (1.0, 3), (math.inf, 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(31.05)
+
+
+def test_render_openmetrics():
+    metrics = Metrics(lambda: {"opened": 1, "reused": 2}, lambda: 1)
+    metrics.record("git_log", "ok", 0.003, 1, 120)
+    metrics.record("git_log", "error", 0.2, 2, 0)
+    text = metrics.render()
+
+    assert text.endswith("# EOF\n")
+    assert _sample(text, 'mcp_git_tool_duration_seconds_bucket{tool="git_log",le="0.005"}') == 1
+    assert _sample(text, 'mcp_git_tool_duration_seconds_bucket{tool="git_log",le="+Inf"}') == 2
+    assert _sample(text, 'mcp_git_tool_calls_total{tool="git_log",outcome="error"}') == 1
+    assert _sample(text, 'mcp_git_tool_processes_total{tool="git_log"}') == 3
+    assert _sample(text, 'mcp_git_tool_output_bytes_total{tool="git_log"}') == 120
+    assert _sample(text, 'mcp_git_repo_handles_total{event="reused"}') == 2
+    assert _sample(text, "mcp_git_repo_handles_open") == 1
+
+
+def test_metrics_resource_counts_tool_calls(test_repository):
+    async def main():
+        async with create_connected_server_and_client_session(create_server()) as client:
+            resources = await client.list_resources()
+            assert [str(resource.uri) for resource in resources.resources] == [METRICS_URI]
+
+            log = await client.call_tool("git_log", {"repo_path": test_repository.working_dir, "max_count": 1})
+            await client.call_tool("git_log", {"repo_path": test_repository.working_dir, "max_count": 1})
+            failed = await client.call_tool("git_show", {"repo_path": test_repository.working_dir, "revision": "nope"})
+            assert failed.isError
+
+            contents = (await client.read_resource(AnyUrl(METRICS_URI))).contents
+            return log.content[0], contents[0]
+
+    log, contents = anyio.run(main)
+    assert isinstance(log, TextContent) and isinstance(contents, TextResourceContents)
+    text = contents.text
+
+    assert contents.mimeType is not None
+    assert contents.mimeType.startswith("application/openmetrics-text")
+    assert _sample(text, 'mcp_git_tool_calls_total{tool="git_log",outcome="ok"}') == 2
+    assert _sample(text, 'mcp_git_tool_calls_total{tool="git_show",outcome="error"}') == 1
+    assert _sample(text, 'mcp_git_tool_duration_seconds_count{tool="git_log"}') == 2
+    assert _sample(text, 'mcp_git_tool_processes_total{tool="git_log"}') >= 2
+    assert _sample(text, 'mcp_git_tool_output_bytes_total{tool="git_log"}') == 2 * len(log.text.encode())
+    assert _sample(text, 'mcp_git_repo_handles_total{event="opened"}') == 1
+    assert _sample(text, 'mcp_git_repo_handles_total{event="reused"}') == 2
+
+
+def test_metrics_file_written_periodically_and_at_shutdown(test_repository, tmp_path: Path):
+    path = tmp_path / "metrics.txt"
+
+    async def main():
+        server = create_server(metrics_file=path, metrics_interval=0.01)
+        async with create_connected_server_and_client_session(server) as client:
+            await client.call_tool("git_status", {"repo_path": test_repository.working_dir})
+            with anyio.fail_after(5):
+                while not path.exists():
+                    await anyio.sleep(0.01)
+
+    anyio.run(main)
+
+    text = path.read_text()
+    assert _sample(text, 'mcp_git_tool_calls_total{tool="git_status",outcome="ok"}') == 1
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".")]
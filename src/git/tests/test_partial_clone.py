@@ -0,0 +1,124 @@
+import subprocess
+import anyio
+import pytest
+from pathlib import Path
+import git
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import CallToolResult, TextContent
+from mcp_server_git.pool import close_repo_state
+from mcp_server_git.server import NOT_PRESENT_NOTE, create_server, git_add, git_read_file, git_reset, git_status
+
+
+def _missing(repo: git.Repo) -> set[str]:
+    output = repo.git.rev_list("--objects", "--all", "--missing=print", "--no-object-names")
+    return {line[1:] for line in output.splitlines() if line.startswith("?")}
+
+
+@pytest.fixture
+def partial_clone(make_repository, tmp_path: Path):
+    """A blobless clone of a local bare repository, so nothing needs network access."""
+    source = make_repository(name="source")
+    (Path(source.working_dir) / "docs").mkdir()
+    for i in range(3):
+        Path(source.working_dir, "file.txt").write_text(f"version {i}\n")
+        Path(source.working_dir, "docs", "guide.txt").write_text(f"guide {i}\n")
+        source.git.add(".")
+        source.git.commit("-m", f"commit {i}")
+    source.git.branch("other", "HEAD~2")
+
+    remote = tmp_path / "promisor.git"
+    subprocess.run(["git", "clone", "-q", "--bare", source.working_dir, str(remote)], check=True)
+    subprocess.run(["git", "-C", str(remote), "config", "uploadpack.allowFilter", "true"], check=True)
+    subprocess.run(["git", "-C", str(remote), "config", "uploadpack.allowAnySHA1InWant", "true"], check=True)
+    subprocess.run(
+        ["git", "clone", "-q", "--filter=blob:none", f"file://{remote}", str(tmp_path / "clone")],
+        check=True,
+    )
+    repo = git.Repo(tmp_path / "clone")
+    repo.config_writer().set_value("user", "name", "Test User").release()
+    repo.config_writer().set_value("user", "email", "test@example.com").release()
+    assert _missing(repo)
+    yield repo
+    close_repo_state(repo)
+    repo.close()
+
+
+def _call(repo: git.Repo, *calls: tuple[str, dict]):
+    async def main():
+        async with create_connected_server_and_client_session(create_server()) as client:
+            return [
+                await client.call_tool(name, {"repo_path": repo.working_dir, **arguments})
+                for name, arguments in calls
+            ]
+
+    return anyio.run(main)
+
+
+def _text(result: CallToolResult) -> str:
+    content = result.content[0]
+    assert isinstance(content, TextContent)
+    return content.text
+
+
+def test_read_tools_report_missing_blobs_without_fetching(partial_clone):
+    missing = _missing(partial_clone)
+    old_blob = partial_clone.git.rev_parse("HEAD~2:file.txt")
+    assert old_blob in missing
+
+    show, diff, read, read_present, blame = _call(
+        partial_clone,
+        ("git_show", {"revision": "HEAD~1"}),
+        ("git_diff", {"target": "HEAD~2..HEAD~1"}),
+        ("git_read_file", {"paths": ["file.txt"], "revision": "HEAD~2"}),
+        ("git_read_file", {"paths": ["file.txt"]}),
+        ("git_blame", {"path": "file.txt"}),
+    )
+
+    show = _text(show)
+    assert show.startswith(NOT_PRESENT_NOTE)
+    assert "Message: commit 1" in show
+    assert "M\tfile.txt\t(not present locally)" in show
+    assert _text(diff) == (
+        f"Diff with HEAD~2..HEAD~1:\n{NOT_PRESENT_NOTE}\n"
+        "M\tdocs/guide.txt\t(not present locally)\nM\tfile.txt\t(not present locally)"
+    )
+    assert _text(read) == (
+        f"== HEAD~2:file.txt ({old_blob}) ==\n"
+        "Not present locally; this partial clone does not fetch missing objects"
+    )
+    # The checked-out version is local, and the cat-file process still works
+    assert _text(read_present).endswith("version 2\n")
+    assert blame.isError
+    assert "not present locally" in _text(blame)
+    assert _missing(partial_clone) == missing
+
+
+def test_objects_fetched_elsewhere_are_found(partial_clone):
+    assert "Not present locally" in git_read_file(partial_clone, ["file.txt"], "origin/other")
+
+    # Another process lazily fetches the blob into a new pack
+    blob = partial_clone.git.rev_parse("origin/other:file.txt")
+    subprocess.run(["git", "cat-file", "-p", blob], cwd=partial_clone.working_dir, check=True, capture_output=True)
+
+    assert git_read_file(partial_clone, ["file.txt"], "origin/other").endswith("\nversion 0\n")
+
+
+def test_checkout_still_fetches(partial_clone):
+    (result,) = _call(partial_clone, ("git_checkout", {"branch_name": "other"}))
+
+    assert not result.isError
+    assert Path(partial_clone.working_dir, "file.txt").read_text() == "version 0\n"
+
+
+def test_sparse_index_stays_sparse(partial_clone):
+    # Only files at the top level are checked out; docs/ is one index entry
+    partial_clone.git.sparse_checkout("set", "--sparse-index", "--cone")
+    assert "docs/" in partial_clone.git.ls_files("--sparse").split()
+
+    Path(partial_clone.working_dir, "file.txt").write_text("changed\n")
+    git_add(partial_clone, ["file.txt"])
+    assert "modified:   file.txt" in git_status(partial_clone)
+    git_reset(partial_clone)
+
+    assert "docs/" in partial_clone.git.ls_files("--sparse").split()
+    assert partial_clone.git.diff("--cached", "--name-only") == ""
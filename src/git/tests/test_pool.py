@@ -0,0 +1,230 @@
+import os
+import threading
+import anyio
+import pytest
+from pathlib import Path
+import git
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp_server_git import server
+from mcp_server_git.pool import RepoPool, close_repo_state, repo_state
+import shutil
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_repo(path: Path) -> git.Repo:
+    repo = git.Repo.init(path)
+    Path(path / "test.txt").write_text("test")
+    repo.index.add(["test.txt"])
+    repo.index.commit("initial commit")
+    return repo
+
+
+@pytest.fixture
+def repo_paths(tmp_path: Path):
+    paths = [tmp_path / f"repo{i}" for i in range(3)]
+    for path in paths:
+        make_repo(path)
+    return paths
+
+
+def test_pool_reuses_handle(repo_paths):
+    pool = RepoPool()
+    first = pool.get(repo_paths[0])
+    second = pool.get(str(repo_paths[0]) + "/.")
+
+    assert first is second
+    assert len(pool) == 1
+    pool.close()
+
+
+def test_pool_evicts_least_recently_used(repo_paths):
+    pool = RepoPool(max_size=2)
+    first = pool.get(repo_paths[0])
+    pool.get(repo_paths[1])
+    pool.get(repo_paths[0])
+    pool.get(repo_paths[2])
+
+    assert repo_paths[0] in pool
+    assert repo_paths[1] not in pool
+    assert repo_paths[2] in pool
+    assert pool.get(repo_paths[0]) is first
+    pool.close()
+    assert len(pool) == 0
+
+
+def test_pool_releases_cat_file_processes_on_eviction(repo_paths):
+    pool = RepoPool(max_size=1)
+    repo = pool.get(repo_paths[0])
+    repo.head.commit.tree  # starts a persistent cat-file process
+    assert repo.git.cat_file_all is not None or repo.git.cat_file_header is not None
+
+    pool.get(repo_paths[1])
+
+    assert repo.git.cat_file_all is None
+    assert repo.git.cat_file_header is None
+    pool.close()
+
+
+def test_pool_reaps_idle_handles(repo_paths):
+    clock = FakeClock()
+    pool = RepoPool(idle_timeout=10, clock=clock)
+    pool.get(repo_paths[0])
+    clock.now = 5
+    pool.get(repo_paths[1])
+
+    clock.now = 12
+    assert pool.reap() == 1
+    assert repo_paths[0] not in pool
+    assert repo_paths[1] in pool
+    pool.close()
+
+
+def test_pool_keeps_leased_handles_open(repo_paths):
+    clock = FakeClock()
+    pool = RepoPool(max_size=1, idle_timeout=10, clock=clock)
+    repo = pool.acquire(repo_paths[0])
+    repo.head.commit.tree  # starts a persistent cat-file process
+
+    clock.now = 12
+    assert pool.reap() == 0
+    # Evicted from the pool, but still open for the call using it
+    pool.get(repo_paths[1])
+    assert repo_paths[0] not in pool
+    assert repo.git.cat_file_all is not None or repo.git.cat_file_header is not None
+    assert repo.head.commit.message == "initial commit"
+
+    pool.release(repo)
+    assert repo.git.cat_file_all is None
+    assert repo.git.cat_file_header is None
+    pool.close()
+
+
+def test_pool_reaps_released_handles(repo_paths):
+    clock = FakeClock()
+    pool = RepoPool(idle_timeout=10, clock=clock)
+    repo = pool.acquire(repo_paths[0])
+    assert pool.acquire(repo_paths[0]) is repo
+    clock.now = 5
+    pool.release(repo)
+    pool.release(repo)
+
+    # Idle from the last release on, not from when it was acquired
+    clock.now = 12
+    assert pool.reap() == 0
+    clock.now = 16
+    assert pool.reap() == 1
+    pool.close()
+
+
+def test_pool_detects_replaced_repository(repo_paths):
+    pool = RepoPool()
+    first = pool.get(repo_paths[0])
+
+    shutil.rmtree(repo_paths[0])
+    make_repo(repo_paths[0])
+
+    assert pool.get(repo_paths[0]) is not first
+    pool.close()
+
+
+def test_pool_detects_moved_repository(repo_paths, tmp_path: Path):
+    pool = RepoPool()
+    pool.get(repo_paths[0])
+
+    repo_paths[0].rename(tmp_path / "moved")
+
+    with pytest.raises(git.NoSuchPathError):
+        pool.get(repo_paths[0])
+    assert repo_paths[0] not in pool
+    pool.close()
+
+
+def test_slow_repo_state_factory_does_not_block_other_repositories(repo_paths):
+    pool = RepoPool()
+    slow_repo, other_repo = pool.get(repo_paths[0]), pool.get(repo_paths[1])
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+    built = []
+
+    def slow_factory(repo):
+        started.set()
+        release.wait(2)
+        finished.set()
+        return "slow"
+
+    def build():
+        built.append(repo_state(slow_repo, "helper", slow_factory))
+
+    thread = threading.Thread(target=build)
+    thread.start()
+    assert started.wait(5)
+    # Built while the other factory is still running
+    assert repo_state(other_repo, "helper", lambda _: "other") == "other"
+    assert repo_state(slow_repo, "unrelated", lambda _: "fast") == "fast"
+    assert not finished.is_set()
+    release.set()
+    thread.join()
+
+    assert built == ["slow"]
+    assert repo_state(slow_repo, "helper", lambda _: pytest.fail("built twice")) == "slow"
+    pool.close()
+
+
+def test_repo_state_built_during_close_is_closed(repo_paths):
+    repo = git.Repo(repo_paths[0])
+    closed = []
+
+    class Helper:
+        def close(self):
+            closed.append(self)
+
+    def factory(repo):
+        # The pool releases the handle while the helper is being built
+        close_repo_state(repo)
+        return Helper()
+
+    helper = repo_state(repo, "helper", factory)
+    assert closed == [helper]
+    assert repo_state(repo, "helper", lambda _: "rebuilt") == "rebuilt"
+    close_repo_state(repo)
+    repo.close()
+
+
+def _cat_file_children() -> list[int]:
+    pids = []
+    for entry in os.listdir("/proc"):
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == os.getpid() and b"cat-file" in cmdline:
+            pids.append(int(entry))
+    return pids
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_server_reaps_idle_handles_without_further_calls(repo_paths, monkeypatch):
+    monkeypatch.setattr(server, "REPO_REAP_INTERVAL", 0.05)
+
+    async def main():
+        mcp_server = server.create_server(repo_idle_timeout=0.2)
+        async with create_connected_server_and_client_session(mcp_server) as client:
+            before = set(_cat_file_children())
+            await client.call_tool(
+                "git_read_file", {"repo_path": str(repo_paths[0]), "paths": ["test.txt"]}
+            )
+            assert set(_cat_file_children()) - before
+            with anyio.fail_after(5):
+                while set(_cat_file_children()) - before:
+                    await anyio.sleep(0.05)
+
+    anyio.run(main)
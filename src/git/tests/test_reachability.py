@@ -0,0 +1,175 @@
+import json
+import random
+import subprocess
+import pytest
+from pathlib import Path
+import git
+from git.cmd import Git
+from mcp_server_git.commit_graph import list_refs
+from mcp_server_git.pool import close_repo_state, repo_state
+from mcp_server_git.reachability import ReachabilityIndex, ahead_behind
+from mcp_server_git.server import git_branch, git_log
+
+
+def commit_file(repo: git.Repo, name: str, content: str) -> git.Commit:
+    Path(repo.working_dir, name).write_text(content)
+    repo.index.add([name])
+    return repo.index.commit(f"update {name}")
+
+
+@pytest.fixture
+def test_repository(make_repository):
+    repo = make_repository()
+    base = commit_file(repo, "base.txt", "base")
+    for name in ["one", "two", "three"]:
+        repo.git.checkout("-b", name, base.hexsha)
+        commit_file(repo, f"{name}.txt", name)
+    repo.git.checkout("master")
+    return repo
+
+
+def test_tips_containing(test_repository):
+    index = ReachabilityIndex(test_repository)
+    tips = {ref.name: ref.sha for ref in list_refs(test_repository, "refs/heads")}
+    one = tips["refs/heads/one"]
+
+    assert index.tips_containing(tips.values(), one) == {one}
+    assert index.tips_containing(tips.values(), tips["refs/heads/master"]) == set(tips.values())
+
+
+def test_tips_containing_is_cached_per_tip(test_repository, monkeypatch):
+    index = ReachabilityIndex(test_repository)
+    tips = [ref.sha for ref in list_refs(test_repository, "refs/heads")]
+    commit = test_repository.head.commit.hexsha
+    walked = []
+    original_walk = index._walk
+    monkeypatch.setattr(index, "_walk", lambda tips, commit: walked.append(set(tips)) or original_walk(tips, commit))
+
+    first = index.tips_containing(tips, commit)
+    second = index.tips_containing(tips, commit)
+    assert first == second
+    assert walked == [set(tips)]
+
+    test_repository.git.checkout("one")
+    moved = commit_file(test_repository, "more.txt", "more").hexsha
+    index.tips_containing([*tips, moved], commit)
+    assert walked[1] == {moved}
+
+
+def test_commit_graph_written_on_refresh(test_repository):
+    index = ReachabilityIndex(test_repository)
+
+    index.refresh()
+
+    graphs = Path(test_repository.git_dir, "objects", "info", "commit-graphs")
+    assert any(graphs.glob("*.graph"))
+    assert not index.commit_graph.refresh()
+
+
+def test_commit_graph_shared_by_log_and_branch(test_repository, monkeypatch):
+    # Refs that git_branch does not list still count toward the graph
+    test_repository.git.tag("v1", "one")
+    one = test_repository.commit("one").hexsha
+    writes = []
+    original = Git._call_process
+    def spy(self, method, *args, **kwargs):
+        if method == "commit_graph":
+            writes.append(args)
+        return original(self, method, *args, **kwargs)
+    monkeypatch.setattr(Git, "_call_process", spy)
+
+    for _ in range(5):
+        git_log(test_repository, paths=["base.txt"])
+        git_branch(test_repository, "local", contains=one)
+
+    assert len(writes) == 1
+
+
+def test_git_branch_uses_shared_index(test_repository):
+    one = test_repository.commit("one").hexsha
+
+    assert git_branch(test_repository, "local", contains=one).split() == ["one"]
+    assert repo_state(test_repository, "reachability", ReachabilityIndex)._answers
+
+    result = git_branch(test_repository, "local", contains="master", not_contains=one)
+    assert result.split() == ["*", "master", "three", "two"]
+
+
+def test_git_branch_contains_remote_branches(test_repository, tmp_path: Path):
+    clone = test_repository.clone(tmp_path / "clone")
+    two = clone.commit("origin/two").hexsha
+
+    assert git_branch(clone, "remote", contains=two).strip() == "origin/two"
+    assert git_branch(clone, "all", contains=two).strip() == "remotes/origin/two"
+    assert "origin/HEAD -> origin/master" in git_branch(clone, "remote", contains="master")
+    close_repo_state(clone)
+
+
+def test_ahead_behind_matches_rev_list(tmp_path: Path):
+    # A random history with merges, built with fast-import
+    rng = random.Random(1)
+    stream = []
+    for i in range(1, 201):
+        parents = rng.sample(range(1, i), min(i - 1, rng.choice([1, 1, 1, 2])))
+        stream.append(
+            f"commit refs/heads/b{i % 7}\nmark :{i}\n"
+            f"committer T <t@example.com> {1_600_000_000 + i} +0000\ndata 1\n{i % 10}\n"
+            + "".join(f"{'from' if n == 0 else 'merge'} :{p}\n" for n, p in enumerate(parents))
+            + f"M 644 inline f{i}\ndata 1\n{i % 10}\n\n"
+        )
+    path = tmp_path / "dag"
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    subprocess.run(["git", "fast-import", "--quiet", "--force"], cwd=path, input="".join(stream).encode(), check=True)
+    repo = git.Repo(path)
+    tips = [ref.sha for ref in list_refs(repo, "refs/heads")]
+    base = repo.git.rev_parse("b3~4")
+
+    counts = ahead_behind(repo, base, tips)
+
+    for tip in tips:
+        ahead, behind = repo.git.rev_list("--left-right", "--count", f"{tip}...{base}").split()
+        assert counts[tip] == (int(ahead), int(behind))
+    assert counts[base] == (0, 0)
+    repo.close()
+
+
+def test_git_branch_structured(test_repository, tmp_path: Path):
+    test_repository.git.checkout("two")
+    commit_file(test_repository, "two.txt", "two again")
+    test_repository.git.checkout("master")
+    clone = test_repository.clone(tmp_path / "clone")
+    clone.git.branch("--track", "two", "origin/two")
+    clone.git.checkout("two")
+    commit_file(clone, "local.txt", "local")
+    clone.git.checkout("master")
+    clone.git.branch("orphaned")
+    clone.git.branch("--set-upstream-to=origin/one", "orphaned")
+    clone.git.push("origin", "--delete", "one")
+    clone.git.fetch("--prune")
+
+    listing = json.loads(git_branch(clone, "local", structured=True, base="master"))
+    branches = {branch["name"]: branch for branch in listing["branches"]}
+    assert listing["base"] == {"name": "master", "sha": clone.commit("master").hexsha}
+    assert listing["total"] == 3
+    assert branches["two"]["sha"] == clone.commit("two").hexsha
+    assert branches["two"]["upstream"] == "origin/two"
+    assert (branches["two"]["upstream_ahead"], branches["two"]["upstream_behind"]) == (1, 0)
+    assert (branches["two"]["ahead"], branches["two"]["behind"]) == (3, 0)
+    assert branches["master"]["current"] and not branches["two"]["current"]
+    assert branches["master"]["upstream_ahead"] == 0
+    assert branches["orphaned"]["upstream_gone"]
+    assert branches["two"]["date"].startswith("20")
+
+    by_ahead = json.loads(git_branch(clone, "local", structured=True, base="master", sort="-ahead", limit=2))
+    assert [branch["name"] for branch in by_ahead["branches"]] == ["two", "master"]
+    assert by_ahead["next_offset"] == 2
+    rest = json.loads(git_branch(clone, "local", structured=True, base="master", sort="-ahead", offset=2))
+    assert [branch["name"] for branch in rest["branches"]] == ["orphaned"]
+    assert "next_offset" not in rest
+
+    remote = json.loads(git_branch(clone, "remote", structured=True, contains="two~1"))
+    assert [branch["name"] for branch in remote["branches"]] == ["origin/two"]
+    assert "ahead" not in remote["branches"][0]
+    with pytest.raises(ValueError):
+        git_branch(clone, "local", structured=True, sort="behind")
+    close_repo_state(clone)
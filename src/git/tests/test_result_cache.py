@@ -0,0 +1,98 @@
+import os
+import pytest
+from pathlib import Path
+from git.cmd import Git
+from mcp_server_git.pool import close_repo_state
+from mcp_server_git.result_cache import ResultCache
+from mcp_server_git.server import git_diff, git_show
+
+
+@pytest.fixture
+def test_repository(make_repository):
+    repo = make_repository()
+    for i in range(3):
+        Path(repo.working_dir, "file.txt").write_text(f"version {i}\n")
+        repo.git.add("file.txt")
+        repo.git.commit("-m", f"commit {i}")
+    return repo
+
+
+def test_memory_and_disk_tiers(tmp_path: Path):
+    cache = ResultCache(tmp_path / "cache")
+    cache.put(("a", 1), "value")
+    assert cache.get(("a", 1)) == "value"
+    assert cache.get(("a", 2)) is None
+
+    restarted = ResultCache(tmp_path / "cache")
+    assert len(restarted.memory) == 0
+    assert restarted.get(("a", 1)) == "value"
+    assert ResultCache().get(("a", 1)) is None
+
+
+def test_disk_budget_evicts_least_recently_used(tmp_path: Path):
+    cache = ResultCache(tmp_path / "cache", disk_budget=250)
+    for i in range(3):
+        cache.put(("key", i), str(i) * 100)
+        # Distinct mtimes even on coarse-grained filesystems
+        path = tmp_path / "cache" / ResultCache._digest(("key", i))
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+        cache._disk[path.name] = (100, i * 10**9)
+
+    cache.put(("key", 3), "3" * 100)
+
+    assert cache.disk_size <= 250
+    restarted = ResultCache(tmp_path / "cache", disk_budget=250)
+    assert restarted.get(("key", 0)) is None
+    assert restarted.get(("key", 1)) is None
+    assert restarted.get(("key", 3)) == "3" * 100
+
+
+def test_entry_removed_while_reading_is_a_miss(tmp_path: Path, monkeypatch):
+    cache = ResultCache(tmp_path / "cache")
+    cache.put(("a", 1), "value")
+    restarted = ResultCache(tmp_path / "cache")
+
+    # Another server trims the entry right after it was read
+    utime = os.utime
+    def utime_then_trim(path, *args, **kwargs):
+        utime(path, *args, **kwargs)
+        os.unlink(path)
+    monkeypatch.setattr(os, "utime", utime_then_trim)
+
+    assert restarted.get(("a", 1)) is None
+    assert restarted.disk_size == 0
+    monkeypatch.undo()
+    assert restarted.get(("a", 1)) is None
+
+
+def test_git_show_cached_by_commit_id(test_repository, monkeypatch):
+    cache = ResultCache()
+    first = git_show(test_repository, "HEAD", results=cache)
+    monkeypatch.setattr(Git, "show", lambda *args, **kwargs: pytest.fail("show was rerun"), raising=False)
+
+    assert git_show(test_repository, test_repository.head.commit.hexsha, results=cache) == first
+    monkeypatch.undo()
+
+    # A symbolic revision that moved resolves to a different key
+    Path(test_repository.working_dir, "file.txt").write_text("version 3\n")
+    test_repository.git.commit("-am", "commit 3")
+    assert "commit 3" in git_show(test_repository, "HEAD", results=cache)
+    # Render options are part of the key
+    assert git_show(test_repository, "HEAD", stat_only=True, results=cache) != git_show(test_repository, "HEAD", results=cache)
+
+
+def test_git_diff_between_commits_survives_restart(test_repository, tmp_path: Path, monkeypatch):
+    first = git_diff(test_repository, "HEAD~2..HEAD", results=ResultCache(tmp_path / "cache"))
+    close_repo_state(test_repository)
+    monkeypatch.setattr(Git, "diff", lambda *args, **kwargs: pytest.fail("diff was rerun"), raising=False)
+
+    assert git_diff(test_repository, "HEAD~2..HEAD", results=ResultCache(tmp_path / "cache")) == first
+
+
+def test_git_diff_against_worktree_bypasses_cache(test_repository):
+    cache = ResultCache()
+    git_diff(test_repository, "HEAD~1", results=cache)
+    assert len(cache.memory) == 0
+
+    git_diff(test_repository, "HEAD~1...HEAD", results=cache)
+    assert len(cache.memory) == 1
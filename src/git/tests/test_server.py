@@ -1,13 +1,20 @@
+import json
+import random
 import pytest
 from pathlib import Path
 import git
-from mcp_server_git.server import git_checkout, git_branch, git_add
+from git.cmd import Git
+from mcp_server_git.commit_graph import has_changed_paths
+from mcp_server_git.server import git_checkout, git_blame, git_branch, git_add, git_commit, git_grep, git_read_file, git_log, git_show, git_diff, git_diff_staged, git_diff_unstaged, git_status
 import shutil
 
 @pytest.fixture
 def test_repository(tmp_path: Path):
     repo_path = tmp_path / "temp_test_repo"
     test_repo = git.Repo.init(repo_path)
+    with test_repo.config_writer() as config:
+        config.set_value("user", "name", "Test User")
+        config.set_value("user", "email", "test@example.com")
 
     Path(repo_path / "test.txt").write_text("test")
     test_repo.index.add(["test.txt"])
@@ -91,3 +98,631 @@ def test_git_add_specific_files(test_repository):
     assert "file1.txt" in staged_files
     assert "file2.txt" not in staged_files
     assert result == "Files staged successfully"
+
+def test_git_add_many_files_and_deletions(test_repository):
+    names = [f"dir/file {i}.txt" for i in range(2000)]
+    (Path(test_repository.working_dir) / "dir").mkdir()
+    for name in names:
+        (Path(test_repository.working_dir) / name).write_text(name)
+    (Path(test_repository.working_dir) / "test.txt").unlink()
+
+    git_add(test_repository, [*names, "test.txt"])
+
+    staged = test_repository.git.diff("--cached", "--name-status", "HEAD").splitlines()
+    assert len(staged) == 2001
+    assert "D\ttest.txt" in staged
+
+def test_git_add_keeps_split_index(test_repository):
+    test_repository.git.update_index("--split-index")
+    (Path(test_repository.working_dir) / "new.txt").write_text("new")
+
+    git_add(test_repository, ["new.txt"])
+
+    assert list(Path(test_repository.git_dir).glob("sharedindex.*"))
+    assert "new.txt" in test_repository.git.ls_files("--cached").split()
+
+def test_git_commit_message_verbatim(test_repository):
+    (Path(test_repository.working_dir) / "test.txt").write_text("changed")
+    git_add(test_repository, ["test.txt"])
+    message = "subject\n\n# not a comment\nbody"
+
+    result = git_commit(test_repository, message)
+
+    assert result == f"Changes committed successfully with hash {test_repository.head.commit.hexsha}"
+    assert test_repository.head.commit.message == message
+    assert test_repository.head.commit.author.email == "test@example.com"
+    # Like before, a commit is made even when nothing is staged
+    git_commit(test_repository, "empty")
+    assert test_repository.head.commit.message == "empty"
+
+def test_git_commit_without_identity(tmp_path: Path, monkeypatch):
+    # No identity anywhere, and no guessing one from the host name
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for name in ["GIT_AUTHOR_NAME", "GIT_AUTHOR_EMAIL", "GIT_COMMITTER_NAME", "GIT_COMMITTER_EMAIL", "EMAIL"]:
+        monkeypatch.delenv(name, raising=False)
+    repo = git.Repo.init(tmp_path / "repo")
+    repo.config_writer().set_value("user", "useConfigOnly", "true").release()
+
+    git_commit(repo, "first")
+
+    default = git.Actor.committer(repo.config_reader())
+    assert (repo.head.commit.author.name, repo.head.commit.author.email) == (default.name, default.email)
+    assert repo.head.commit.committer.email == default.email
+    repo.close()
+
+def test_git_commit_runs_hooks(test_repository):
+    hooks = Path(test_repository.git_dir) / "hooks"
+    hooks.mkdir(exist_ok=True)
+    hook = hooks / "pre-commit"
+    hook.write_text("#!/bin/sh\necho rejected >&2\nexit 1\n")
+    hook.chmod(0o755)
+    head = test_repository.head.commit.hexsha
+
+    with pytest.raises(git.GitCommandError, match="rejected"):
+        git_commit(test_repository, "blocked")
+    assert test_repository.head.commit.hexsha == head
+
+def test_git_log_max_count(test_repository):
+    for i in range(5):
+        test_repository.index.commit(f"commit {i}")
+
+    result, _ = git_log(test_repository, max_count=3)
+
+    assert len(result) == 3
+    assert "Message: commit 4\n" in result[0]
+    assert f"Commit: {test_repository.head.commit.hexsha}\n" in result[0]
+
+def test_git_log_with_timestamps_and_unusual_messages(test_repository):
+    test_repository.index.commit("subject line\n\nbody line one\nCommit: fake\n")
+    test_repository.index.commit("tabs\tand ünïcödé")
+
+    result, _ = git_log(test_repository, max_count=2, start_timestamp="2000-01-01")
+
+    assert len(result) == 2
+    assert "Message: tabs\tand ünïcödé\n" in result[0]
+    assert "Message: subject line\n" in result[1]
+    assert all(entry.startswith("Commit: ") for entry in result)
+
+def test_git_log_timestamp_filter_excludes_commits(test_repository):
+    result, cursor = git_log(test_repository, end_timestamp="2000-01-01")
+    assert result == []
+    assert cursor is None
+
+def _commit_file(repo, name, content, message):
+    Path(repo.working_dir, name).write_text(content)
+    repo.index.add([name])
+    return repo.index.commit(message)
+
+def _all_pages(repo, page_size, **kwargs):
+    entries, cursor = git_log(repo, page_size, **kwargs)
+    pages = [entries]
+    while cursor is not None:
+        entries, cursor = git_log(repo, page_size, cursor=cursor)
+        pages.append(entries)
+    return pages
+
+@pytest.fixture
+def merge_repository(test_repository):
+    _commit_file(test_repository, "a.txt", "a1", "a1")
+    test_repository.git.checkout("-b", "side")
+    _commit_file(test_repository, "b.txt", "b1", "side b1")
+    _commit_file(test_repository, "a.txt", "a2", "side a2")
+    test_repository.git.checkout("master")
+    _commit_file(test_repository, "c.txt", "c1", "master c1")
+    test_repository.git.merge("--no-ff", "-m", "merge side", "side")
+    _commit_file(test_repository, "a.txt", "a3", "a3")
+    return test_repository
+
+@pytest.mark.parametrize("page_size", [1, 2, 3])
+def test_git_log_cursor_pages_match_full_log(merge_repository, page_size):
+    full, cursor = git_log(merge_repository, 100)
+    assert cursor is None
+
+    pages = _all_pages(merge_repository, page_size)
+
+    assert [entry for page in pages for entry in page] == full
+    assert all(len(page) == page_size for page in pages[:-1])
+
+def test_git_log_cursor_with_paths_and_first_parent(merge_repository):
+    full_paths, _ = git_log(merge_repository, 100, paths=["a.txt"])
+    paged_paths = _all_pages(merge_repository, 1, paths=["a.txt"])
+    assert [entry for page in paged_paths for entry in page] == full_paths
+    assert [entry.splitlines()[-1] for entry in full_paths] == [
+        "Message: a3", "Message: side a2", "Message: a1"
+    ]
+
+    full_first_parent, _ = git_log(merge_repository, 100, first_parent=True)
+    paged_first_parent = _all_pages(merge_repository, 2, first_parent=True)
+    assert [entry for page in paged_first_parent for entry in page] == full_first_parent
+    assert not any("Message: side" in entry for entry in full_first_parent)
+
+def test_git_log_cursor_is_stable_when_head_moves(merge_repository):
+    full, _ = git_log(merge_repository, 100)
+    first_page, cursor = git_log(merge_repository, 2)
+
+    _commit_file(merge_repository, "d.txt", "d1", "new commit after first page")
+
+    rest = []
+    while cursor is not None:
+        page, cursor = git_log(merge_repository, 2, cursor=cursor)
+        rest.extend(page)
+    assert first_page + rest == full
+
+@pytest.mark.parametrize("seed", range(10))
+def test_git_log_cursor_with_skewed_dates(test_repository, seed):
+    # Merges of random earlier commits, with commit dates hours out of order
+    rng = random.Random(seed)
+    commits = [test_repository.head.commit]
+    for i in range(30):
+        parents = rng.sample(commits, min(len(commits), rng.choice([1, 1, 2])))
+        date = f"{1700000000 + rng.randrange(-50, 50) * 3600 + i * 600} +0000"
+        commits.append(test_repository.index.commit(
+            f"commit {i}", parent_commits=parents, author_date=date, commit_date=date
+        ))
+    full, _ = git_log(test_repository, 100)
+
+    for page_size in [1, 2, 3, 5]:
+        entries = [entry for page in _all_pages(test_repository, page_size) for entry in page]
+        assert len(entries) == len(set(entries))
+        assert entries == full
+
+def test_git_log_zero_max_count(merge_repository):
+    assert git_log(merge_repository, 0) == ([], None)
+
+def test_git_log_invalid_cursor(test_repository):
+    with pytest.raises(ValueError):
+        git_log(test_repository, cursor="not-a-cursor")
+
+def test_git_log_follow_across_rename(test_repository):
+    _commit_file(test_repository, "old.txt", "".join(f"line {i}\n" for i in range(20)), "create")
+    _commit_file(test_repository, "old.txt", "".join(f"line {i}\n" for i in range(21)), "edit old")
+    test_repository.git.mv("old.txt", "new.txt")
+    test_repository.git.commit("-m", "rename")
+    _commit_file(test_repository, "new.txt", "".join(f"line {i}\n" for i in range(22)), "edit new")
+
+    plain, _ = git_log(test_repository, 100, paths=["new.txt"])
+    followed, cursor = git_log(test_repository, 100, paths=["new.txt"], follow=True)
+
+    assert [entry.splitlines()[3] for entry in plain] == ["Message: edit new", "Message: rename"]
+    assert cursor is None
+    assert [entry.splitlines()[3:] for entry in followed] == [
+        ["Message: edit new", "Path: new.txt"],
+        ["Message: rename", "Path: new.txt"],
+        ["Message: edit old", "Path: old.txt"],
+        ["Message: create", "Path: old.txt"],
+    ]
+    # Pages continue under the name the file had where the previous one ended
+    paged = _all_pages(test_repository, 1, paths=["new.txt"], follow=True)
+    assert [entry for page in paged for entry in page] == followed
+    with pytest.raises(ValueError):
+        git_log(test_repository, paths=["new.txt", "test.txt"], follow=True)
+
+def test_git_log_paths_write_bloom_filters(test_repository):
+    graphs = Path(test_repository.git_dir, "objects", "info")
+    # A graph without changed-path filters gets replaced by one with them
+    test_repository.git.commit_graph("write", "--reachable")
+    assert not has_changed_paths(str(graphs.parent))
+
+    git_log(test_repository, paths=["test.txt"])
+    assert has_changed_paths(str(graphs.parent))
+
+    _commit_file(test_repository, "test.txt", "changed", "change")
+    git_log(test_repository, paths=["test.txt"])
+    assert has_changed_paths(str(graphs.parent))
+    assert test_repository.head.commit.hexsha in test_repository.git.log("--format=%H", "-1", "test.txt")
+
+def test_git_show(test_repository):
+    commit = _commit_file(test_repository, "test.txt", "changed", "change test.txt")
+
+    result = git_show(test_repository, commit.hexsha)
+
+    assert f"Commit: {commit.hexsha}\n" in result
+    assert "Message: change test.txt" in result
+    assert "diff --git a/test.txt b/test.txt" in result
+    assert "-test\n" in result
+    assert "+changed" in result
+
+def test_git_show_root_commit(test_repository):
+    root = test_repository.head.commit
+
+    result = git_show(test_repository, root.hexsha)
+
+    assert "new file mode" in result
+    assert "+test" in result
+
+def test_git_show_binary_and_non_utf8(test_repository):
+    Path(test_repository.working_dir, "image.bin").write_bytes(b"\x89PNG\x00\x01\x02" * 100)
+    Path(test_repository.working_dir, "latin1.txt").write_bytes("caf\xe9\n".encode("latin-1"))
+    test_repository.index.add(["image.bin", "latin1.txt"])
+    test_repository.index.commit("binary and latin-1")
+
+    result = git_show(test_repository, "HEAD")
+
+    assert "Binary files /dev/null and b/image.bin differ" in result
+    assert "+caf�" in result
+
+def test_git_show_caps_and_stat_only(test_repository):
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        Path(test_repository.working_dir, name).write_text("".join(f"line {i}\n" for i in range(1000)))
+    test_repository.index.add(["a.txt", "b.txt", "c.txt"])
+    test_repository.index.commit("large files")
+
+    per_file = git_show(test_repository, "HEAD", max_file_bytes=500)
+    assert per_file.count("diff --git") == 3
+    assert per_file.count("bytes of this file's diff truncated ...]") == 3
+    assert "+line 999" not in per_file
+
+    total = git_show(test_repository, "HEAD", max_total_bytes=9000)
+    assert "diff --git a/a.txt" in total
+    assert "diff --git a/c.txt" not in total
+    assert "remaining files omitted" in total
+
+    stat = git_show(test_repository, "HEAD", stat_only=True)
+    assert "3 files changed, 3000 insertions(+)" in stat
+    assert "+line" not in stat
+
+def test_git_show_merge_diffs_against_first_parent(merge_repository):
+    result = git_show(merge_repository, "HEAD~1")
+
+    assert "Message: merge side" in result
+    assert "diff --git a/a.txt b/a.txt" in result
+    assert "diff --git a/b.txt b/b.txt" in result
+    assert "c.txt" not in result
+
+@pytest.fixture
+def diff_repository(test_repository):
+    for name in ["a.txt", "b.txt"]:
+        Path(test_repository.working_dir, name).write_text("".join(f"line {i}\n" for i in range(20)))
+    test_repository.index.add(["a.txt", "b.txt"])
+    test_repository.index.commit("add files")
+    for name in ["a.txt", "b.txt"]:
+        Path(test_repository.working_dir, name).write_text("".join(f"changed {i}\n" for i in range(20)))
+    return test_repository
+
+def test_git_diff_unstaged_summary_modes(diff_repository):
+    assert git_diff_unstaged(diff_repository, mode="name-status").splitlines() == ["M\ta.txt", "M\tb.txt"]
+    assert git_diff_unstaged(diff_repository, mode="numstat").splitlines() == ["20\t20\ta.txt", "20\t20\tb.txt"]
+    assert "2 files changed, 40 insertions(+), 40 deletions(-)" in git_diff_unstaged(diff_repository, mode="stat")
+    with pytest.raises(ValueError):
+        git_diff_unstaged(diff_repository, mode="word-diff")
+
+def test_git_diff_unstaged_paths_and_window(diff_repository):
+    full = git_diff_unstaged(diff_repository, paths=["a.txt"])
+    assert "a.txt" in full
+    assert "b.txt" not in full
+    lines = full.splitlines()
+
+    first = git_diff_unstaged(diff_repository, paths=["a.txt"], limit=10)
+    assert first.splitlines()[:10] == lines[:10]
+    assert f"pass offset=10 for more" in first
+
+    last = git_diff_unstaged(diff_repository, paths=["a.txt"], offset=10)
+    assert last.splitlines()[:-1] == lines[10:]
+    assert "pass offset" not in last
+
+def test_git_diff_window_reuses_cached_diff(diff_repository, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        Git, "diff",
+        lambda self, *args, **kwargs: calls.append(args) or self._call_process("diff", *args, **kwargs),
+        raising=False,
+    )
+
+    first = git_diff(diff_repository, "HEAD", limit=5)
+    git_diff(diff_repository, "HEAD", offset=5, limit=5)
+    git_diff(diff_repository, "HEAD", offset=10, limit=5)
+    assert len(calls) == 1
+
+    Path(diff_repository.working_dir, "a.txt").write_text("rewritten\n")
+    assert git_diff(diff_repository, "HEAD", limit=5) != first
+    assert len(calls) == 2
+
+def test_git_diff_staged_cache_follows_index(diff_repository):
+    assert git_diff_staged(diff_repository) == ""
+    diff_repository.index.add(["a.txt"])
+    assert git_diff_staged(diff_repository, mode="name-status") == "M\ta.txt"
+
+def test_git_diff_commit_range(merge_repository):
+    result = git_diff(merge_repository, "HEAD~2..HEAD", mode="name-status")
+    assert set(result.splitlines()) == {"M\ta.txt", "A\tb.txt"}
+
+def test_git_diff_rename_detection_and_algorithm(test_repository):
+    Path(test_repository.working_dir, "moved.txt").write_text("".join(f"line {i}\n" for i in range(20)))
+    test_repository.index.add(["moved.txt"])
+    test_repository.index.commit("add moved.txt")
+    test_repository.git.mv("moved.txt", "renamed.txt")
+    test_repository.index.commit("rename")
+
+    assert git_diff(test_repository, "HEAD~1..HEAD", mode="name-status", renames="renames").startswith("R100\tmoved.txt\trenamed.txt")
+    assert set(git_diff(test_repository, "HEAD~1..HEAD", mode="name-status", renames="off").splitlines()) == {
+        "D\tmoved.txt", "A\trenamed.txt",
+    }
+    assert "rename from moved.txt" in git_show(test_repository, "HEAD", renames="renames", algorithm="histogram")
+    with pytest.raises(ValueError):
+        git_diff(test_repository, "HEAD~1..HEAD", algorithm="fastest")
+
+def test_git_status_structured(test_repository, tmp_path: Path):
+    remote = git.Repo.init(tmp_path / "remote.git", bare=True)
+    test_repository.create_remote("origin", remote.working_dir).push("master:master")
+    test_repository.git.branch("--set-upstream-to=origin/master")
+    _commit_file(test_repository, "ahead.txt", "ahead", "ahead")
+    Path(test_repository.working_dir, "test.txt").write_text("modified")
+    Path(test_repository.working_dir, "new file.txt").write_text("untracked")
+    test_repository.git.mv("ahead.txt", "renamed.txt")
+
+    status = json.loads(git_status(test_repository, structured=True, untracked_cache=True, fsmonitor=True))
+
+    assert status["branch"]["head"] == "master"
+    assert status["branch"]["upstream"] == "origin/master"
+    assert (status["branch"]["ahead"], status["branch"]["behind"]) == (1, 0)
+    assert status["total"] == 3
+    by_path = {entry["path"]: entry for entry in status["entries"]}
+    assert by_path["test.txt"]["status"] == ".M"
+    assert by_path["renamed.txt"]["status"] == "R."
+    assert by_path["renamed.txt"]["orig_path"] == "ahead.txt"
+    assert by_path["new file.txt"]["status"] == "??"
+
+def test_git_status_structured_conflict(test_repository):
+    _commit_file(test_repository, "my file.txt", "base", "base")
+    test_repository.git.checkout("-b", "side")
+    _commit_file(test_repository, "my file.txt", "side", "side")
+    test_repository.git.checkout("master")
+    _commit_file(test_repository, "my file.txt", "master", "master")
+    with pytest.raises(git.GitCommandError):
+        test_repository.git.merge("side")
+
+    status = json.loads(git_status(test_repository, structured=True))
+
+    assert status["entries"] == [{"status": "UU", "path": "my file.txt", "unmerged": True}]
+
+def test_git_status_config_does_not_touch_the_shared_handle(test_repository, monkeypatch):
+    # Options set with Git.__call__ apply to that object's next command,
+    # whichever thread runs it
+    configured = []
+    original = Git.__call__
+    def spy(self, **kwargs):
+        configured.append(self)
+        return original(self, **kwargs)
+    monkeypatch.setattr(Git, "__call__", spy)
+
+    git_status(test_repository, untracked_cache=True)
+    git_status(test_repository, structured=True, untracked_cache=True)
+
+    assert configured
+    assert all(g is not test_repository.git for g in configured)
+
+def test_git_status_structured_pagination(test_repository):
+    for i in range(5):
+        Path(test_repository.working_dir, f"untracked{i}.txt").write_text("x")
+
+    first = json.loads(git_status(test_repository, structured=True, limit=2))
+    rest = json.loads(git_status(test_repository, structured=True, offset=first["next_offset"]))
+
+    assert [e["path"] for e in first["entries"]] == ["untracked0.txt", "untracked1.txt"]
+    assert [e["path"] for e in rest["entries"]] == [f"untracked{i}.txt" for i in range(2, 5)]
+    assert "next_offset" not in rest
+
+def test_git_status_text(test_repository):
+    Path(test_repository.working_dir, "untracked.txt").write_text("x")
+    assert "untracked.txt" in git_status(test_repository)
+    assert "untracked.txt" not in git_status(test_repository, untracked_files="no")
+
+@pytest.fixture
+def blame_repository(test_repository):
+    path = Path(test_repository.working_dir) / "blamed.txt"
+    for i, author in enumerate(["Alice", "Bob", "Carol"], start=1):
+        path.write_text("".join(f"line {n}\n" for n in range(1, i * 5 + 1)))
+        test_repository.git.add("blamed.txt")
+        test_repository.git.commit("-m", f"grow to {i * 5}", f"--author={author} <{author.lower()}@example.com>")
+    return test_repository
+
+def test_git_blame_collapses_ranges(blame_repository):
+    result = git_blame(blame_repository, "blamed.txt").splitlines()
+    shas = blame_repository.git.rev_list("HEAD", "--", "blamed.txt").split()
+
+    assert result[0] == f"Blame for blamed.txt at {shas[0]}:"
+    assert [line.split(" ")[0:3] for line in result[1:]] == [
+        ["1-5:", shas[2][:12], "Alice"],
+        ["6-10:", shas[1][:12], "Bob"],
+        ["11-15:", shas[0][:12], "Carol"],
+    ]
+    assert result[1].endswith("grow to 5")
+
+def test_git_blame_line_range_and_revision(blame_repository):
+    result = git_blame(blame_repository, "blamed.txt", start_line=4, end_line=7).splitlines()
+    assert [line.split(" ")[0] for line in result[1:]] == ["4-5:", "6-7:"]
+
+    result = git_blame(blame_repository, "blamed.txt", "HEAD~1", start_line=10).splitlines()
+    assert [line.split(" ")[0] for line in result[1:]] == ["10:"]
+
+def test_git_blame_is_cached(blame_repository, monkeypatch):
+    first = git_blame(blame_repository, "blamed.txt", start_line=2)
+    monkeypatch.setattr(Git, "blame", lambda *args, **kwargs: pytest.fail("blame was rerun"), raising=False)
+    assert git_blame(blame_repository, "blamed.txt", start_line=2) == first
+
+def test_git_blame_large_file_bounded_memory(test_repository):
+    import tracemalloc
+
+    path = Path(test_repository.working_dir) / "large.txt"
+    path.write_text("".join(f"line {n}\n" for n in range(50_000)))
+    test_repository.git.add("large.txt")
+    test_repository.git.commit("-m", "large")
+    # Every other line changes, so blame reports 50k single-line groups
+    path.write_text("".join(f"line {n}{' changed' if n % 2 else ''}\n" for n in range(50_000)))
+    test_repository.git.commit("-am", "every other line")
+
+    tracemalloc.start()
+    result = git_blame(test_repository, "large.txt")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(result.splitlines()) == 50_001
+    assert peak < 64 * 1024 * 1024
+
+@pytest.fixture
+def grep_repository(test_repository):
+    worktree = Path(test_repository.working_dir)
+    (worktree / "src").mkdir()
+    (worktree / "src" / "a.py").write_text("".join(f"value_{i} = {i}\n" for i in range(5)))
+    (worktree / "src" / "b.py").write_text("import a\nprint(a.value_1)\n")
+    (worktree / "binary.bin").write_bytes(b"value_0\0")
+    test_repository.git.add(".")
+    test_repository.git.commit("-m", "add sources")
+    (worktree / "src" / "b.py").write_text("import a\nprint(a.value_2)\n")
+    test_repository.git.commit("-am", "use value_2")
+    return test_repository
+
+def test_git_grep_worktree_index_and_revision(grep_repository):
+    (Path(grep_repository.working_dir) / "src" / "b.py").write_text("value_3 in worktree\n")
+
+    matches, cursor = git_grep(grep_repository, r"a\.value_[0-9]")
+    assert matches == []
+    assert cursor is None
+    assert git_grep(grep_repository, "a.value_", fixed_strings=True, cached=True)[0] == ["src/b.py:2: print(a.value_2)"]
+    assert git_grep(grep_repository, "A.VALUE_", fixed_strings=True, ignore_case=True, revision="HEAD~1")[0] == [
+        "src/b.py:2: print(a.value_1)"
+    ]
+    assert git_grep(grep_repository, "value_3", paths=["src/b.py"])[0] == ["src/b.py:1: value_3 in worktree"]
+
+def test_git_grep_caps_and_cursor(grep_repository):
+    matches, _ = git_grep(grep_repository, "value_", max_matches_per_file=2, revision="HEAD")
+    assert matches == ["src/a.py:1: value_0 = 0", "src/a.py:2: value_1 = 1", "src/b.py:2: print(a.value_2)"]
+
+    pages, cursor = [], None
+    while True:
+        matches, cursor = git_grep(grep_repository, "value_", threads=2, max_matches=2, cursor=cursor)
+        pages.append(matches)
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [2, 2, 2]
+    assert [m for page in pages for m in page] == git_grep(grep_repository, "value_")[0]
+
+def test_git_grep_caps_without_max_count(grep_repository, monkeypatch):
+    native = [
+        git_grep(grep_repository, "value_", max_matches_per_file=2, max_matches=max_matches)
+        for max_matches in [1, 2, 3]
+    ]
+    # git before 2.38 has no git grep --max-count
+    monkeypatch.setattr(Git, "version_info", (2, 37, 0))
+    commands = []
+    original = Git._call_process
+    def spy(self, method, *args, **kwargs):
+        commands.append(args)
+        return original(self, method, *args, **kwargs)
+    monkeypatch.setattr(Git, "_call_process", spy)
+
+    for max_matches, (matches, cursor) in zip([1, 2, 3], native):
+        assert git_grep(grep_repository, "value_", max_matches_per_file=2, max_matches=max_matches)[0] == matches
+        pages = []
+        while cursor is not None:
+            page, cursor = git_grep(grep_repository, "ignored", cursor=cursor)
+            pages += page
+        assert matches + pages == git_grep(grep_repository, "value_", max_matches_per_file=2)[0]
+    assert not any(arg.startswith("--max-count") for args in commands for arg in args)
+
+@pytest.mark.parametrize("revision", [None, "HEAD"])
+def test_git_grep_cursor_skips_searched_files(test_repository, monkeypatch, revision):
+    worktree = Path(test_repository.working_dir)
+    for d in range(4):
+        (worktree / f"d{d}" / "sub").mkdir(parents=True)
+        for name in ["a.txt", "sub/b.txt"]:
+            (worktree / f"d{d}" / name).write_text("hit\nmiss\nhit\n")
+    test_repository.git.add(".")
+    test_repository.git.commit("-m", "add files")
+    full, _ = git_grep(test_repository, "hit", revision=revision)
+
+    pathspecs = []
+    original = Git._call_process
+    def spy(self, method, *args, **kwargs):
+        if method == "grep":
+            pathspecs.append(args[args.index("--") + 1:])
+        return original(self, method, *args, **kwargs)
+    monkeypatch.setattr(Git, "_call_process", spy)
+
+    pages, cursor = [], None
+    while True:
+        matches, cursor = git_grep(test_repository, "hit", revision=revision, max_matches=3, cursor=cursor)
+        pages.append(matches)
+        if cursor is None:
+            break
+    assert [m for page in pages for m in page] == full
+    # The third page resumes in d1/sub/b.txt; everything before it is left out
+    assert pathspecs[2] == (":(exclude,literal)d0", ":(exclude,literal)d1/a.txt")
+
+def test_git_grep_pickaxe(grep_repository):
+    shas = grep_repository.git.rev_list("HEAD").split()
+
+    matches, _ = git_grep(grep_repository, "a.value_1", pickaxe="S", fixed_strings=True)
+    assert [m.split()[0] for m in matches] == shas[:2]
+    matches, cursor = git_grep(grep_repository, r"value_[12]\)", pickaxe="G", max_matches=1)
+    assert [m.split()[0] for m in matches] == [shas[0]]
+    matches, cursor = git_grep(grep_repository, "ignored", cursor=cursor)
+    assert [m.split()[0] for m in matches] == [shas[1]]
+    assert cursor is None
+
+    with pytest.raises(ValueError):
+        git_grep(grep_repository, "x", pickaxe="X")
+    with pytest.raises(ValueError, match="fixed_strings"):
+        git_grep(grep_repository, "a.value_1", pickaxe="G", fixed_strings=True)
+
+@pytest.fixture
+def read_repository(test_repository):
+    worktree = Path(test_repository.working_dir)
+    (worktree / "lines.txt").write_text("".join(f"line {n}\n" for n in range(1, 101)))
+    (worktree / "image.bin").write_bytes(b"\x89PNG\0" + bytes(range(256)) * 100)
+    test_repository.git.add(".")
+    test_repository.git.commit("-m", "add files")
+    (worktree / "lines.txt").write_text("rewritten\n")
+    test_repository.git.commit("-am", "rewrite")
+    return test_repository
+
+def test_git_read_file_ranges(read_repository):
+    blob = read_repository.git.rev_parse("HEAD~1:lines.txt")
+
+    result = git_read_file(read_repository, ["lines.txt"], "HEAD~1", start_line=3, end_line=4)
+    assert result == f"== HEAD~1:lines.txt (blob {blob}, 792 bytes) ==\nline 3\nline 4\n"
+    result = git_read_file(read_repository, ["lines.txt"], "HEAD~1", start_byte=7, end_byte=13)
+    assert result.splitlines()[1:] == ["line 2"]
+    assert git_read_file(read_repository, ["lines.txt"]).endswith("\nrewritten\n")
+
+    result = git_read_file(read_repository, ["lines.txt"], "HEAD~1", start_line=99, max_bytes=5)
+    assert result.splitlines()[1:] == ["line ", "[... truncated at 5 bytes; request a later range for more ...]"]
+
+    with pytest.raises(ValueError):
+        git_read_file(read_repository, ["lines.txt"], start_byte=0, start_line=1)
+
+def test_git_read_file_truncation_at_chunk_boundary(read_repository):
+    worktree = Path(read_repository.working_dir)
+    (worktree / "big.txt").write_text("".join(f"{n}\n" for n in range(20000)))
+    read_repository.git.add("big.txt")
+    read_repository.git.commit("-m", "add big file")
+    marker = "[... truncated at {} bytes; request a later range for more ...]"
+
+    # The first chunk read from cat-file is exactly 8000 bytes long
+    result = git_read_file(read_repository, ["big.txt"], max_bytes=8000)
+    assert result.endswith(marker.format(8000))
+    result = git_read_file(read_repository, ["lines.txt"], "HEAD~2", max_bytes=791)
+    assert result.endswith(marker.format(791))
+    result = git_read_file(read_repository, ["lines.txt"], "HEAD~2", max_bytes=792)
+    assert result.endswith("line 100\n")
+
+def test_git_read_file_multiple_paths_binary_and_missing(read_repository):
+    (Path(read_repository.working_dir) / "lines.txt").write_text("staged\n")
+    read_repository.git.add("lines.txt")
+
+    result = git_read_file(read_repository, ["image.bin", "missing.txt", "lines.txt"], "")
+    sections = result.split("\n\n")
+    assert sections[0].endswith("25605 bytes) ==\nBinary file, content not shown")
+    assert sections[1] == "== :missing.txt ==\nNot found"
+    assert sections[2].endswith("7 bytes) ==\nstaged\n")
+
+    sizes = git_read_file(read_repository, ["image.bin", "lines.txt"], size_only=True)
+    assert [line.split(", ")[1] for line in sizes.split("\n\n")] == ["25605 bytes) ==", "10 bytes) =="]
+
+def test_git_read_file_reuses_cat_file_process(read_repository, monkeypatch):
+    git_read_file(read_repository, ["lines.txt"])
+    monkeypatch.setattr("git.cmd.safer_popen", lambda *args, **kwargs: pytest.fail("spawned a process"))
+
+    for revision in ["HEAD", "HEAD~1"] * 25:
+        assert "(blob " in git_read_file(read_repository, ["lines.txt", "image.bin"], revision, start_line=1, end_line=1)
@@ -0,0 +1,81 @@
+import json
+import re
+import anyio
+from pathlib import Path
+import git
+from mcp.shared.memory import create_connected_server_and_client_session
+from pydantic import AnyUrl
+from mcp_server_git.pool import RepoPool
+from mcp_server_git.server import (
+    METRICS_URI,
+    TOOL_SCHEMAS_FILE,
+    GitTools,
+    create_server,
+    generate_tool_schemas,
+    tool_definitions,
+)
+
+
+def test_tool_schemas_file_is_up_to_date():
+    # After changing a tool's model, regenerate the file with:
+    #   uv run python -c "from mcp_server_git.server import write_tool_schemas; write_tool_schemas()"
+    assert json.loads(TOOL_SCHEMAS_FILE.read_text()) == generate_tool_schemas()
+    assert sorted(tool.name for tool in tool_definitions()) == sorted(tool.value for tool in GitTools)
+
+
+def test_tools_list_is_served_from_cache():
+    async def main():
+        async with create_connected_server_and_client_session(create_server()) as client:
+            first = await client.list_tools()
+            second = await client.list_tools()
+            return first.tools, second.tools
+
+    first, second = anyio.run(main)
+    assert first == second
+    assert tool_definitions() is tool_definitions()
+    assert {tool.name: tool.inputSchema for tool in first} == generate_tool_schemas()
+
+
+def test_repository_is_opened_in_the_background(tmp_path: Path):
+    repo = git.Repo.init(tmp_path / "repo")
+
+    async def opened(client) -> int:
+        text = (await client.read_resource(AnyUrl(METRICS_URI))).contents[0].text
+        match = re.search(r'^mcp_git_repo_handles_total\{event="opened"\} (\S+)$', text, re.MULTILINE)
+        return int(float(match.group(1))) if match else 0
+
+    async def main():
+        server = create_server(Path(repo.working_dir))
+        async with create_connected_server_and_client_session(server) as client:
+            with anyio.fail_after(5):
+                while not await opened(client):
+                    await anyio.sleep(0.01)
+            # The first tool call reuses the handle
+            await client.call_tool("git_status", {"repo_path": repo.working_dir})
+            assert await opened(client) == 1
+
+    anyio.run(main)
+    repo.close()
+
+
+def test_invalid_repository_does_not_prevent_startup(tmp_path: Path):
+    async def main():
+        server = create_server(tmp_path / "missing")
+        async with create_connected_server_and_client_session(server) as client:
+            return await client.list_tools()
+
+    assert len(anyio.run(main).tools) == len(GitTools)
+
+
+def test_failing_repository_open_does_not_prevent_startup(tmp_path: Path, monkeypatch):
+    def denied(self, repo_path):
+        raise PermissionError(13, "Permission denied", str(repo_path))
+    monkeypatch.setattr(RepoPool, "get", denied)
+
+    async def main():
+        server = create_server(tmp_path)
+        async with create_connected_server_and_client_session(server) as client:
+            await anyio.sleep(0.05)
+            return await client.list_tools()
+
+    assert len(anyio.run(main).tools) == len(GitTools)
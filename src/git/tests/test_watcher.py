@@ -0,0 +1,183 @@
+import json
+import shutil
+import pytest
+from pathlib import Path
+from git.cmd import Git
+from mcp_server_git.pool import repo_state
+from mcp_server_git.server import git_diff_unstaged, git_status
+from mcp_server_git.watcher import WorktreeWatcher
+
+pytestmark = pytest.mark.skipif(not WorktreeWatcher.supported(), reason="inotify is Linux-only")
+
+
+@pytest.fixture
+def test_repository(make_repository):
+    return make_repository({
+        name: name for name in ["a.txt", "b.txt", "sub/c.txt", "sub/deep/d.txt", ".github/ci.yml"]
+    })
+
+
+def entries(status: str) -> list[tuple[str, str]]:
+    return sorted((e["status"], e["path"]) for e in json.loads(status)["entries"])
+
+
+def test_begin_scan_reports_touched_paths(test_repository):
+    watcher = WorktreeWatcher(test_repository)
+    assert watcher.begin_scan("fp") is None
+    watcher.end_scan("fp", [])
+
+    Path(test_repository.working_dir, "sub", "c.txt").write_text("changed")
+    Path(test_repository.working_dir, "new.txt").write_text("new")
+
+    assert watcher.begin_scan("fp") == ["new.txt", "sub/c.txt"]
+    watcher.end_scan("fp", ["new.txt", "sub/c.txt"])
+    # Paths reported dirty are re-examined until a scan says they are clean
+    assert watcher.begin_scan("fp") == ["new.txt", "sub/c.txt"]
+    watcher.close()
+
+
+def test_aborted_scan_keeps_touched_paths(test_repository):
+    watcher = WorktreeWatcher(test_repository)
+    watcher.begin_scan("fp")
+    watcher.end_scan("fp", [])
+    Path(test_repository.working_dir, "a.txt").write_text("changed")
+
+    assert watcher.begin_scan("fp") == ["a.txt"]
+    # Still pending while the scan runs, and handed back when it fails
+    assert watcher.pending_paths("fp") == ["a.txt"]
+    watcher.abort_scan()
+    assert watcher.begin_scan("fp") == ["a.txt"]
+    watcher.end_scan("fp", [])
+    assert watcher.begin_scan("fp") == []
+    watcher.close()
+
+
+def test_rescan_when_fingerprint_changes(test_repository):
+    watcher = WorktreeWatcher(test_repository)
+    watcher.begin_scan("fp")
+    watcher.end_scan("fp", [])
+
+    assert watcher.begin_scan("other") is None
+    assert watcher.begin_scan("fp", scope="all") is None
+    watcher.close()
+
+
+def test_rescan_when_too_many_paths(test_repository):
+    watcher = WorktreeWatcher(test_repository, max_paths=2)
+    watcher.begin_scan("fp")
+    watcher.end_scan("fp", [])
+    for i in range(3):
+        Path(test_repository.working_dir, f"new{i}.txt").write_text("new")
+
+    assert watcher.begin_scan("fp") is None
+    watcher.close()
+
+
+def test_new_directories_are_watched(test_repository):
+    watcher = WorktreeWatcher(test_repository)
+    watcher.begin_scan("fp")
+    watcher.end_scan("fp", [])
+
+    Path(test_repository.working_dir, "newdir").mkdir()
+    assert watcher.begin_scan("fp") == ["newdir"]
+    watcher.end_scan("fp", ["newdir/"])
+    Path(test_repository.working_dir, "newdir", "file.txt").write_text("x")
+
+    assert watcher.begin_scan("fp") == ["newdir/", "newdir/file.txt"]
+    watcher.close()
+
+
+def test_dot_directories_keep_their_name(test_repository):
+    watcher = repo_state(test_repository, "watcher", WorktreeWatcher)
+    assert entries(git_status(test_repository, structured=True, watcher=watcher)) == []
+
+    Path(test_repository.working_dir, ".github", "ci.yml").write_text("changed")
+
+    assert entries(git_status(test_repository, structured=True, watcher=watcher)) == [(".M", ".github/ci.yml")]
+
+
+def test_moved_directory_forces_rescan(test_repository):
+    watcher = WorktreeWatcher(test_repository)
+    watcher.begin_scan("fp")
+    watcher.end_scan("fp", [])
+
+    shutil.move(Path(test_repository.working_dir, "sub"), Path(test_repository.working_dir, "moved"))
+    assert watcher.begin_scan("fp") is None
+    watcher.end_scan("fp", [])
+    Path(test_repository.working_dir, "moved", "deep", "d.txt").write_text("changed")
+
+    assert watcher.begin_scan("fp") == ["moved/deep/d.txt"]
+    watcher.close()
+
+
+def test_git_status_incremental_matches_full(test_repository, monkeypatch):
+    watcher = repo_state(test_repository, "watcher", WorktreeWatcher)
+    assert entries(git_status(test_repository, structured=True, watcher=watcher)) == []
+
+    worktree = Path(test_repository.working_dir)
+    (worktree / "a.txt").write_text("changed")
+    (worktree / "sub" / "deep" / "d.txt").unlink()
+    (worktree / "untracked").mkdir()
+    (worktree / "untracked" / "e.txt").write_text("e")
+
+    pathspecs = []
+    original = Git._call_process
+    def spy(self, method, *args, **kwargs):
+        if method == "status":
+            pathspecs.append(args[args.index("--") + 1:])
+        return original(self, method, *args, **kwargs)
+    monkeypatch.setattr(Git, "_call_process", spy)
+
+    incremental = git_status(test_repository, structured=True, watcher=watcher)
+    assert pathspecs[0] == (":(literal)a.txt", ":(literal)sub/deep/d.txt", ":(literal)untracked")
+    assert entries(incremental) == entries(git_status(test_repository, structured=True))
+    assert entries(incremental) == [(".D", "sub/deep/d.txt"), (".M", "a.txt"), ("??", "untracked/")]
+
+    # Reverting a change is picked up because dirty paths stay tracked
+    (worktree / "a.txt").write_text("a.txt")
+    assert entries(git_status(test_repository, structured=True, watcher=watcher)) == [
+        (".D", "sub/deep/d.txt"), ("??", "untracked/")
+    ]
+    text = git_status(test_repository, watcher=watcher)
+    assert "deleted:    sub/deep/d.txt" in text
+    assert "untracked/" in text
+    assert "a.txt" not in text
+
+
+def test_git_status_failed_scan_is_not_forgotten(test_repository, monkeypatch):
+    watcher = repo_state(test_repository, "watcher", WorktreeWatcher)
+    git_status(test_repository, structured=True, watcher=watcher)
+    Path(test_repository.working_dir, "a.txt").write_text("changed")
+
+    original = Git._call_process
+    def fail_status(self, method, *args, **kwargs):
+        if method == "status":
+            raise TimeoutError("status took too long")
+        return original(self, method, *args, **kwargs)
+    monkeypatch.setattr(Git, "_call_process", fail_status)
+    with pytest.raises(TimeoutError):
+        git_status(test_repository, structured=True, watcher=watcher)
+    monkeypatch.undo()
+
+    assert entries(git_status(test_repository, structured=True, watcher=watcher)) == [(".M", "a.txt")]
+
+
+def test_git_status_rescans_after_index_change(test_repository):
+    watcher = repo_state(test_repository, "watcher", WorktreeWatcher)
+    git_status(test_repository, structured=True, watcher=watcher)
+    Path(test_repository.working_dir, "a.txt").write_text("changed")
+    test_repository.git.add("a.txt")
+
+    status = git_status(test_repository, structured=True, watcher=watcher)
+    assert entries(status) == [("M.", "a.txt")]
+    assert entries(status) == entries(git_status(test_repository, structured=True))
+
+
+def test_git_diff_unstaged_only_diffs_touched_paths(test_repository):
+    watcher = repo_state(test_repository, "watcher", WorktreeWatcher)
+    git_status(test_repository, structured=True, watcher=watcher)
+    assert git_diff_unstaged(test_repository, watcher=watcher) == ""
+
+    Path(test_repository.working_dir, "sub", "c.txt").write_text("changed")
+    assert git_diff_unstaged(test_repository, mode="name-status", watcher=watcher) == "M\tsub/c.txt"
+    assert git_diff_unstaged(test_repository, watcher=watcher) == git_diff_unstaged(test_repository)
@@ -0,0 +1,150 @@
+import anyio
+import pytest
+from pathlib import Path
+import git
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import TextContent
+from mcp_server_git.server import create_server
+from mcp_server_git.worktrees import WorktreePool
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def test_repository(make_repository):
+    repo = make_repository({"file.txt": "content"})
+    repo.git.branch("feature")
+    return repo
+
+
+def _worktrees(repo: git.Repo) -> list[str]:
+    return [
+        line.removeprefix("worktree ")
+        for line in repo.git.worktree("list", "--porcelain").splitlines()
+        if line.startswith("worktree ")
+    ]
+
+
+def test_acquire_checks_out_in_separate_worktrees(test_repository):
+    pool = WorktreePool()
+    detached = pool.acquire(test_repository)
+    feature = pool.acquire(test_repository, branch="feature")
+    created = pool.acquire(test_repository, new_branch="topic")
+
+    assert len({detached, feature, created}) == 3
+    assert git.Repo(detached).head.is_detached
+    assert git.Repo(feature).active_branch.name == "feature"
+    assert git.Repo(created).active_branch.name == "topic"
+    assert (detached / "file.txt").read_text() == "content"
+    # A branch can only be checked out in one worktree at a time
+    with pytest.raises(git.GitCommandError):
+        pool.acquire(test_repository, branch="feature")
+    assert len(pool) == 3
+    assert test_repository.active_branch.name == "master"
+
+    pool.close()
+    assert _worktrees(test_repository) == [test_repository.working_dir]
+
+
+def test_release_recycles_a_clean_worktree(test_repository):
+    pool = WorktreePool()
+    path = pool.acquire(test_repository, branch="feature")
+    (path / "file.txt").write_text("changed")
+    (path / "untracked.txt").write_text("untracked")
+
+    pool.release(path)
+    with pytest.raises(ValueError):
+        pool.release(path)
+
+    # The branch is free again, and the worktree comes back clean
+    again = pool.acquire(test_repository, branch="feature")
+    assert again == path
+    assert (path / "file.txt").read_text() == "content"
+    assert not (path / "untracked.txt").exists()
+    assert pool.stats["created"] == 1
+    assert pool.stats["recycled"] == 1
+    pool.close()
+
+
+def test_worktrees_per_repository_are_bounded(test_repository):
+    pool = WorktreePool(max_worktrees=2)
+    first = pool.acquire(test_repository)
+    pool.acquire(test_repository)
+
+    with pytest.raises(ValueError, match="in use"):
+        pool.acquire(test_repository)
+    pool.release(first)
+    assert pool.acquire(test_repository) == first
+    pool.close()
+
+
+def test_idle_and_over_budget_worktrees_are_removed(test_repository):
+    clock = FakeClock()
+    pool = WorktreePool(idle_timeout=60, budget=len("content"), clock=clock)
+    leased = pool.acquire(test_repository)
+    kept, removed = pool.acquire(test_repository), pool.acquire(test_repository)
+
+    pool.release(removed)
+    clock.now = 1
+    pool.release(kept)
+    # Only the most recently released worktree fits in the budget
+    assert pool.stats["over_budget"] == 1
+    assert not removed.exists()
+
+    clock.now = 30
+    pool.touch(leased)
+    clock.now = 70
+    assert pool.reap() == 1
+    assert not kept.exists()
+    assert leased.exists()
+    assert sorted(_worktrees(test_repository)) == sorted([test_repository.working_dir, str(leased)])
+    pool.close()
+
+
+def test_leftover_worktrees_are_adopted(test_repository):
+    crashed = WorktreePool()
+    path = crashed.acquire(test_repository)
+
+    pool = WorktreePool()
+    assert pool.acquire(test_repository) == path
+    assert pool.stats["adopted"] == 1
+    pool.close()
+
+
+def test_concurrent_sessions_commit_on_different_branches(test_repository):
+    async def session(client, branch: str) -> str:
+        leased = await client.call_tool(
+            "git_worktree_acquire", {"repo_path": test_repository.working_dir, "new_branch": branch}
+        )
+        content = leased.content[0]
+        assert isinstance(content, TextContent)
+        path = content.text.splitlines()[0].removeprefix("Worktree: ")
+        Path(path, f"{branch}.txt").write_text(branch)
+        await client.call_tool("git_add", {"repo_path": path, "files": [f"{branch}.txt"]})
+        committed = await client.call_tool("git_commit", {"repo_path": path, "message": f"work on {branch}"})
+        assert not committed.isError
+        released = await client.call_tool("git_worktree_release", {"repo_path": path})
+        assert not released.isError
+        return path
+
+    async def main():
+        async with create_connected_server_and_client_session(create_server()) as client:
+            async with anyio.create_task_group() as tg:
+                for branch in ["one", "two"]:
+                    tg.start_soon(session, client, branch)
+
+    anyio.run(main)
+
+    for branch in ["one", "two"]:
+        assert test_repository.commit(branch).message == f"work on {branch}"
+        assert test_repository.commit(branch).tree[f"{branch}.txt"]
+    assert test_repository.active_branch.name == "master"
+    assert not test_repository.is_dirty(untracked_files=True)
+    # Pooled worktrees do not outlive the server
+    assert _worktrees(test_repository) == [test_repository.working_dir]